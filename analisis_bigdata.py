@@ -1,9 +1,14 @@
+import argparse
 import polars as pl
-import plotly.express as px
 import os
-import sqlite3
+import sys
 import time 
-import pandas as pd
+
+from src.alineacion import alinear
+from src import memoria, snapshot_oro
+from src.capa_oro import construir_capa_oro, leer_hechos
+from src.formatos import matriz_formatos, mejores
+from src.informes import renderizar_informe
 
 # colores
 rojo = '\033[91m'
@@ -14,50 +19,24 @@ reset = '\033[0m'
 
 # CONFIGURACIÓN DE RUTAS 
 DB_PATH = "proyecto_datos.db"
-URI = f"sqlite:///{DB_PATH}"
 OUTPUT_DIR = "data_output"
 VIS_DIR = "visualizaciones"
-os.makedirs(OUTPUT_DIR, exist_ok=True) #crea la carpeta de salida automáticamente si no existe
-os.makedirs(VIS_DIR, exist_ok=True) #crea la carpeta de visualizaciones automáticamente si no existe
 
 # CONEXIÓN Y EXTRACCIÓN 
 def cargar_datos():
+    # Si el ETL ha publicado un snapshot Arrow de la BD actual se mapea en lugar de consultarla
+    generacion = snapshot_oro.generacion_vigente(DB_PATH)
+    if generacion is not None:
+        print(f"\n{amarillo}1. Abriendo el snapshot de la Capa de Oro ({generacion})...{reset}")
+        hechos = snapshot_oro.abrir(generacion, ["precios", "salarios", "empleo"])
+        return hechos["precios"], hechos["salarios"], hechos["empleo"]
+
     print(f"\n{amarillo}1. Conectando a la base de datos con Polars...{reset}")
     
-    # Creamos la conexión física con sqlite3 para evitar el error de URI
-    conn = sqlite3.connect(DB_PATH)
-
-    # Query para Precios (IPC/IPV)
-    query_precios = """
-    SELECT p.valor AS valor_ipc, p.categoria_gasto, t.fecha_iso, i.nombre as indicador
-    FROM T_precios p
-    JOIN tbl_periodo t ON p.id_periodo = t.id_periodo
-    JOIN tbl_indicador i ON p.id_indicador = i.id_indicador
-    """
-    
-    # Query para Salarios
-    query_salarios = """
-    SELECT s.valor AS valor_salario, s.sexo, s.sector_cnae, s.ocupacion_cno11, t.fecha_iso, 
-           i.nombre as indicador_salario, g.nombre as comunidad
-    FROM T_salarios s
-    JOIN tbl_periodo t ON s.id_periodo = t.id_periodo
-    JOIN tbl_indicador i ON s.id_indicador = i.id_indicador
-    JOIN tbl_geografia g ON s.id_geografia = g.id_geografia
-    """
-
-    # Query para Empleo
-    query_empleo = """
-    SELECT e.valor AS valor_empleo, e.sexo, t.fecha_iso, i.nombre as indicador_empleo
-    FROM T_empleo e
-    JOIN tbl_periodo t ON e.id_periodo = t.id_periodo
-    JOIN tbl_indicador i ON i.id_indicador = e.id_indicador
-    """
-    
-    df_precios = pl.read_database(query=query_precios, connection=conn)
-    df_salarios = pl.read_database(query=query_salarios, connection=conn)
-    df_empleo = pl.read_database(query=query_empleo, connection=conn)
-    
-    conn.close() # Cerramos conexión
+    # Las queries y la composición de la fecha se comparten con el Dashboard (src/capa_oro.py);
+    # la lectura va directa a Arrow con connectorx (src/acceso_datos.py)
+    df_precios, df_salarios, df_empleo = leer_hechos(DB_PATH)
+
     return df_precios, df_salarios, df_empleo
 
 # LIMPIEZA Y ESTRUCTURACIÓN: Aplicamos la lógica de Big Data y columnas calculadas
@@ -65,42 +44,16 @@ def cargar_datos():
 def procesar_informacion(df_precios, df_salarios, df_empleo):
     print(f"{amarillo}2. Procesando y cruzando información...{reset}")
 
-    # A) Limpieza: Convertir fechas a objeto Date y quitar nulos
-    df_precios = df_precios.with_columns(pl.col("fecha_iso").str.to_date()).drop_nulls()
-    df_salarios = df_salarios.with_columns([
-        pl.col("fecha_iso").str.to_date(),
-        pl.col("sector_cnae").str.strip_chars() # Limpiamos espacios para evitar N/A falsos
-    ]).drop_nulls()
-    df_empleo = df_empleo.with_columns(pl.col("fecha_iso").str.to_date()).drop_nulls()
-    
-    
-    # Filtrar valores negativos o basura antes de calcular
-    df_precios = df_precios.filter(pl.col("valor_ipc") > 0)
-    df_salarios = df_salarios.filter(pl.col("valor_salario") > 0)
-
-    # B) Filtrado para la Capa de Oro 1: IPC General
-    df_ipc_general = df_precios.filter(
-        (pl.col("categoria_gasto") == "IPC General") & 
-        (pl.col("indicador").str.contains("Indice"))
-    ).sort("fecha_iso")
-
-    # C) UNIÓN (Join): Cruzamos salarios con el IPC General por fecha
-    df_unido = df_salarios.join(df_ipc_general, on="fecha_iso", how="inner")
-
-    # D) COLUMNA CALCULADA: Ratio Poder Adquisitivo 
-    df_analisis = df_unido.with_columns(
-        (pl.col("valor_salario") / pl.col("valor_ipc")).alias("ratio_poder_adquisitivo")
-    )
-
-    # F) RELACIÓN EMPLEO-SALARIOS: Cruzamos datos para el informe de Paro y Salarios
-    df_paro = df_empleo.filter(pl.col("indicador_empleo") == "Tasa_Paro")
-    df_relacion_paro = df_analisis.join(df_paro, on=["fecha_iso", "sexo"], how="inner")
+    # Limpieza, IPC General y cruce salarios - IPC - paro alineando cada serie a su frecuencia
+    # (anual / trimestral) con joins as-of, en lugar de exigir la misma fecha exacta
+    df_ipc_general, df_relacion_paro = construir_capa_oro(df_precios, df_salarios, df_empleo)
 
     return df_ipc_general, df_relacion_paro
 
 # GENERACIÓN DE DATASETS
 def generar_informes_csv(df_ipc, df_relacion):
     print(f"{amarillo}3. Exportando datasets y comparando formatos...{reset}")
+    os.makedirs(OUTPUT_DIR, exist_ok=True) #crea la carpeta de salida automáticamente si no existe
     
     # 1. Definimos las rutas para poder medirlas luego
     csv_path = f"{OUTPUT_DIR}/Relacion_Paro_Salarios.csv"
@@ -115,23 +68,30 @@ def generar_informes_csv(df_ipc, df_relacion):
     # 3. INVESTIGACIÓN: Medimos peso en disco (KB)
     peso_csv = os.path.getsize(csv_path) / 1024
     peso_parquet = os.path.getsize(parquet_path) / 1024
-
-    # 4. INVESTIGACIÓN: Medimos velocidad de lectura (segundos)
-    t0_csv = time.time()
-    pl.read_csv(csv_path)
-    tiempo_csv = time.time() - t0_csv
-
-    t0_pq = time.time()
-    pl.read_parquet(parquet_path)
-    tiempo_pq = time.time() - t0_pq
+    print(f"\n📁 Peso: CSV {peso_csv:.2f} KB | Parquet {peso_parquet:.2f} KB")
+
+    if df_relacion.is_empty():
+        print(f"{amarillo}Sin datos en la relación: se omite la matriz de formatos.{reset}\n")
+        return
+
+    # 4. INVESTIGACIÓN: Matriz de formatos (escritura, peso, lectura completa, proyección y filtro)
+    # sobre la relación repetida hasta cada escala de FILAS_MATRIZ_FORMATOS
+    ultimo_anio = df_relacion["anio"].max()
+    matriz = matriz_formatos(
+        df_relacion,
+        columnas=["fecha_key", "comunidad", "ratio_poder_adquisitivo"],
+        filtro=(pl.col("anio") == ultimo_anio) & (pl.col("sexo") == "Ambos sexos"),
+    )
+    matriz.write_csv(f"{OUTPUT_DIR}/Comparativa_Formatos.csv")
 
     # 5. MOSTRAMOS RESULTADOS EN CONSOLA
-    print(f"\n{turquesa}📊 COMPARATIVA BIG DATA (CSV vs PARQUET):{reset}")
-    print(f"📁 Peso: CSV {peso_csv:.2f} KB | Parquet {peso_parquet:.2f} KB")
-    print(f"⏱️ Lectura: CSV {tiempo_csv:.4f}s | Parquet {tiempo_pq:.4f}s")
-    
-    ahorro = (1 - (peso_parquet / peso_csv)) * 100
-    print(f"{lima}🚀 Resultado: Parquet ocupa un {ahorro:.1f}% menos.{reset}\n")
+    print(f"\n{turquesa}📊 COMPARATIVA DE FORMATOS DE ALMACENAMIENTO:{reset}")
+    with pl.Config(tbl_rows=-1, tbl_hide_dataframe_shape=True, float_precision=4):
+        print(matriz.sort("filas", "tamano_mb"))
+    print(f"{lima}🚀 Mejor formato con {matriz['filas'].max():,} filas:{reset}")
+    for metrica, (formato, valor) in mejores(matriz).items():
+        print(f"   {metrica:<13} {formato} ({valor:.4f})")
+    print(f"Tabla completa en {OUTPUT_DIR}/Comparativa_Formatos.csv\n")
 
 # COMPARACIÓN DE RENDIMIENTO ENTRE POLARS Y PANDAS EN UNA OPERACIÓN COMPLEJA 
 
@@ -155,7 +115,9 @@ def realizar_benchmarking(df_relacion):
 
     # --- MEDIDOR PANDAS ---
     t0_pandas = time.time()
-    res_pandas = df_pandas.groupby(["sector_cnae", "sexo"])["ratio_poder_adquisitivo"].agg(
+    # observed=True: sector y sexo llegan como categorías (Enum de Polars) y sin él se agregan
+    # también las combinaciones que no aparecen en los datos
+    res_pandas = df_pandas.groupby(["sector_cnae", "sexo"], observed=True)["ratio_poder_adquisitivo"].agg(
         ["mean", "max", "std"]
     )
     tiempo_pandas = time.time() - t0_pandas
@@ -171,23 +133,55 @@ def realizar_benchmarking(df_relacion):
     else:
         print(f"{amarillo}Nota: Con datasets pequeños las diferencias son milimétricas.{reset}\n")
 
+# COMPARACIÓN DEL CRUCE POR FECHA EXACTA FRENTE A LA ALINEACIÓN AS-OF
+
+def comparar_alineacion(df_precios, df_salarios, escalas=(1, 20), repeticiones=5):
+    print(f"{amarillo}6. Comparando join exacto vs alineación as-of...{reset}")
+
+    df_salarios = df_salarios.drop_nulls().filter(pl.col("valor_salario") > 0)
+    df_ipc = df_precios.drop_nulls().filter(
+        (pl.col("categoria_gasto") == "IPC General") & (pl.col("indicador") == "IPC Indice")
+    )
+
+    print(f"\n{turquesa}🗓️ ALINEACIÓN SALARIOS - IPC (mejor de {repeticiones} repeticiones):{reset}")
+    for escala in escalas:
+        # Replicamos los salarios para medir cómo escala cada estrategia
+        df_escala = pl.concat([df_salarios] * escala) if escala > 1 else df_salarios
+
+        tiempos_exacto, tiempos_asof = [], []
+        for _ in range(repeticiones):
+            t0 = time.perf_counter()
+            exacto = df_escala.join(df_ipc.select(["fecha_key", "valor_ipc"]), on="fecha_key", how="inner")
+            tiempos_exacto.append(time.perf_counter() - t0)
+
+            t0 = time.perf_counter()
+            asof = alinear(df_escala, df_ipc, valores=["valor_ipc"], frecuencia_por=["indicador_salario"])
+            tiempos_asof.append(time.perf_counter() - t0)
+
+        # El join exacto duplica un salario por cada fila de IPC de esa fecha y pierde los que no coinciden
+        con_pareja = df_escala.join(df_ipc.select("fecha_key").unique(), on="fecha_key", how="semi").height
+        print(f"x{escala} ({df_escala.height} salarios) | "
+              f"Exacto: {exacto.height} filas, {con_pareja} salarios cruzados, {min(tiempos_exacto):.4f}s | "
+              f"As-of: {asof.height} filas sin duplicados, {min(tiempos_asof):.4f}s")
+
+    print(f"{lima}Salarios recuperados por la alineación: {asof.height - con_pareja}{reset}\n")
+
 # ANÁLISIS VISUAL
 def crear_visualizaciones(df_ipc, df_final):
     print(f"{amarillo}4. Generando los 3 gráficos analíticos sincronizados con el Dashboard...{reset}")
+    # plotly solo se importa al generar gráficos (exportar no lo necesita)
+    import plotly.express as px
 
     # --- GRÁFICO 1: IPC (Línea) ---
     
-    # 1. Pasamos a Pandas para no alterar el DataFrame original de Polars
-    # 2. Convertimos a fecha para poder ordenar cronológicamente (Enero antes que Octubre)
-    # 3. Quitamos duplicados: si hay dos puntos en la misma fecha, nos quedamos con uno
-    df_ipc_plot = df_ipc.to_pandas()
-    df_ipc_plot['fecha_dt'] = pd.to_datetime(df_ipc_plot['fecha_iso'])
-    
+    # 1. Ordenamos cronológicamente por la clave entera yyyymmdd (Enero antes que Octubre)
+    # 2. Quitamos duplicados: si hay dos puntos en la misma fecha, nos quedamos con uno
+    # 3. Pasamos a Pandas solo el resultado, sin alterar el DataFrame original de Polars
     df_ipc_plot = (
-        df_ipc_plot
-        .sort_values('fecha_dt')
-        .drop_duplicates(subset=['fecha_iso'])
-        .drop(columns=['fecha_dt'])
+        df_ipc
+        .sort("fecha_key")
+        .unique(subset=["fecha_key"], keep="first", maintain_order=True)
+        .to_pandas()
     )
 
     fig1 = px.line(
@@ -197,14 +191,13 @@ def crear_visualizaciones(df_ipc, df_final):
         title="1. Evolución Temporal del IPC General (Base 2021)",
         labels={"valor_ipc": "IPC", "fecha_iso": "FECHA"}
     )
-    fig1.write_html(f"{VIS_DIR}/1_evolucion_ipc.html")
 
     # --- GRÁFICO 2: SALARIOS (Líneas con Marcadores - Como el Dashboard final) ---
     df_sal_plot = (
         df_final.filter(pl.col("comunidad") != "Total Nacional")
-        .group_by(["fecha_iso", "comunidad"])
+        .group_by(["fecha_key", "fecha_iso", "comunidad"])
         .agg(pl.col("valor_salario").mean())
-        .sort("fecha_iso")
+        .sort("fecha_key")
         .to_pandas()
     )
     
@@ -216,7 +209,6 @@ def crear_visualizaciones(df_ipc, df_final):
         labels={"valor_salario": "SALARIO MEDIO (€)", "fecha_iso": "FECHA"}
     )
     fig2.update_layout(legend=dict(orientation="h", y=-0.3, font=dict(size=10)))
-    fig2.write_html(f"{VIS_DIR}/2_salario_comunidades.html")
 
     # --- GRÁFICO 3: PODER ADQUISITIVO (Barras Horizontales - El cambio clave) ---
     # Aplicamos la misma lógica de "resumen" para evitar archivos pesados o bloqueos
@@ -243,24 +235,46 @@ def crear_visualizaciones(df_ipc, df_final):
         height=700, 
         margin=dict(l=200) 
     )
-    fig3.write_html(f"{VIS_DIR}/3_poder_adquisitivo_barras.html")
+
+    # Se escriben los 3 HTML en paralelo compartiendo un único plotly.js
+    t0 = time.time()
+    salidas = renderizar_informe({
+        f"{VIS_DIR}/1_evolucion_ipc.html": fig1,
+        f"{VIS_DIR}/2_salario_comunidades.html": fig2,
+        f"{VIS_DIR}/3_poder_adquisitivo_barras.html": fig3,
+    })
+    for ruta, peso in salidas:
+        print(f"📄 {ruta}: {peso:.1f} KB")
+    print(f"⏱️ Renderizado: {time.time() - t0:.2f}s")
 
     print(f"\n{turquesa}Gráficos del script sincronizados con el Dashboard.{reset}")
 
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Capa de Oro completa: exportación, gráficos y benchmarks")
+    parser.add_argument("--memoria", action="store_true",
+                        help="Perfil de memoria por etapas (también con PERFIL_MEMORIA=1)")
+    args = parser.parse_args(argv)
+
+    perfil = memoria.PerfilMemoria("analisis_bigdata", args.memoria or memoria.activado_por_entorno())
     try:
-        precios_raw, salarios_raw, empleo_raw = cargar_datos()
-        ipc_oro, relacion_oro = procesar_informacion(precios_raw, salarios_raw, empleo_raw)
-        
-        generar_informes_csv(ipc_oro, relacion_oro)
-        crear_visualizaciones(ipc_oro, relacion_oro)
+        with perfil:
+            precios_raw, salarios_raw, empleo_raw = perfil.medir("cargar_datos", cargar_datos)
+            ipc_oro, relacion_oro = perfil.medir(
+                "procesar_informacion", procesar_informacion, precios_raw, salarios_raw, empleo_raw)
+
+            perfil.medir("generar_informes_csv", generar_informes_csv, ipc_oro, relacion_oro)
+            perfil.medir("crear_visualizaciones", crear_visualizaciones, ipc_oro, relacion_oro)
 
-        realizar_benchmarking(relacion_oro)
+            perfil.medir("realizar_benchmarking", realizar_benchmarking, relacion_oro)
+            perfil.medir("comparar_alineacion", comparar_alineacion, precios_raw, salarios_raw)
         
         print(f"{lima}\n¡¡PROCESO COMPLETADO CON ÉXITO!!.{reset}")
     except Exception as e:
         print(f"{rojo}\nERROR: {e}{reset}")
 
+    if not perfil.finalizar():
+        sys.exit(1)
+
 if __name__ == "__main__":
     main()
@@ -1,11 +1,15 @@
 import streamlit as st
 import polars as pl
-import pandas as pd
 import plotly.express as px
-import sqlite3
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import OneHotEncoder
-import numpy as np
+
+# sklearn y el modelo solo se cargan al pedir una predicción (ver src/modelo_salarial.py)
+from src import exportacion, modelo_salarial, snapshot_oro
+from src.capa_oro import leer_simulador
+from config.constantes import MODELO_SALARIAL
+
+DB_PATH = "proyecto_datos.db"
+# Snapshot Arrow publicado por el ETL o, si no lo hay, generación de la propia BD
+GENERACION = snapshot_oro.generacion_lectura(DB_PATH)
 
 # CONFIGURACIÓN DE LA PÁGINA
 st.set_page_config(
@@ -61,30 +65,28 @@ st.markdown("""
     """, unsafe_allow_html=True)
 
 # CARGA DE DATOS
-@st.cache_data
-def load_data():
-    conn = sqlite3.connect("proyecto_datos.db")
-    query = "SELECT s.valor AS salario, s.sector_cnae, s.sexo, g.nombre AS comunidad, t.fecha_iso FROM T_salarios s JOIN tbl_periodo t ON s.id_periodo = t.id_periodo JOIN tbl_geografia g ON s.id_geografia = g.id_geografia WHERE s.sector_cnae != 'N/A' AND t.fecha_iso != ''"
-    df = pl.read_database(query, connection=conn)
-    conn.close()
-    return df
+# cache_resource: el frame mapeado del snapshot se comparte entre sesiones sin copiarlo
+@st.cache_resource(max_entries=1)
+def load_data(generacion):
+    if snapshot_oro.es_snapshot(generacion):
+        return snapshot_oro.abrir(generacion, ["simulador"])["simulador"]
+    # Sin snapshot se lee de la BD (misma query, src/capa_oro.py)
+    return leer_simulador(DB_PATH)
 
 @st.cache_resource
-def train_model(df_pd):
-    X = df_pd[['sector_cnae', 'sexo', 'comunidad']]
-    y = df_pd['salario']
-    encoder = OneHotEncoder(sparse_output=False, handle_unknown='ignore')
-    X_encoded = encoder.fit_transform(X)
-    model = RandomForestRegressor(n_estimators=100, max_depth=10, random_state=42)
-    model.fit(X_encoded, y)
-    return model, encoder
-
-df_raw = load_data()
-df_pd_full = df_raw.to_pandas()
+def load_model(huella, tipo):
+    # Se entrena (o se lee de disco) una vez por tipo de modelo y huella de BD + hiperparámetros
+    return modelo_salarial.cargar_o_entrenar(load_data(GENERACION), huella, tipo)
+
+@st.cache_data
+def opciones(generacion, columna):
+    return load_data(generacion).get_column(columna).unique(maintain_order=True).to_list()
+
+df_raw = load_data(GENERACION)
 
 # BARRA LATERAL
 st.sidebar.markdown("<h2 style='color:#FC00FF; margin-top:0;'>🌈 Configuración</h2>", unsafe_allow_html=True)
-comunidades = ["Todas"] + sorted(df_pd_full["comunidad"].unique().tolist())
+comunidades = ["Todas"] + sorted(df_raw.get_column("comunidad").unique().to_list())
 com_selected = st.sidebar.selectbox("Filtros Globales", comunidades)
 df = df_raw.filter(pl.col("comunidad") == com_selected) if com_selected != "Todas" else df_raw
 
@@ -120,23 +122,32 @@ with tabs[0]:
 
 with tabs[1]:
     st.subheader("Simulador Salarial con IA")
-    model, encoder = train_model(df_pd_full)
     with st.form("pred_form"):
         cx, cy, cz = st.columns(3)
-        with cx: in_sec = st.selectbox("Sector", df_pd_full["sector_cnae"].unique())
-        with cy: in_sex = st.radio("Género", df_pd_full["sexo"].unique(), horizontal=True)
-        with cz: in_com = st.selectbox("Residencia", df_pd_full["comunidad"].unique())
+        with cx: in_sec = st.selectbox("Sector", opciones(GENERACION, "sector_cnae"))
+        with cy: in_sex = st.radio("Género", opciones(GENERACION, "sexo"), horizontal=True)
+        with cz: in_com = st.selectbox("Residencia", opciones(GENERACION, "comunidad"))
+        tipos = list(modelo_salarial.TIPOS)
+        in_mod = st.radio("Modelo", tipos, index=tipos.index(MODELO_SALARIAL), horizontal=True,
+                          format_func=modelo_salarial.TIPOS.get)
         
         if st.form_submit_button("Calcular Predicción 🚀"):
-            input_df = pd.DataFrame([[in_sec, in_sex, in_com]], columns=['sector_cnae', 'sexo', 'comunidad'])
-            pred = model.predict(encoder.transform(input_df))[0]
+            with st.spinner("Cargando modelo..."):
+                model, encoder = load_model(modelo_salarial.huella_modelo(DB_PATH, in_mod), in_mod)
+            pred = modelo_salarial.predecir(model, encoder, in_sec, in_sex, in_com)
             st.markdown(f"""<div style="padding:20px; border-radius:15px; background:linear-gradient(45deg, #FC00FF, #00DBDE); text-align:center;">
                             <h2 style="color:black !important; margin:0;">Salario Estimado: {pred:,.2f} €</h2></div>""", unsafe_allow_html=True)
 
 with tabs[2]:
     st.subheader("Dataset Maestro")
-    st.dataframe(df.to_pandas().head(100), use_container_width=True)
-    st.download_button(label="📥 Descargar CSV Maestro", data=df.to_pandas().to_csv().encode('utf-8'), 
-                       file_name="capa_oro.csv", mime="text/csv")
+    st.dataframe(df.head(100), use_container_width=True)
+    # El fichero solo se genera al pulsar y se guarda en disco por generación, filtro y formato
+    # (src/exportacion.py); el enlace lo descarga desde disco, sin pasar por la memoria de la app
+    formato = st.radio("Formato de descarga", list(exportacion.FORMATOS), horizontal=True)
+    extension, _ = exportacion.FORMATOS[formato]
+    if st.button("📦 Preparar Dataset Maestro"):
+        ruta = exportacion.exportar(df, GENERACION, com_selected, formato)
+        st.markdown(f'<a href="{exportacion.url_descarga(ruta)}" download="capa_oro.{extension}">'
+                    '📥 Descargar Dataset Maestro</a>', unsafe_allow_html=True)
 
 st.markdown("<p style='text-align:center;'>Cerrando el ciclo de vida del proyecto de Big Data 🚀</p>", unsafe_allow_html=True)
\ No newline at end of file
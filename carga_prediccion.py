@@ -0,0 +1,209 @@
+# colores
+rojo = '\033[91m'
+amarillo = '\033[93m'
+turquesa = '\033[38;5;44m'
+lima = '\33[38;5;46m'
+reset = '\033[0m'
+
+# Prueba de carga del servicio de predicción (python cli.py serve) contra localhost.
+#
+#     python carga_prediccion.py                     contra un servicio ya arrancado
+#     python carga_prediccion.py --comparar          arranca dos servicios (sin lotes y con
+#                                                    micro-lotes) y compara los resultados
+#
+# Cada cliente es un hilo con su propia conexión keep-alive que envía peticiones seguidas
+# con perfiles aleatorios tomados de las categorías que devuelve /salud.
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from config.constantes import PREDICCION_HOST, PREDICCION_PUERTO
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+
+
+def _pedir(conexion, metodo, ruta, cuerpo=None):
+    cabeceras = {"Content-Type": "application/json"} if cuerpo is not None else {}
+    conexion.request(metodo, ruta, body=cuerpo, headers=cabeceras)
+    respuesta = conexion.getresponse()
+    datos = respuesta.read()
+    return respuesta.status, json.loads(datos)
+
+
+def _conectar(url):
+    partes = urlsplit(url)
+    return http.client.HTTPConnection(partes.hostname, partes.port, timeout=60)
+
+
+def consultar(url, ruta):
+    conexion = _conectar(url)
+    try:
+        return _pedir(conexion, "GET", ruta)[1]
+    finally:
+        conexion.close()
+
+
+def esperar_servicio(url, proceso=None, limite=300):
+    """Espera a que /salud responda (el servicio puede estar entrenando el modelo)"""
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < limite:
+        if proceso is not None and proceso.poll() is not None:
+            raise RuntimeError(f"El servicio ha terminado con código {proceso.returncode}")
+        try:
+            return consultar(url, "/salud")
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"{url} no responde tras {limite}s")
+
+
+def _percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+def prueba_carga(url, clientes=16, peticiones=2000, perfiles=1, semilla=42):
+    """Lanza `peticiones` peticiones repartidas entre `clientes` hilos y devuelve el resumen"""
+    categorias = esperar_servicio(url)["categorias"]
+    azar = random.Random(semilla)
+    cuerpos = []
+    for _ in range(peticiones):
+        lote = [{variable: azar.choice(valores) for variable, valores in categorias.items()} for _ in range(perfiles)]
+        cuerpos.append(json.dumps(lote[0] if perfiles == 1 else {"perfiles": lote}).encode("utf-8"))
+
+    latencias, errores = [], []
+    bloqueo = threading.Lock()
+    siguiente = iter(range(peticiones))
+
+    def cliente():
+        conexion = _conectar(url)
+        propias = []
+        try:
+            while True:
+                with bloqueo:
+                    i = next(siguiente, None)
+                if i is None:
+                    break
+                t0 = time.perf_counter()
+                try:
+                    estado, datos = _pedir(conexion, "POST", "/predecir", cuerpos[i])
+                except (OSError, http.client.HTTPException) as error:
+                    estado, datos = None, {"error": str(error)}
+                    conexion.close()
+                    conexion = _conectar(url)
+                if estado == 200:
+                    propias.append(time.perf_counter() - t0)
+                else:
+                    with bloqueo:
+                        errores.append(datos.get("error"))
+        finally:
+            conexion.close()
+            with bloqueo:
+                latencias.extend(propias)
+
+    hilos = [threading.Thread(target=cliente) for _ in range(clientes)]
+    t0 = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    duracion = time.perf_counter() - t0
+
+    latencias.sort()
+    resumen = {
+        "clientes": clientes,
+        "peticiones": peticiones,
+        "perfiles_por_peticion": perfiles,
+        "errores": len(errores),
+        "segundos": round(duracion, 2),
+        "peticiones_s": round(len(latencias) / duracion, 1),
+        "perfiles_s": round(len(latencias) * perfiles / duracion, 1),
+    }
+    for p in (50, 95, 99):
+        resumen[f"latencia_p{p}_ms"] = round(1000 * _percentil(latencias, p), 2) if latencias else None
+    resumen["servidor"] = consultar(url, "/metricas")
+    if errores:
+        resumen["primer_error"] = errores[0]
+    return resumen
+
+
+def imprimir(nombre, resumen):
+    servidor = resumen["servidor"]
+    color = lima if not resumen["errores"] else rojo
+    if resumen["latencia_p50_ms"] is None:
+        print(f"{rojo}{nombre:<14} ninguna petición ha ido bien: {resumen.get('primer_error')}{reset}")
+        return
+    print(f"{color}{nombre:<14}{reset} {resumen['peticiones_s']:>8.0f} pet/s {resumen['perfiles_s']:>9.0f} perfiles/s | "
+          f"p50 {resumen['latencia_p50_ms']:>7.2f} ms  p95 {resumen['latencia_p95_ms']:>7.2f} ms  "
+          f"p99 {resumen['latencia_p99_ms']:>7.2f} ms | lote medio {servidor['lote_medio']} "
+          f"(máx. {servidor['lote_maximo']}), predict {servidor['predict_medio_ms']} ms | errores {resumen['errores']}")
+    if resumen.get("primer_error"):
+        print(f"{rojo}  primer error: {resumen['primer_error']}{reset}")
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind((PREDICCION_HOST, 0))
+        return s.getsockname()[1]
+
+
+def comparar(args):
+    """Arranca un servicio sin lotes (--max-lote 1) y otro con micro-lotes y los somete a la misma carga"""
+    configuraciones = {"sin lotes": ["--max-lote", "1"], "micro-lotes": []}
+    resultados = {}
+    for nombre, opciones in configuraciones.items():
+        puerto = _puerto_libre()
+        proceso = subprocess.Popen(
+            [sys.executable, "cli.py", "serve", "--db", args.db, "--puerto", str(puerto), *opciones],
+            cwd=DIRECTORIO, stdout=subprocess.DEVNULL,
+        )
+        url = f"http://{PREDICCION_HOST}:{puerto}"
+        try:
+            esperar_servicio(url, proceso)
+            resultados[nombre] = prueba_carga(url, args.clientes, args.peticiones, args.perfiles)
+        finally:
+            proceso.terminate()
+            proceso.wait()
+        imprimir(nombre, resultados[nombre])
+
+    base, lotes = resultados["sin lotes"], resultados["micro-lotes"]
+    if base["perfiles_s"]:
+        print(f"{amarillo}\nMicro-lotes: x{lotes['perfiles_s'] / base['perfiles_s']:.1f} perfiles/s, "
+              f"p95 {base['latencia_p95_ms']:.1f} -> {lotes['latencia_p95_ms']:.1f} ms{reset}")
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga del servicio de predicción salarial")
+    parser.add_argument("--url", default=f"http://{PREDICCION_HOST}:{PREDICCION_PUERTO}")
+    parser.add_argument("--clientes", type=int, default=16, help="hilos que envían peticiones a la vez")
+    parser.add_argument("--peticiones", type=int, default=2000)
+    parser.add_argument("--perfiles", type=int, default=1, help="perfiles por petición")
+    parser.add_argument("--comparar", action="store_true", help="arranca dos servicios: sin lotes y con micro-lotes")
+    parser.add_argument("--db", default="proyecto_datos.db", help="BD de los servicios que arranca --comparar")
+    parser.add_argument("--json", help="guarda el resultado en este fichero")
+    args = parser.parse_args(argv)
+
+    print(f"{turquesa}\n🚦 PRUEBA DE CARGA: {args.peticiones} peticiones de {args.perfiles} perfil(es), "
+          f"{args.clientes} clientes a la vez{reset}")
+    if args.comparar:
+        resultados = comparar(args)
+    else:
+        resultados = {args.url: prueba_carga(args.url, args.clientes, args.peticiones, args.perfiles)}
+        imprimir(args.url, resultados[args.url])
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=1)
+    if any(resumen["errores"] for resumen in resultados.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,723 @@
+# colores
+rojo = '\033[91m'
+amarillo = '\033[93m'
+turquesa = '\033[38;5;44m'
+lima = '\33[38;5;46m'
+reset = '\033[0m'
+
+# Punto de entrada único del proyecto:
+#
+#     python cli.py ingest [--replay ...]   ETL del INE -> SQLite (main.py)
+#     python cli.py export                  Capa de Oro -> CSV / Parquet (+ matriz de formatos)
+#     python cli.py analyze                 Capa de Oro, gráficos y benchmarks (analisis_bigdata.py)
+#     python cli.py model                   Modelos y gráficos de modelado (modelado.py)
+#     python cli.py serve                   Servicio HTTP/JSON de predicción salarial con micro-lotes
+#     python cli.py schedule                Planificador: refresca cada tabla según su frecuencia
+#     python cli.py bench [objetivo]        Benchmarks: arranque (por defecto), http, transformacion,
+#                                           lectura, oro, sombra, formatos, tipos
+#
+# Cada subcomando importa sus módulos solo cuando se elige: `ingest` no carga
+# sklearn, plotly ni polars.
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+
+
+# CARGADORES: importan lo necesario y devuelven la función a ejecutar con los argumentos restantes
+def _cargar_ingest():
+    import main
+    return main.main
+
+
+def _cargar_export():
+    from analisis_bigdata import cargar_datos, generar_informes_csv, procesar_informacion
+
+    def exportar(argv):
+        ipc_oro, relacion_oro = procesar_informacion(*cargar_datos())
+        generar_informes_csv(ipc_oro, relacion_oro)
+    return exportar
+
+
+def _cargar_analyze():
+    import analisis_bigdata
+    return analisis_bigdata.main
+
+
+def _cargar_model():
+    import modelado
+    return modelado.main
+
+
+def _cargar_serve():
+    from config.constantes import (
+        MODELO_SALARIAL, PREDICCION_ESPERA_LOTE, PREDICCION_HOST, PREDICCION_MAX_LOTE, PREDICCION_PUERTO,
+    )
+    from src import modelo_salarial, servicio_prediccion
+
+    def servir(argv):
+        parser = argparse.ArgumentParser(prog="cli.py serve", description="Servicio local de predicción salarial")
+        parser.add_argument("--db", default="proyecto_datos.db", help="BD con la que se entrena el modelo si no está guardado")
+        parser.add_argument("--host", default=PREDICCION_HOST)
+        parser.add_argument("--puerto", type=int, default=PREDICCION_PUERTO)
+        parser.add_argument("--max-lote", type=int, default=PREDICCION_MAX_LOTE, help="1 desactiva los micro-lotes")
+        parser.add_argument("--espera-ms", type=float, default=PREDICCION_ESPERA_LOTE * 1000)
+        parser.add_argument("--modelo", choices=list(modelo_salarial.TIPOS), default=MODELO_SALARIAL)
+        args = parser.parse_args(argv)
+
+        t0 = time.perf_counter()
+        modelo, encoder, huella = servicio_prediccion.cargar_modelo(args.db, args.modelo)
+        servicio = servicio_prediccion.ServicioPrediccion(
+            modelo, encoder, huella, args.host, args.puerto, args.max_lote, args.espera_ms / 1000,
+        )
+        print(f"{lima}Modelo {args.modelo} {huella} cargado en {time.perf_counter() - t0:.2f}s.{reset} "
+              f"Sirviendo en {turquesa}{servicio.url_base}{reset} (lotes de hasta {args.max_lote} "
+              f"perfiles, espera {args.espera_ms:g} ms). Ctrl+C para parar.", flush=True)
+        try:
+            servicio.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            servicio.server_close()
+            print(f"{amarillo}\nMétricas finales:{reset} {json.dumps(servicio.metricas.resumen(), ensure_ascii=False)}")
+    return servir
+
+
+def _cargar_schedule():
+    from src import planificador
+
+    def planificar(argv):
+        parser = argparse.ArgumentParser(
+            prog="cli.py schedule",
+            description="Refresca cada tabla del INE solo cuando le toca según su frecuencia de publicación",
+            epilog="Los argumentos que no son del planificador se pasan a cada carga (p. ej. --sombra, --vectorial)",
+        )
+        parser.add_argument("--una-vez", action="store_true", help="Refresca lo que toque ahora y termina (para cron)")
+        parser.add_argument("--estado", action="store_true", help="Muestra el estado de cada tabla y termina")
+        parser.add_argument("--a-la-vez", type=int, default=planificador.PLANIFICADOR_TABLAS_A_LA_VEZ,
+                            help="Tablas que se refrescan a la vez como máximo")
+        args, opciones_etl = parser.parse_known_args(argv)
+
+        plan = planificador.Planificador(opciones_etl, a_la_vez=args.a_la_vez)
+        if args.estado:
+            print(f"{turquesa}{'tabla':<7} {'frecuencia':<11} {'última carga':<20} {'último periodo':<15} "
+                  f"{'fallos':>6}  próxima{reset}")
+            for codigo, frecuencia, carga, periodo, fallos, proxima in plan.resumen():
+                print(f"{codigo:<7} {frecuencia:<11} {carga or '-':<20} {periodo or '-':<15} {fallos:>6}  {proxima}")
+            return
+
+        # Ctrl+C o SIGTERM: termina la carga en curso y sale
+        signal.signal(signal.SIGTERM, lambda *_: plan.parar())
+        print(f"{lima}Planificador en marcha{reset} (estado en {plan.ruta_estado}, "
+              f"{args.a_la_vez} tablas a la vez). Ctrl+C para parar.", flush=True)
+        try:
+            plan.ejecutar(una_vez=args.una_vez)
+        except KeyboardInterrupt:
+            print(f"{amarillo}\nPlanificador detenido.{reset}")
+    return planificar
+
+
+def _cargar_bench():
+    return bench
+
+
+SUBCOMANDOS = {
+    "ingest": (_cargar_ingest, "Descarga las tablas del INE y las carga en SQLite (admite las opciones de main.py)"),
+    "export": (_cargar_export, "Genera la Capa de Oro y la exporta a CSV y Parquet"),
+    "analyze": (_cargar_analyze, "Capa de Oro completa: exportación, gráficos y benchmarks (admite --memoria)"),
+    "model": (_cargar_model, "Entrena los modelos y genera sus gráficos (admite --memoria)"),
+    "serve": (_cargar_serve, "Servicio HTTP/JSON local de predicción salarial con micro-lotes"),
+    "schedule": (_cargar_schedule, "Planificador de la ingesta: refresca cada tabla según su frecuencia"),
+    "bench": (_cargar_bench, "Ejecuta benchmarks del proyecto"),
+}
+
+
+# BENCHMARK DE ARRANQUE EN FRÍO
+# Cada medida se hace en un intérprete nuevo: importar cli + cargar el subcomando (sin ejecutarlo)
+_SONDA = """
+import json, sys, time
+t0 = time.perf_counter()
+import cli
+cli.SUBCOMANDOS[sys.argv[1]][0]()
+t = time.perf_counter() - t0
+print(json.dumps({"importacion": t, "modulos": sorted({m.split(".")[0] for m in sys.modules})}))
+"""
+
+
+def medir_arranque(subcomando, repeticiones=3):
+    """Devuelve (mediana del proceso completo, mediana de importación, módulos cargados)"""
+    totales, importaciones, modulos = [], [], []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        salida = subprocess.run(
+            [sys.executable, "-c", _SONDA, subcomando],
+            cwd=DIRECTORIO, capture_output=True, text=True, check=True,
+        )
+        totales.append(time.perf_counter() - t0)
+        datos = json.loads(salida.stdout.strip().splitlines()[-1])
+        importaciones.append(datos["importacion"])
+        modulos = datos["modulos"]
+    return statistics.median(totales), statistics.median(importaciones), modulos
+
+
+def bench_arranque(repeticiones=3):
+    from config.constantes import MODULOS_PROHIBIDOS, PRESUPUESTO_ARRANQUE
+
+    print(f"{turquesa}\n⏱️ ARRANQUE EN FRÍO POR SUBCOMANDO (mediana de {repeticiones}):{reset}")
+    fallos = 0
+    for subcomando in SUBCOMANDOS:
+        total, importacion, modulos = medir_arranque(subcomando, repeticiones)
+        presupuesto = PRESUPUESTO_ARRANQUE.get(subcomando)
+        prohibidos = [m for m in MODULOS_PROHIBIDOS.get(subcomando, []) if m in modulos]
+        ok = (presupuesto is None or total <= presupuesto) and not prohibidos
+        fallos += not ok
+
+        color = lima if ok else rojo
+        linea = f"{subcomando:<8} proceso {total:.3f}s | importación {importacion:.3f}s"
+        if presupuesto is not None:
+            linea += f" | presupuesto {presupuesto:.1f}s"
+        if prohibidos:
+            linea += f" | carga {', '.join(prohibidos)}"
+        print(f"{color}{'OK ' if ok else 'KO '}{reset}{linea}")
+
+    if fallos:
+        print(f"{rojo}\n{fallos} subcomando(s) fuera de presupuesto.{reset}")
+    else:
+        print(f"{lima}\nTodos los subcomandos arrancan dentro de presupuesto.{reset}")
+    return fallos == 0
+
+
+# BENCHMARK DEL CLIENTE HTTP CONTRA UN SERVIDOR LOCAL QUE FALLA A PROPÓSITO
+def bench_http(repeticiones=3, tasa_fallos=0.3):
+    from concurrent.futures import ThreadPoolExecutor
+
+    import requests
+
+    from config.constantes import (
+        EAES_OCUPACION, EAES_PERCENTILES, ETCL, INE_CONEXIONES_POR_HOST, IPC, IPV, TASA_PARO, TEMPORALIDAD,
+    )
+    from src.http_ine import crear_sesion, descargar
+    from src.servidor_ine_local import arrancar
+
+    tablas = [IPC, IPV, TASA_PARO, TEMPORALIDAD, EAES_OCUPACION, EAES_PERCENTILES, ETCL] * repeticiones
+    servidor = arrancar(tasa_fallos=tasa_fallos)
+    print(f"{turquesa}\n🌐 CLIENTE HTTP: {len(tablas)} descargas contra un servidor local con "
+          f"{tasa_fallos:.0%} de fallos ({'lago ' + servidor.snapshot if servidor.snapshot else 'datos sintéticos'}){reset}")
+
+    # A) Como antes: requests.get suelto (una conexión por tabla), sin reintentos, en serie
+    def _suelto(codigo):
+        try:
+            r = requests.get(f"{servidor.url_base}{codigo}", timeout=30)
+            r.raise_for_status()
+            return len(r.content)
+        except requests.RequestException:
+            return None
+
+    t0 = time.perf_counter()
+    resultados = [_suelto(c) for c in tablas]
+    tiempo = time.perf_counter() - t0
+    print(f"requests.get   | {sum(r is not None for r in resultados)}/{len(tablas)} tablas | "
+          f"{tiempo:.2f}s | {servidor.peticiones} peticiones, {servidor.conexiones} conexiones")
+
+    # B) Sesión compartida con pool, gzip, reintentos con backoff y límite por host, en paralelo
+    servidor.reiniciar_contadores()
+    sesion = crear_sesion()
+
+    def _sesion(codigo):
+        try:
+            return descargar(f"{servidor.url_base}{codigo}", sesion=sesion)[1]
+        except requests.RequestException:
+            return None
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=INE_CONEXIONES_POR_HOST) as pool:
+        metricas = list(pool.map(_sesion, tablas))
+    tiempo = time.perf_counter() - t0
+    correctas = [m for m in metricas if m is not None]
+    print(f"sesión + retry | {len(correctas)}/{len(tablas)} tablas | {tiempo:.2f}s | "
+          f"{servidor.peticiones} peticiones, {servidor.conexiones} conexiones, "
+          f"{sum(m['reintentos'] for m in correctas)} reintentos | "
+          f"{sum(m['bytes_red'] for m in correctas) / 1024:.0f} KB transferidos de "
+          f"{sum(m['bytes'] for m in correctas) / 1024:.0f} KB JSON")
+
+    servidor.shutdown()
+    ok = len(correctas) == len(tablas)
+    print(f"{lima if ok else rojo}\n{'Todas las descargas completadas.' if ok else 'Hay descargas fallidas.'}{reset}")
+    return ok
+
+
+# BENCHMARK DE LA TRANSFORMACIÓN: BUCLE (procesar.py) VS VECTORIZADA (procesar_vectorial.py)
+def bench_transformacion(repeticiones=3, n_series=2000):
+    import contextlib
+    import io
+    import json
+    import tempfile
+
+    from config.constantes import TEMPORALIDAD
+    from src import db
+    from src.almacenar import insertar_columnas, insertar_datos
+    from src.procesar import procesar_datos, reiniciar_vocabulario
+    from src.procesar_vectorial import procesar_datos_vectorial
+    from src.servidor_ine_local import payload_sintetico
+
+    # Temporalidad: la tabla con más dimensiones (sexo, contrato, jornada, geografía)
+    series = payload_sintetico(TEMPORALIDAD, n_series=n_series)
+    n_datos = sum(len(s["Data"]) for s in series)
+    # Las dos rutas parten del cuerpo en bruto, como llega del INE o del lago
+    contenido_json = json.dumps(series, ensure_ascii=False).encode("utf-8")
+    print(f"{turquesa}\n⚙️ TRANSFORMACIÓN + CARGA: {n_series} series, {n_datos} datos "
+          f"(mejor de {repeticiones}, BD vacía en cada repetición){reset}")
+
+    # (transformación desde bytes, carga) de cada ruta
+    rutas = {
+        "bucle": (lambda codigo, cuerpo: procesar_datos(codigo, json.loads(cuerpo)), insertar_datos),
+        "vectorial": (procesar_datos_vectorial, insertar_columnas),
+    }
+    ruta_original = db.DB_NAME
+    resultados, contenido = {}, {}
+    with tempfile.TemporaryDirectory() as carpeta:
+        try:
+            for nombre, (transformar, cargar) in rutas.items():
+                tiempos = []
+                for i in range(repeticiones):
+                    db.configurar_ruta(os.path.join(carpeta, f"{nombre}_{i}.db"))
+                    reiniciar_vocabulario()
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        db.crear_base_datos()
+                    t0 = time.perf_counter()
+                    datos = transformar(TEMPORALIDAD, contenido_json)
+                    t1 = time.perf_counter()
+                    filas = cargar("T_empleo", datos)
+                    tiempos.append((time.perf_counter() - t0, t1 - t0, time.perf_counter() - t1))
+                resultados[nombre] = (min(tiempos), filas)
+                # Contenido por nombres (no por ids) para comprobar que ambas rutas cargan lo mismo
+                with db.get_cursor() as cursor:
+                    cursor.execute("""
+                        SELECT p.fecha_key, g.nombre, s.nombre, tc.nombre, tj.nombre, e.valor
+                        FROM T_empleo e
+                        JOIN tbl_periodo p ON p.id_periodo = e.id_periodo
+                        JOIN tbl_geografia g ON g.id_geografia = e.id_geografia
+                        JOIN tbl_sexo s ON s.id_sexo = e.id_sexo
+                        JOIN tbl_tipo_contrato tc ON tc.id_tipo_contrato = e.id_tipo_contrato
+                        JOIN tbl_tipo_jornada tj ON tj.id_tipo_jornada = e.id_tipo_jornada
+                    """)
+                    contenido[nombre] = sorted(cursor.fetchall())
+        finally:
+            db.configurar_ruta(ruta_original)
+            reiniciar_vocabulario()
+
+    for nombre, ((total, transformacion, carga), filas) in resultados.items():
+        print(f"{nombre:<10} total {total:.3f}s (transformación {transformacion:.3f}s + carga {carga:.3f}s) | "
+              f"{filas} filas | {n_datos / total:,.0f} datos/s")
+    iguales = contenido["bucle"] == contenido["vectorial"]
+    (total_b, transf_b, _), _ = resultados["bucle"]
+    (total_v, transf_v, _), _ = resultados["vectorial"]
+    print(f"{lima if iguales else rojo}\n{'Mismo contenido' if iguales else 'El contenido difiere'}; "
+          f"vectorial {transf_b / transf_v:.1f}x en la transformación y {total_b / total_v:.1f}x en total.{reset}")
+    return iguales
+
+
+# BENCHMARK DE LECTURA: sqlite3 + read_database (tuplas de Python) VS connectorx (Arrow directo)
+# Cada configuración se mide en un intérprete nuevo para que el pico de memoria sea solo suyo
+_SONDA_LECTURA = """
+import json, resource, sys, time
+from src.capa_oro import leer_hechos
+base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+t0 = time.perf_counter()
+dfs = leer_hechos(sys.argv[1], sys.argv[2], int(sys.argv[3]))
+t = time.perf_counter() - t0
+pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base
+print(json.dumps({"segundos": t, "pico_kb": pico, "filas": sum(df.height for df in dfs),
+                  "mb": sum(df.estimated_size() for df in dfs) / 2 ** 20}))
+"""
+
+
+def _cargar_sintetico(n_series, factor=1.0):
+    """Transforma y carga n_series sintéticas por tabla del INE en la BD configurada en src.db"""
+    from config.constantes import EAES_OCUPACION, EAES_PERCENTILES, ETCL, IPC, IPV, TASA_PARO, TEMPORALIDAD
+    from src.almacenar import insertar_columnas
+    from src.procesar_vectorial import procesar_datos_vectorial
+    from src.servidor_ine_local import payload_sintetico
+
+    destinos = {
+        IPC: "T_precios", IPV: "T_precios", TASA_PARO: "T_empleo", TEMPORALIDAD: "T_empleo",
+        ETCL: "T_salarios", EAES_OCUPACION: "T_salarios", EAES_PERCENTILES: "T_salarios",
+    }
+    for codigo, tabla in destinos.items():
+        series = payload_sintetico(codigo, n_series=n_series)
+        if factor != 1.0:
+            # Valores revisados: obliga al UPSERT a reescribir todas las filas
+            for serie in series:
+                for dato in serie["Data"]:
+                    dato["Valor"] = round(dato["Valor"] * factor, 3)
+        insertar_columnas(tabla, procesar_datos_vectorial(codigo, series))
+
+
+def _bd_sintetica(ruta, n_series):
+    """Crea en `ruta` una BD con n_series sintéticas por tabla del INE (ruta vectorizada de carga)"""
+    import contextlib
+    import io
+
+    from src import db
+    from src.procesar import reiniciar_vocabulario
+
+    ruta_original = db.DB_NAME
+    try:
+        db.configurar_ruta(ruta)
+        with contextlib.redirect_stdout(io.StringIO()):
+            db.crear_base_datos()
+        _cargar_sintetico(n_series)
+    finally:
+        db.configurar_ruta(ruta_original)
+        reiniciar_vocabulario()
+
+
+def bench_lectura(repeticiones=3, n_series=1000, particiones=(1, 4)):
+    import tempfile
+
+    from src.acceso_datos import CONNECTORX_DISPONIBLE
+    from src.capa_oro import leer_hechos
+
+    if not CONNECTORX_DISPONIBLE:
+        print(f"{rojo}connectorx no está instalado: no hay nada que comparar.{reset}")
+        return False
+
+    # ru_maxrss viene en KB en Linux y en bytes en macOS
+    a_mb = 1024 ** 2 if sys.platform == "darwin" else 1024
+    configuraciones = [("sqlite3", 1)] + [("connectorx", p) for p in particiones]
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "lectura.db")
+        _bd_sintetica(ruta, n_series)
+        print(f"{turquesa}\n📥 LECTURA DE LOS HECHOS (leer_hechos): BD sintética de "
+              f"{os.path.getsize(ruta) / 2 ** 20:.0f} MB, mediana de {repeticiones} procesos{reset}")
+
+        for motor, n in configuraciones:
+            medidas = []
+            for _ in range(repeticiones):
+                salida = subprocess.run(
+                    [sys.executable, "-c", _SONDA_LECTURA, ruta, motor, str(n)],
+                    cwd=DIRECTORIO, capture_output=True, text=True, check=True,
+                )
+                medidas.append(json.loads(salida.stdout.strip().splitlines()[-1]))
+            segundos = statistics.median(m["segundos"] for m in medidas)
+            pico = statistics.median(m["pico_kb"] for m in medidas) / a_mb
+            print(f"{motor:<10} particiones {n} | {segundos:.3f}s | pico de memoria +{pico:.0f} MB | "
+                  f"{medidas[0]['filas']} filas ({medidas[0]['mb']:.0f} MB en Arrow)")
+
+        # Mismo contenido con los dos motores (las particiones pueden cambiar el orden de las filas)
+        ordenar = lambda df: df.sort(df.columns)
+        iguales = all(
+            ordenar(a).equals(ordenar(b))
+            for a, b in zip(leer_hechos(ruta, "sqlite3"), leer_hechos(ruta, "connectorx", max(particiones)))
+        )
+    print(f"{lima if iguales else rojo}\n{'Mismo contenido con ambos motores.' if iguales else 'El contenido difiere entre motores.'}{reset}")
+    return iguales
+
+
+# BENCHMARK DEL SNAPSHOT DE ORO: N PROCESOS CONSUMIDORES A LA VEZ, DESDE LA BD O MAPEANDO EL SNAPSHOT
+# Cada proceso carga los frames, los recorre enteros y espera a que el resto esté igual;
+# entonces todos miden su PSS (memoria propia + parte proporcional de la compartida)
+_SONDA_ORO = """
+import json, sys, time
+import polars as pl
+from src import snapshot_oro
+modo, db_path, raiz = sys.argv[1:4]
+t0 = time.perf_counter()
+if modo == "snapshot":
+    frames = snapshot_oro.abrir(snapshot_oro.generacion_vigente(db_path, raiz), raiz=raiz)
+else:
+    frames = snapshot_oro.construir_frames(db_path)
+carga = time.perf_counter() - t0
+for df in frames.values():
+    df.select(pl.all().hash().sum())
+print("listo", flush=True)
+sys.stdin.readline()
+pss = None
+try:
+    with open("/proc/self/smaps_rollup") as f:
+        pss = sum(int(l.split()[1]) for l in f if l.startswith("Pss:"))
+except OSError:
+    pass
+print(json.dumps({"carga": carga, "pss_kb": pss}), flush=True)
+"""
+
+
+def bench_oro(repeticiones=3, n_series=1000, procesos=4):
+    import tempfile
+
+    from src import snapshot_oro
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta, raiz = os.path.join(carpeta, "oro.db"), os.path.join(carpeta, "data_gold")
+        _bd_sintetica(ruta, n_series)
+        t0 = time.perf_counter()
+        generacion = snapshot_oro.publicar_desde_bd(ruta, raiz)
+        publicacion = time.perf_counter() - t0
+        tamano = sum(f["bytes"] for f in snapshot_oro.leer_manifiesto(generacion, raiz)["frames"].values())
+        print(f"{turquesa}\n🥇 SNAPSHOT DE LA CAPA DE ORO: {procesos} procesos consumidores a la vez "
+              f"(mediana de {repeticiones} rondas){reset}")
+        print(f"Publicación: {tamano / 2 ** 20:.0f} MB en Arrow IPC en {publicacion:.2f}s")
+
+        resultados = {}
+        for modo in ("bd", "snapshot"):
+            cargas, memorias = [], []
+            for _ in range(repeticiones):
+                hijos = [
+                    subprocess.Popen([sys.executable, "-c", _SONDA_ORO, modo, ruta, raiz], cwd=DIRECTORIO,
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+                    for _ in range(procesos)
+                ]
+                for hijo in hijos:
+                    hijo.stdout.readline()
+                medidas = []
+                for hijo in hijos:
+                    hijo.stdin.write("\n")
+                    hijo.stdin.flush()
+                for hijo in hijos:
+                    medidas.append(json.loads(hijo.stdout.readline()))
+                    hijo.wait()
+                cargas.append(statistics.median(m["carga"] for m in medidas))
+                if all(m["pss_kb"] is not None for m in medidas):
+                    memorias.append(sum(m["pss_kb"] for m in medidas) / 1024)
+            resultados[modo] = (statistics.median(cargas), statistics.median(memorias) if memorias else None)
+            carga, memoria = resultados[modo]
+            linea = f"{modo:<9} carga por proceso {carga:.3f}s"
+            if memoria is not None:
+                linea += f" | memoria total {memoria:.0f} MB (PSS de los {procesos} procesos)"
+            print(linea)
+
+    (carga_bd, memoria_bd), (carga_snap, memoria_snap) = resultados["bd"], resultados["snapshot"]
+    resumen = f"El snapshot carga {carga_bd / carga_snap:.0f}x más rápido"
+    if memoria_bd and memoria_snap:
+        resumen += f" y los {procesos} procesos ocupan {memoria_bd / memoria_snap:.1f}x menos memoria"
+    ok = carga_snap < carga_bd
+    print(f"{lima if ok else rojo}\n{resumen}.{reset}")
+    return ok
+
+
+# BENCHMARK DE INGESTA SIN CORTES: LATENCIA DE UN LECTOR MIENTRAS EL ETL ESCRIBE EN LA BD EN USO O EN LA SOMBRA
+_SONDA_LECTOR = """
+import json, sys, threading, time
+from src.acceso_datos import leer_consulta
+parar = threading.Event()
+threading.Thread(target=lambda: (sys.stdin.readline(), parar.set()), daemon=True).start()
+latencias, errores = [], 0
+print("listo", flush=True)
+while not parar.is_set():
+    t0 = time.perf_counter()
+    try:
+        leer_consulta("SELECT COUNT(*) AS n, AVG(valor) AS media FROM T_empleo", sys.argv[1])
+    except Exception:
+        errores += 1
+    latencias.append(time.perf_counter() - t0)
+    time.sleep(0.1)
+print(json.dumps({"latencias": latencias, "errores": errores}), flush=True)
+"""
+
+
+def bench_sombra(repeticiones=3, n_series=1000):
+    import shutil
+    import tempfile
+
+    from src import db, sombra
+    from src.procesar import reiniciar_vocabulario
+
+    def _percentil(valores, p):
+        valores = sorted(valores)
+        return valores[min(len(valores) - 1, int(p * len(valores)))]
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        base, viva = os.path.join(carpeta, "base.db"), os.path.join(carpeta, "viva.db")
+        _bd_sintetica(base, n_series)
+        print(f"{turquesa}\n🔁 INGESTA CON UN LECTOR CONSULTANDO A LA VEZ: BD de "
+              f"{os.path.getsize(base) / 2 ** 20:.0f} MB, se reescriben todas las filas "
+              f"({repeticiones} rondas){reset}")
+
+        resultados = {}
+        for modo in ("directa", "sombra"):
+            tiempos, latencias, errores = [], [], 0
+            for i in range(repeticiones):
+                shutil.copyfile(base, viva)
+                lector = subprocess.Popen([sys.executable, "-c", _SONDA_LECTOR, viva], cwd=DIRECTORIO,
+                                          stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+                lector.stdout.readline()
+                time.sleep(0.5)
+
+                ruta_original = db.DB_NAME
+                t0 = time.perf_counter()
+                try:
+                    if modo == "sombra":
+                        with sombra.base_sombra(viva):
+                            _cargar_sintetico(n_series, factor=1.01 + i / 100)
+                    else:
+                        db.configurar_ruta(viva)
+                        _cargar_sintetico(n_series, factor=1.01 + i / 100)
+                finally:
+                    db.configurar_ruta(ruta_original)
+                    reiniciar_vocabulario()
+                tiempos.append(time.perf_counter() - t0)
+
+                time.sleep(0.5)
+                lector.stdin.write("\n")
+                lector.stdin.flush()
+                datos = json.loads(lector.stdout.readline())
+                lector.wait()
+                latencias += datos["latencias"]
+                errores += datos["errores"]
+
+            resultados[modo] = (_percentil(latencias, 0.95), max(latencias), errores)
+            print(f"{modo:<8} ingesta {statistics.median(tiempos):.2f}s | lector: {len(latencias)} consultas, "
+                  f"mediana {statistics.median(latencias) * 1000:.0f} ms, p95 {resultados[modo][0] * 1000:.0f} ms, "
+                  f"máx {resultados[modo][1] * 1000:.0f} ms, {errores} errores")
+
+    (p95_d, max_d, _), (p95_s, max_s, errores_s) = resultados["directa"], resultados["sombra"]
+    ok = errores_s == 0 and max_s <= max_d
+    print(f"{lima if ok else rojo}\nCon la sombra el lector pasa de p95 {p95_d * 1000:.0f} ms / máx {max_d * 1000:.0f} ms "
+          f"a p95 {p95_s * 1000:.0f} ms / máx {max_s * 1000:.0f} ms.{reset}")
+    return ok
+
+
+def bench_formatos(repeticiones=3, n_series=200, filas=(100_000, 1_000_000)):
+    import tempfile
+
+    import polars as pl
+
+    from src.capa_oro import leer_hechos
+    from src.formatos import matriz_formatos, mejores
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "formatos.db")
+        _bd_sintetica(ruta, n_series)
+        _, df_salarios, _ = leer_hechos(ruta)
+
+    print(f"{turquesa}\n🗄️ FORMATOS DE ALMACENAMIENTO: hechos de salarios sintéticos "
+          f"(mediana de {repeticiones}){reset}")
+    matriz = matriz_formatos(
+        df_salarios,
+        filas=filas,
+        columnas=["fecha_key", "comunidad", "valor_salario"],
+        filtro=pl.col("anio") == df_salarios["anio"].max(),
+        repeticiones=repeticiones,
+    )
+    with pl.Config(tbl_rows=-1, tbl_hide_dataframe_shape=True, float_precision=4):
+        print(matriz.sort("filas", "tamano_mb"))
+
+    print(f"{lima}\nMejor formato con {max(filas):,} filas:{reset}")
+    for metrica, (formato, valor) in mejores(matriz).items():
+        print(f"   {metrica:<13} {formato} ({valor:.4f})")
+    # Comprobación mínima: algún formato binario ocupa menos y se lee más rápido que CSV
+    mayor = matriz.filter(pl.col("filas") == max(filas))
+    csv = mayor.filter(pl.col("formato") == "csv").row(0, named=True)
+    return mayor.filter(
+        (pl.col("tamano_mb") < csv["tamano_mb"]) & (pl.col("lectura_s") < csv["lectura_s"])
+    ).height > 0
+
+
+# BENCHMARK DE LOS TIPOS COMPACTOS: TEXTO Y FLOAT64 TAL CUAL FRENTE A ENUM, ENTEROS PEQUEÑOS Y FLOAT32
+def _agrupaciones(df_precios, df_salarios, df_empleo):
+    import polars as pl
+
+    return {
+        "precios": df_precios.group_by(["categoria_gasto", "indicador", "anio"]).agg(pl.col("valor_ipc").mean()),
+        "salarios": df_salarios.group_by(["sector_cnae", "sexo", "comunidad"]).agg(pl.col("valor_salario").mean()),
+        "empleo": df_empleo.group_by(["sexo", "indicador_empleo", "fecha_key"]).agg(pl.col("valor_empleo").mean()),
+    }
+
+
+def bench_tipos(repeticiones=3, n_series=1000):
+    import tempfile
+
+    import polars as pl
+
+    from src.capa_oro import construir_capa_oro, esquema_compacto, leer_hechos
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "tipos.db")
+        _bd_sintetica(ruta, n_series)
+        configuraciones = {
+            "texto/Float64": {},
+            "compacto": esquema_compacto(ruta, float32=False),
+            "compacto+F32": esquema_compacto(ruta, float32=True),
+        }
+        frames = {nombre: leer_hechos(ruta, esquema=esquema) for nombre, esquema in configuraciones.items()}
+
+    print(f"{turquesa}\n🧮 TIPOS DE LOS HECHOS: {sum(df.height for df in frames['texto/Float64']):,} filas sintéticas "
+          f"(group_by por dimensiones y Capa de Oro, mediana de {repeticiones}){reset}")
+    base = None
+    for nombre, dfs in frames.items():
+        mb = sum(df.estimated_size() for df in dfs) / 2 ** 20
+        tiempos_grupos, tiempos_oro = [], []
+        for _ in range(repeticiones):
+            t0 = time.perf_counter()
+            _agrupaciones(*dfs)
+            tiempos_grupos.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            construir_capa_oro(*dfs)
+            tiempos_oro.append(time.perf_counter() - t0)
+        medida = (mb, statistics.median(tiempos_grupos), statistics.median(tiempos_oro))
+        base = base or medida
+        print(f"{nombre:<14} {mb:>7.1f} MB (x{base[0] / mb:.1f}) | group_by {medida[1] * 1000:>7.1f} ms "
+              f"(x{base[1] / medida[1]:.1f}) | Capa de Oro {medida[2] * 1000:>7.1f} ms (x{base[2] / medida[2]:.1f})")
+
+    # Mismos grupos y medias con texto que con Enum (con Float64 los valores no cambian)
+    def normalizar(df):
+        return df.with_columns(pl.col(pl.Enum).cast(pl.String), pl.col(pl.Int8, pl.Int16, pl.Int32).cast(pl.Int64)).sort(df.columns)
+
+    iguales = all(
+        normalizar(a).equals(normalizar(b))
+        for a, b in zip(_agrupaciones(*frames["texto/Float64"]).values(), _agrupaciones(*frames["compacto"]).values())
+    )
+    menor = sum(df.estimated_size() for df in frames["compacto"]) < sum(df.estimated_size() for df in frames["texto/Float64"])
+    print(f"{lima if iguales else rojo}\n{'Mismos resultados con tipos compactos.' if iguales else 'Los resultados difieren con tipos compactos.'}{reset}")
+    return iguales and menor
+
+
+BENCHMARKS = {
+    "arranque": bench_arranque,
+    "http": bench_http,
+    "transformacion": bench_transformacion,
+    "lectura": bench_lectura,
+    "oro": bench_oro,
+    "sombra": bench_sombra,
+    "formatos": bench_formatos,
+    "tipos": bench_tipos,
+}
+
+
+def bench(argv):
+    parser = argparse.ArgumentParser(prog="cli.py bench", description="Benchmarks del proyecto")
+    parser.add_argument("objetivo", nargs="?", default="arranque", choices=list(BENCHMARKS))
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args(argv)
+    if not BENCHMARKS[args.objetivo](repeticiones=args.repeticiones):
+        sys.exit(1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Proyecto de datos socioeconómicos del INE",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="\n".join(f"  {nombre:<8} {ayuda}" for nombre, (_, ayuda) in SUBCOMANDOS.items()),
+    )
+    parser.add_argument("subcomando", choices=list(SUBCOMANDOS), metavar="subcomando")
+
+    # Solo se interpreta el subcomando; el resto de argumentos (incluido -h) se pasan tal cual
+    argv = sys.argv[1:] if argv is None else list(argv)
+    args = parser.parse_args(argv[:1])
+    resto = argv[1:]
+    if resto and args.subcomando == "export":
+        parser.error(f"'{args.subcomando}' no admite argumentos: {' '.join(resto)}")
+
+    cargar, _ = SUBCOMANDOS[args.subcomando]
+    ejecutar = cargar()
+    ejecutar(resto)
+
+
+if __name__ == "__main__":
+    main()
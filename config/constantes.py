@@ -7,3 +7,138 @@ EAES_OCUPACION = 28186
 TASA_PARO = 65334
 TEMPORALIDAD = 65132
 
+# Indicadores de T_salarios que son "el salario" en la Capa de Oro, la app y el modelado: uno
+# por fuente (EES por ocupación, media de la EES, coste salarial total de la ETCL). Mediana,
+# percentiles, etc. son otros estadísticos de los mismos asalariados y no se promedian con ellos
+INDICADORES_SALARIO = ("Salario_Anual_Ocupacion", "Media", "Coste salarial total")
+
+# Hiperparámetros del RandomForest (los escribe tuning.py, los leen app.py y modelado.py)
+RUTA_HIPERPARAMETROS_RF = "config/hiperparametros_rf.json"
+HIPERPARAMETROS_RF_DEFECTO = {
+    "n_estimators": 200,
+    "max_depth": 10,
+    "min_samples_split": 5,
+    "min_samples_leaf": 1,
+}
+
+# Informes HTML: por encima de este número de puntos por trazo se reduce (LTTB / rejilla)
+UMBRAL_PUNTOS_GRAFICO = 5000
+
+# Lago de datos en bruto: respuestas DATOS_TABLA comprimidas por fecha de descarga
+RUTA_LAGO = "lago"
+
+# Arranque en frío de cada subcomando de cli.py (segundos, importaciones incluidas)
+PRESUPUESTO_ARRANQUE = {
+    "ingest": 1.0,
+    "export": 1.5,
+    "analyze": 2.5,
+    "model": 4.0,
+    "serve": 0.5,
+    "schedule": 1.0,
+    "bench": 0.5,
+}
+# Módulos pesados que un subcomando no debe cargar al arrancar
+MODULOS_PROHIBIDOS = {
+    "ingest": ["sklearn", "plotly", "pandas", "polars"],
+    "export": ["sklearn", "plotly"],
+    "analyze": ["sklearn"],
+    "serve": ["sklearn", "plotly", "pandas", "polars"],
+    "schedule": ["sklearn", "plotly", "pandas", "polars"],
+    "bench": ["sklearn", "plotly", "pandas", "polars"],
+}
+
+# Modelo del simulador de app.py (se entrena con la primera predicción y se reutiliza)
+RUTA_MODELO_SALARIAL = "modelos/modelo_salarial.joblib"
+# "rf": one-hot + RandomForest; "hgb": HistGradientBoosting con las categorías como códigos ordinales
+MODELO_SALARIAL = "rf"
+HIPERPARAMETROS_HGB = {
+    "max_iter": 200,
+    "learning_rate": 0.1,
+    "max_leaf_nodes": 31,
+}
+
+# Cliente HTTP del INE: sesión compartida con reintentos (backoff exponencial + jitter)
+INE_TIMEOUT = (10, 60)          # (conexión, lectura) en segundos
+INE_REINTENTOS = 5
+INE_BACKOFF = 0.5               # 0.5s, 1s, 2s, 4s... entre reintentos
+INE_BACKOFF_JITTER = 0.5        # aleatorio añadido a cada espera (evita reintentos sincronizados)
+INE_CONEXIONES_POR_HOST = 4     # peticiones simultáneas máximas contra un mismo host
+
+# Lectura de la BD para análisis, dashboard, app y modelado (src/acceso_datos.py):
+# "connectorx" lee directamente a Arrow; "sqlite3" es la ruta clásica con tuplas de Python
+MOTOR_LECTURA = "connectorx"
+PARTICIONES_LECTURA = 1         # >1: rangos de fecha_key leídos en paralelo por connectorx
+# Valores de los hechos en Float32 en vez de Float64 (la mitad de memoria, ~7 cifras significativas)
+VALORES_FLOAT32 = False
+
+# Snapshot de la Capa de Oro en Arrow IPC que comparten dashboard, app y scripts (src/snapshot_oro.py)
+RUTA_ORO = "data_gold"
+GENERACIONES_ORO = 3            # generaciones que se conservan en disco (la vigente incluida)
+
+# Perfil de memoria de analisis_bigdata.py y modelado.py (--memoria o PERFIL_MEMORIA=1, src/memoria.py).
+# MB por script: "total" es el pico de RSS del proceso; el nombre de una etapa limita lo que crece en ella
+RUTA_PERFILES_MEMORIA = "perfiles_memoria"
+PRESUPUESTO_MEMORIA = {
+    "analisis_bigdata": {"total": 2048},
+    "modelado": {"total": 3072},
+}
+
+# Matriz de formatos de almacenamiento de generar_informes_csv (src/formatos.py): escalas en filas
+FILAS_MATRIZ_FORMATOS = (10_000, 100_000)
+
+# Descargas de la Capa de Oro en app.py (src/exportacion.py): una por generación, filtro y formato.
+# Streamlit sirve la carpeta static/ junto a app.py en app/static/ (server.enableStaticServing en
+# .streamlit/config.toml): el fichero se descarga desde disco sin cargarlo en memoria
+RUTA_ESTATICOS = "static"
+URL_ESTATICOS = "app/static"
+RUTA_EXPORTACIONES = "static/exportaciones"
+
+# Servicio local de predicción del modelo salarial (src/servicio_prediccion.py, `python cli.py serve`)
+PREDICCION_HOST = "127.0.0.1"
+PREDICCION_PUERTO = 8765
+PREDICCION_MAX_LOTE = 256       # perfiles máximos por llamada a predict
+PREDICCION_ESPERA_LOTE = 0.002  # segundos que espera un lote a que lleguen más peticiones
+PREDICCION_MAX_PERFILES = 10_000  # perfiles máximos en una misma petición
+PREDICCION_VENTANA_METRICAS = 10_000  # últimas peticiones con las que se calculan los percentiles
+
+# Carga histórica por ventanas de fechas (python main.py --backfill, src/backfill.py)
+RUTA_BACKFILL = "backfill"      # ventanas ya descargadas, para reanudar si la tabla no se completa
+BACKFILL_ANIO_INICIO = 2002     # primer año de las ventanas (la primera incluye también lo anterior)
+BACKFILL_ANIOS_VENTANA = 2      # años por ventana (?date=AAAA0101:AAAA1231)
+BACKFILL_TRABAJADORES = 4       # ventanas de una misma tabla que se descargan a la vez
+BACKFILL_REINTENTOS_VENTANA = 3  # intentos de cada ventana (además de los reintentos de la sesión)
+BACKFILL_CADUCIDAD_HORAS = 24   # una ventana guardada más antigua se vuelve a descargar
+
+# Planificador de la ingesta (python cli.py schedule, src/planificador.py)
+FRECUENCIA_TABLAS = {
+    IPC: "mensual",
+    IPV: "trimestral",
+    ETCL: "trimestral",
+    TASA_PARO: "trimestral",
+    TEMPORALIDAD: "trimestral",
+    EAES_OCUPACION: "anual",
+    EAES_PERCENTILES: "anual",
+}
+# Días hasta volver a mirar una tabla después de cargar un periodo nuevo (el siguiente no saldrá antes)
+ESPERA_PERIODO_NUEVO = {"mensual": 25, "trimestral": 80, "anual": 330}
+# Días entre comprobaciones mientras se espera a que el INE publique el periodo siguiente
+ESPERA_SIN_NOVEDADES = {"mensual": 1, "trimestral": 2, "anual": 7}
+RUTA_ESTADO_PLANIFICADOR = "estado_planificador.json"
+PLANIFICADOR_TABLAS_A_LA_VEZ = 2    # tablas que se refrescan a la vez como máximo
+PLANIFICADOR_JITTER = 0.1           # fracción aleatoria (0-10 %) que se suma a cada espera
+PLANIFICADOR_REINTENTO_MIN = 15     # minutos de espera tras un fallo (se duplica con cada fallo seguido)
+PLANIFICADOR_REINTENTO_MAX_H = 12   # tope de esa espera en horas
+PLANIFICADOR_TICK = 60              # segundos máximos entre revisiones del estado
+
+# Descarga selectiva de series (src/indice_series.py)
+RUTA_INDICE_SERIES = "indice_series"  # un JSON por tabla con los metadatos de sus series
+INDICE_SERIES_CADUCIDAD_DIAS = 7      # el índice (SERIES_TABLA) se vuelve a pedir pasado este tiempo
+INDICE_SERIES_PAGINA = 500            # series por página de SERIES_TABLA
+SERIES_TRABAJADORES = 8               # series de una misma tabla que se piden a la vez (DATOS_SERIE)
+# Tabla -> {dimensión del Nombre (ESPECIFICACION_NOMBRE): fragmentos admitidos}. Una serie entra si
+# cada dimensión contiene alguno de sus fragmentos (sin distinguir mayúsculas ni tildes). Las tablas
+# sin filtro se siguen descargando enteras con DATOS_TABLA.
+FILTRO_SERIES = {
+    # Solo el IPC General en índice: es lo que cruzan la Capa de Oro, el dashboard y los derivados
+    IPC: {"Categoria": ["general"], "Tipo_Dato": ["indice"]},
+}
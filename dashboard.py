@@ -1,7 +1,13 @@
 import streamlit as st
 import polars as pl
 import plotly.express as px
-import sqlite3
+import time
+from contextlib import contextmanager
+
+from src import snapshot_oro
+from src.capa_oro import construir_capa_oro, leer_hechos
+
+_t0_script = time.perf_counter()
 
 # CONFIGURACIÓN INICIAL
 
@@ -80,69 +86,31 @@ st.markdown("""
 
 DB_PATH = "proyecto_datos.db"
 
+# Generación de los datos: el snapshot Arrow publicado por el ETL o, si no lo hay, la de la
+# propia BD (cambia al sustituirla). Se consulta en cada ejecución del script: cuando hay
+# una nueva, todos los agregados cambian de clave y se recalculan sobre ella.
+GENERACION = snapshot_oro.generacion_lectura(DB_PATH)
+
 
 # CARGA Y PROCESAMIENTO 
 
-@st.cache_data
-def cargar_y_procesar():
-    conn = sqlite3.connect(DB_PATH)
-
-    # Queries 
-    query_precios = """
-    SELECT p.valor AS valor_ipc, p.categoria_gasto, t.fecha_iso, i.nombre as indicador
-    FROM T_precios p
-    JOIN tbl_periodo t ON p.id_periodo = t.id_periodo
-    JOIN tbl_indicador i ON p.id_indicador = i.id_indicador
-    """
-
-    query_salarios = """
-    SELECT s.valor AS valor_salario, s.sexo, s.sector_cnae, s.ocupacion_cno11,
-           t.fecha_iso, i.nombre as indicador_salario, g.nombre as comunidad
-    FROM T_salarios s
-    JOIN tbl_periodo t ON s.id_periodo = t.id_periodo
-    JOIN tbl_indicador i ON s.id_indicador = i.id_indicador
-    JOIN tbl_geografia g ON s.id_geografia = g.id_geografia
-    """
-
-    query_empleo = """
-    SELECT e.valor AS valor_empleo, e.sexo, t.fecha_iso, i.nombre as indicador_empleo
-    FROM T_empleo e
-    JOIN tbl_periodo t ON e.id_periodo = t.id_periodo
-    JOIN tbl_indicador i ON i.id_indicador = e.id_indicador
-    """
-
-    df_precios = pl.read_database(query=query_precios, connection=conn)
-    df_salarios = pl.read_database(query=query_salarios, connection=conn)
-    df_empleo = pl.read_database(query=query_empleo, connection=conn)
-    conn.close()
-
-    # Limpieza 
-    df_precios = df_precios.with_columns(pl.col("fecha_iso").str.to_date()).drop_nulls()
-    df_salarios = df_salarios.with_columns(pl.col("fecha_iso").str.to_date()).drop_nulls()
-    df_empleo = df_empleo.with_columns(pl.col("fecha_iso").str.to_date()).drop_nulls()
-
-    df_precios = df_precios.filter(pl.col("valor_ipc") > 0)
-    df_salarios = df_salarios.filter(pl.col("valor_salario") > 0)
-
-    df_ipc_general = df_precios.filter(
-        (pl.col("categoria_gasto") == "IPC General") &
-        (pl.col("indicador").str.contains("Indice"))
-    ).sort("fecha_iso")
-
-    df_unido = df_salarios.join(df_ipc_general, on="fecha_iso", how="inner")
-    df_analisis = df_unido.with_columns(
-        (pl.col("valor_salario") / pl.col("valor_ipc")).alias("ratio_poder_adquisitivo")
-    )
+# cache_resource (no cache_data): los frames mapeados se comparten entre sesiones sin
+# copiarlos; max_entries=1 suelta la generación anterior al cambiar de snapshot
+@st.cache_resource(max_entries=1)
+def cargar_y_procesar(generacion):
+    if snapshot_oro.es_snapshot(generacion):
+        oro = snapshot_oro.abrir(generacion, ["ipc_general", "relacion"])
+        return oro["ipc_general"], oro["relacion"]
 
-    df_paro = df_empleo.filter(pl.col("indicador_empleo") == "Tasa_Paro")
-    df_relacion = df_analisis.join(df_paro, on=["fecha_iso", "sexo"], how="inner")
+    # Sin snapshot: mismas queries y misma Capa de Oro que analisis_bigdata.py (src/capa_oro.py)
+    df_precios, df_salarios, df_empleo = leer_hechos(DB_PATH)
 
-    return df_ipc_general, df_relacion
+    df_ipc_general, df_relacion = construir_capa_oro(df_precios, df_salarios, df_empleo)
 
-df_ipc, df_final = cargar_y_procesar()
+    return df_ipc_general, df_relacion
 
 # ===========================
-# COORDENADAS PARA EL MAPA 
+# COORDENADAS PARA EL MAPA
 # ===========================
 coords = {
     "Andalucía": [37.38, -5.98], "Aragón": [41.65, -0.88], "Asturias, Principado de": [43.36, -5.84],
@@ -153,250 +121,323 @@ coords = {
     "País Vasco": [42.84, -2.67], "Rioja, La": [42.46, -2.44], "Ceuta": [35.88, -5.31], "Melilla": [35.29, -2.93]
 }
 
-# Creamos un dataframe para el mapa
-df_mapa = df_final.filter(pl.col("comunidad") != "Total Nacional").group_by("comunidad").agg([
-    pl.col("valor_salario").mean().alias("Salario Medio"),
-    pl.col("ratio_poder_adquisitivo").mean().alias("Poder Adquisitivo")
-]).to_pandas()
 
-df_mapa["lat"] = df_mapa["comunidad"].map(lambda x: coords.get(x, [None, None])[0])
-df_mapa["lon"] = df_mapa["comunidad"].map(lambda x: coords.get(x, [None, None])[1])
-df_mapa = df_mapa.dropna(subset=["lat"])
+# ==========================================
+# AGREGADOS MEMOIZADOS (uno por sección)
+# ==========================================
+# Cada sección tiene su propio agregado cacheado por su selección de filtros,
+# así una interacción solo recalcula (y convierte a pandas) lo de su gráfico.
 
+@st.cache_data
+def agregado_mapa(generacion):
+    _, df_final = cargar_y_procesar(generacion)
+    df_mapa = df_final.filter(pl.col("comunidad") != "Total Nacional").group_by("comunidad").agg([
+        pl.col("valor_salario").mean().alias("Salario Medio"),
+        pl.col("ratio_poder_adquisitivo").mean().alias("Poder Adquisitivo")
+    ]).to_pandas()
 
-# TÍTULO Y KPIs 
+    df_mapa["lat"] = df_mapa["comunidad"].map(lambda x: coords.get(x, [None, None])[0])
+    df_mapa["lon"] = df_mapa["comunidad"].map(lambda x: coords.get(x, [None, None])[1])
+    return df_mapa.dropna(subset=["lat"])
 
-st.markdown('<h1 class="main-title">Dashboard Socioeconómico Interactivo</h1>', unsafe_allow_html=True)
-st.markdown('<h3 class="sub-title">Análisis de IPC, Salarios y Poder Adquisitivo en España</h3>', unsafe_allow_html=True)
 
-# KPIs automáticos basados en tus datos
-ultimo_ipc = df_ipc.sort("fecha_iso").tail(1)["valor_ipc"][0]
-salario_avg = df_final["valor_salario"].mean()
-paro_avg = df_final["valor_empleo"].mean()
+@st.cache_data
+def calcular_kpis(generacion):
+    df_ipc, df_final = cargar_y_procesar(generacion)
+    ultimo_ipc = df_ipc.sort("fecha_key").tail(1)["valor_ipc"][0]
+    return ultimo_ipc, df_final["valor_salario"].mean(), df_final["valor_empleo"].mean()
 
-k1, k2, k3 = st.columns(3)
-k1.metric("IPC Actual", f"{ultimo_ipc:.2f}")
-k2.metric("Salario Medio", f"{salario_avg:,.2f} €")
-k3.metric("Tasa de Paro", f"{paro_avg:.2f} %")
 
-st.markdown("---")
+@st.cache_data
+def opciones_filtros(generacion):
+    df_ipc, df_final = cargar_y_procesar(generacion)
+    años_ipc = sorted(df_ipc["anio"].unique().to_list())
+    años_sal = sorted(df_final["anio"].unique().to_list())
+    comunidades = sorted(df_final.filter(pl.col("comunidad") != "Total Nacional").select("comunidad").unique().to_series().to_list())
+    sectores = sorted(df_final.filter((pl.col("sector_cnae") != "Total") & (pl.col("sector_cnae") != "N/A")).select("sector_cnae").unique().to_series().to_list())
+    return años_ipc, años_sal, comunidades, sectores
 
-# ===============================
-# SECCIÓN: MAPA DE DISTRIBUCIÓN
-# ===============================
-st.subheader("Distribución Geográfica de Salarios")
-
-# Selector con etiquetas blancas
-metrica_mapa = st.selectbox("Seleccionar métrica", ["Salario Medio", "Poder Adquisitivo"])
-
-fig_mapa = px.scatter_mapbox(
-    df_mapa,
-    lat="lat",
-    lon="lon",
-    size="Salario Medio",
-    color=metrica_mapa,
-    hover_name="comunidad",
-    color_continuous_scale=px.colors.sequential.Plasma_r,
-    size_max=20,
-    zoom=4.8,
-    center={"lat": 40.41, "lon": -3.70},
-    mapbox_style="carto-positron",          
-    template="plotly_dark",
-    height=600
-)
 
-# Ajustes de la leyenda
-fig_mapa.update_layout(
-    margin={"r":0, "t":0, "l":0, "b":0},
-    coloraxis_colorbar=dict(
-        title=dict(text=metrica_mapa, font=dict(color='white', size=14)),
-        tickfont=dict(color='white', size=15),
-        bgcolor="rgba(30,30,30,0.85)",
-        bordercolor="gray",
-        thickness=25,
-        len=0.8
+@st.cache_data
+def agregado_ipc(generacion, años_sel):
+    df_ipc, _ = cargar_y_procesar(generacion)
+    if "Todos" in años_sel:
+        return df_ipc.to_pandas()
+    return df_ipc.filter(pl.col("anio").is_in(años_sel)).to_pandas()
+
+
+@st.cache_data
+def agregado_salarios(generacion, años_sel, com_sel):
+    _, df_final = cargar_y_procesar(generacion)
+    df_sal_filtrado = df_final.filter(pl.col("comunidad") != "Total Nacional")
+    if "Todos" not in años_sel:
+        df_sal_filtrado = df_sal_filtrado.filter(pl.col("anio").is_in(años_sel))
+    if "Todos" not in com_sel:
+        df_sal_filtrado = df_sal_filtrado.filter(pl.col("comunidad").is_in(com_sel))
+
+    # Agrupamos y ordenamos para que la línea se dibuje correctamente
+    return (
+        df_sal_filtrado
+        .group_by(["fecha_key", "fecha_iso", "comunidad"])
+        .agg(pl.col("valor_salario").mean())
+        .sort("fecha_key")
+        .to_pandas()
     )
-)
 
-# Hover más legible sobre fondo claro
-fig_mapa.update_traces(
-    hoverlabel=dict(
-        bgcolor="rgba(0,0,0,0.8)",
-        font=dict(color="white")
+
+@st.cache_data
+def agregado_poder_adquisitivo(generacion, años_sel, sexo_sel, sector_sel):
+    _, df_final = cargar_y_procesar(generacion)
+    df_ratio_filtrado = df_final.filter((pl.col("sector_cnae") != "Total") & (pl.col("sector_cnae") != "N/A"))
+
+    if "Todos" not in años_sel:
+        df_ratio_filtrado = df_ratio_filtrado.filter(pl.col("anio").is_in(años_sel))
+    if "Todos" not in sexo_sel:
+        df_ratio_filtrado = df_ratio_filtrado.filter(pl.col("sexo").is_in(sexo_sel))
+    if "Todos" not in sector_sel:
+        df_ratio_filtrado = df_ratio_filtrado.filter(pl.col("sector_cnae").is_in(sector_sel))
+
+    # PROCESAMIENTO: Aquí usamos TODOS los datos para calcular la media
+    # Al agrupar así, Polars procesa las miles de filas de la DB instantáneamente
+    return (
+        df_ratio_filtrado
+        .group_by(["sector_cnae", "sexo"])
+        .agg(pl.col("ratio_poder_adquisitivo").mean()) # <--- Aquí se incluyen todos los datos
+        .sort("ratio_poder_adquisitivo", descending=True)
+        .to_pandas()
     )
-)
 
-st.plotly_chart(fig_mapa, use_container_width=True)
 
-# ====================
-# 1️ GRÁFICO IPC 
-# ====================
+# ======================================
+# MEDICIÓN DE LATENCIA POR INTERACCIÓN
+# ======================================
+# Se activa con ?latencias=1 en la URL. "Script completo" es lo que costaba
+# cualquier interacción antes de usar fragmentos; cada sección muestra lo
+# que cuesta ahora su propia re-ejecución.
+MOSTRAR_LATENCIAS = st.query_params.get("latencias") == "1"
+if "latencias" not in st.session_state:
+    st.session_state["latencias"] = {}
 
-st.subheader("Evolución Temporal del IPC")
+@contextmanager
+def medir_latencia(seccion):
+    t0 = time.perf_counter()
+    yield
+    ms = (time.perf_counter() - t0) * 1000
+    st.session_state["latencias"][seccion] = ms
+    if MOSTRAR_LATENCIAS:
+        completo = st.session_state["latencias"].get("Script completo")
+        referencia = f" | script completo: {completo:.0f} ms" if completo else ""
+        st.caption(f"⏱️ {seccion}: {ms:.0f} ms{referencia}")
 
-años_ipc = sorted(df_ipc.select(pl.col("fecha_iso").dt.year()).unique().to_series().to_list())
-opciones_ipc = ["Todos"] + años_ipc
 
-años_sel_ipc = st.multiselect("Seleccionar año(s)", opciones_ipc, default=["Todos"], key="ipc_años")
+# TÍTULO Y KPIs
 
-if "Todos" in años_sel_ipc:
-    df_ipc_filtrado = df_ipc
-else:
-    df_ipc_filtrado = df_ipc.filter(pl.col("fecha_iso").dt.year().is_in(años_sel_ipc))
+st.markdown('<h1 class="main-title">Dashboard Socioeconómico Interactivo</h1>', unsafe_allow_html=True)
+st.markdown('<h3 class="sub-title">Análisis de IPC, Salarios y Poder Adquisitivo en España</h3>', unsafe_allow_html=True)
 
-fig1 = px.line(
-    df_ipc_filtrado.to_pandas(),
-    x="fecha_iso", y="valor_ipc",
-    markers=True, template="plotly_dark",
-    title="1. Evolución Temporal del IPC General (Base 2021)",
-    color_discrete_sequence=["#00F5D4"]
-)
+# KPIs automáticos basados en tus datos
+ultimo_ipc, salario_avg, paro_avg = calcular_kpis(GENERACION)
 
-fig1.update_layout(
-    plot_bgcolor="#000000",
-    paper_bgcolor="#000000",
-    font=dict(color="white"), # Todo el texto en blanco
-    xaxis=dict(title="FECHA", gridcolor="#333333", tickfont=dict(color="white")),
-    yaxis=dict(title="IPC", gridcolor="#333333", tickfont=dict(color="white")),
-    title_font=dict(color="white")
-)
-st.plotly_chart(fig1, use_container_width=True)
+k1, k2, k3 = st.columns(3)
+k1.metric("IPC Actual", f"{ultimo_ipc:.2f}")
+k2.metric("Salario Medio", f"{salario_avg:,.2f} €")
+k3.metric("Tasa de Paro", f"{paro_avg:.2f} %")
 
-# =======================
-# 2️ GRÁFICO SALARIOS
-# =======================
+st.markdown("---")
 
-st.subheader("Evolución del Salario Medio por Comunidad Autónoma")
+años_ipc, años_sal, comunidades, sectores = opciones_filtros(GENERACION)
 
-col1, col2 = st.columns(2)
-años_sal = sorted(df_final.select(pl.col("fecha_iso").dt.year()).unique().to_series().to_list())
-comunidades = sorted(df_final.filter(pl.col("comunidad") != "Total Nacional").select("comunidad").unique().to_series().to_list())
 
-años_sel_sal = col1.multiselect("Seleccionar año(s)", ["Todos"] + años_sal, default=["Todos"], key="sal_años")
-com_sel = col2.multiselect("Seleccionar Comunidad(es) Autónoma(s)", ["Todos"] + comunidades, default=["Todos"], key="sal_comunidad")
+# ===============================
+# SECCIÓN: MAPA DE DISTRIBUCIÓN
+# ===============================
+@st.fragment
+def seccion_mapa():
+    with medir_latencia("Mapa"):
+        st.subheader("Distribución Geográfica de Salarios")
+
+        # Selector con etiquetas blancas
+        metrica_mapa = st.selectbox("Seleccionar métrica", ["Salario Medio", "Poder Adquisitivo"])
+
+        fig_mapa = px.scatter_mapbox(
+            agregado_mapa(GENERACION),
+            lat="lat",
+            lon="lon",
+            size="Salario Medio",
+            color=metrica_mapa,
+            hover_name="comunidad",
+            color_continuous_scale=px.colors.sequential.Plasma_r,
+            size_max=20,
+            zoom=4.8,
+            center={"lat": 40.41, "lon": -3.70},
+            mapbox_style="carto-positron",
+            template="plotly_dark",
+            height=600
+        )
+
+        # Ajustes de la leyenda
+        fig_mapa.update_layout(
+            margin={"r":0, "t":0, "l":0, "b":0},
+            coloraxis_colorbar=dict(
+                title=dict(text=metrica_mapa, font=dict(color='white', size=14)),
+                tickfont=dict(color='white', size=15),
+                bgcolor="rgba(30,30,30,0.85)",
+                bordercolor="gray",
+                thickness=25,
+                len=0.8
+            )
+        )
+
+        # Hover más legible sobre fondo claro
+        fig_mapa.update_traces(
+            hoverlabel=dict(
+                bgcolor="rgba(0,0,0,0.8)",
+                font=dict(color="white")
+            )
+        )
+
+        st.plotly_chart(fig_mapa, use_container_width=True)
 
-df_sal_filtrado = df_final.filter(pl.col("comunidad") != "Total Nacional")
-if "Todos" not in años_sel_sal:
-    df_sal_filtrado = df_sal_filtrado.filter(pl.col("fecha_iso").dt.year().is_in(años_sel_sal))
-if "Todos" not in com_sel:
-    df_sal_filtrado = df_sal_filtrado.filter(pl.col("comunidad").is_in(com_sel))
 
-# Agrupamos y ordenamos para que la línea se dibuje correctamente
-df_sal_plot = (
-    df_sal_filtrado
-    .group_by(["fecha_iso", "comunidad"])
-    .agg(pl.col("valor_salario").mean())
-    .sort("fecha_iso")
-    .to_pandas()
-)
+# ====================
+# 1️ GRÁFICO IPC
+# ====================
+@st.fragment
+def seccion_ipc():
+    with medir_latencia("IPC"):
+        st.subheader("Evolución Temporal del IPC")
+
+        opciones_ipc = ["Todos"] + años_ipc
+        años_sel_ipc = st.multiselect("Seleccionar año(s)", opciones_ipc, default=["Todos"], key="ipc_años")
+
+        fig1 = px.line(
+            agregado_ipc(GENERACION, tuple(años_sel_ipc)),
+            x="fecha_iso", y="valor_ipc",
+            markers=True, template="plotly_dark",
+            title="1. Evolución Temporal del IPC General (Base 2021)",
+            color_discrete_sequence=["#00F5D4"]
+        )
+
+        fig1.update_layout(
+            plot_bgcolor="#000000",
+            paper_bgcolor="#000000",
+            font=dict(color="white"), # Todo el texto en blanco
+            xaxis=dict(title="FECHA", gridcolor="#333333", tickfont=dict(color="white")),
+            yaxis=dict(title="IPC", gridcolor="#333333", tickfont=dict(color="white")),
+            title_font=dict(color="white")
+        )
+        st.plotly_chart(fig1, use_container_width=True)
 
-# Creamos la figura
-fig2 = px.line(
-    df_sal_plot, 
-    x="fecha_iso", y="valor_salario", color="comunidad",
-    markers=True, template="plotly_dark",
-    title="2. Tendencia del Salario Medio por Comunidad Autónoma",
-    color_discrete_sequence=px.colors.sequential.Viridis 
-)
 
-fig2.update_layout(
-    plot_bgcolor="#000000",
-    paper_bgcolor="#000000",
-    # 1. Color global
-    font=dict(color="white"), 
-    # 2. Color del título principal
-    title_font_color="white", 
-    # 3. Configuración detallada de ejes
-    xaxis=dict(
-        title=dict(text="FECHA", font=dict(color="white")),
-        tickfont=dict(color="white"),
-        gridcolor="#333333"
-    ),
-    yaxis=dict(
-        title=dict(text="SALARIO MEDIO (€)", font=dict(color="white")),
-        tickfont=dict(color="white"),
-        gridcolor="#333333"
-    ),
-    hovermode="x unified",
-    legend=dict(
-        orientation="h", 
-        y=-0.3, 
-        font=dict(color="white") # Letras de la leyenda en blanco
-    )
-)
+# =======================
+# 2️ GRÁFICO SALARIOS
+# =======================
+@st.fragment
+def seccion_salarios():
+    with medir_latencia("Salarios"):
+        st.subheader("Evolución del Salario Medio por Comunidad Autónoma")
+
+        col1, col2 = st.columns(2)
+        años_sel_sal = col1.multiselect("Seleccionar año(s)", ["Todos"] + años_sal, default=["Todos"], key="sal_años")
+        com_sel = col2.multiselect("Seleccionar Comunidad(es) Autónoma(s)", ["Todos"] + comunidades, default=["Todos"], key="sal_comunidad")
+
+        # Creamos la figura
+        fig2 = px.line(
+            agregado_salarios(GENERACION, tuple(años_sel_sal), tuple(com_sel)),
+            x="fecha_iso", y="valor_salario", color="comunidad",
+            markers=True, template="plotly_dark",
+            title="2. Tendencia del Salario Medio por Comunidad Autónoma",
+            color_discrete_sequence=px.colors.sequential.Viridis
+        )
+
+        fig2.update_layout(
+            plot_bgcolor="#000000",
+            paper_bgcolor="#000000",
+            # 1. Color global
+            font=dict(color="white"),
+            # 2. Color del título principal
+            title_font_color="white",
+            # 3. Configuración detallada de ejes
+            xaxis=dict(
+                title=dict(text="FECHA", font=dict(color="white")),
+                tickfont=dict(color="white"),
+                gridcolor="#333333"
+            ),
+            yaxis=dict(
+                title=dict(text="SALARIO MEDIO (€)", font=dict(color="white")),
+                tickfont=dict(color="white"),
+                gridcolor="#333333"
+            ),
+            hovermode="x unified",
+            legend=dict(
+                orientation="h",
+                y=-0.3,
+                font=dict(color="white") # Letras de la leyenda en blanco
+            )
+        )
+
+        fig2.update_traces(line=dict(width=2), marker=dict(size=6))
+        st.plotly_chart(fig2, use_container_width=True)
 
-fig2.update_traces(line=dict(width=2), marker=dict(size=6))
-st.plotly_chart(fig2, use_container_width=True)
 
 # ================================
-# 3️ GRÁFICO PODER ADQUISITIVO 
+# 3️ GRÁFICO PODER ADQUISITIVO
 # ================================
-
-st.subheader("Poder Adquisitivo Medio por Sector y Sexo")
-
-col3, col4, col5 = st.columns(3)
-sectores = sorted(df_final.filter((pl.col("sector_cnae") != "Total") & (pl.col("sector_cnae") != "N/A")).select("sector_cnae").unique().to_series().to_list())
-
-años_sel_ratio = col3.multiselect("Seleccionar año(s)", ["Todos"] + años_sal, default=["Todos"], key="ratio_años")
-sexo_sel = col4.multiselect("Seleccionar sexo(s)", ["Todos", "Hombres", "Mujeres"], default=["Todos"], key="ratio_sexo")
-sector_sel = col5.multiselect("Seleccionar Sector(es)", ["Todos"] + sectores, default=["Todos"], key="ratio_sector")
-
-# 1. Filtramos según la selección del usuario
-df_ratio_filtrado = df_final.filter((pl.col("sector_cnae") != "Total") & (pl.col("sector_cnae") != "N/A"))
-
-if "Todos" not in años_sel_ratio:
-    df_ratio_filtrado = df_ratio_filtrado.filter(pl.col("fecha_iso").dt.year().is_in(años_sel_ratio))
-if "Todos" not in sexo_sel:
-    df_ratio_filtrado = df_ratio_filtrado.filter(pl.col("sexo").is_in(sexo_sel))
-if "Todos" not in sector_sel:
-    df_ratio_filtrado = df_ratio_filtrado.filter(pl.col("sector_cnae").is_in(sector_sel))
-
-# PROCESAMIENTO: Aquí usamos TODOS los datos para calcular la media
-# Al agrupar así, Polars procesa las miles de filas de la DB instantáneamente
-df_resumen = (
-    df_ratio_filtrado
-    .group_by(["sector_cnae", "sexo"])
-    .agg(pl.col("ratio_poder_adquisitivo").mean()) # <--- Aquí se incluyen todos los datos
-    .sort("ratio_poder_adquisitivo", descending=True)
-    .to_pandas()
-)
-
-# Creación del gráfico: Barras horizontales 
-fig3 = px.bar(
-    df_resumen, 
-    y="sector_cnae", x="ratio_poder_adquisitivo",
-    color="sexo", barmode="group",
-    orientation='h', template="plotly_dark",
-    title="3. Ranking de Poder Adquisitivo por Sector y Sexo",
-    color_discrete_map={
-        "Hombres": "#9B5DE5",  # Morado
-        "Mujeres": "#00F5D4"   # Turquesa
-    }
-)
-
-fig3.update_layout(
-    plot_bgcolor="#000000",
-    paper_bgcolor="#000000",
-    # Color global y de título
-    font=dict(color="white"),
-    title_font_color="white",
-    # Eje X (Ratio)
-    xaxis=dict(
-        title=dict(text="RATIO PODER ADQUISITIVO (Media)", font=dict(color="white")),
-        tickfont=dict(color="white"),
-        gridcolor="#333333"
-    ),
-    # Eje Y (Sectores - Muy importante que sea blanco para leerlos)
-    yaxis=dict(
-        tickfont=dict(color="white"),
-        title=None # Quitamos el título "sector_cnae" para que quede más limpio
-    ),
-    legend=dict(
-        orientation="h", 
-        y=-0.2, 
-        font=dict(color="white")
-    ),
-    height=700, 
-    margin=dict(l=200) 
-)
-st.plotly_chart(fig3, use_container_width=True)
\ No newline at end of file
+@st.fragment
+def seccion_poder_adquisitivo():
+    with medir_latencia("Poder adquisitivo"):
+        st.subheader("Poder Adquisitivo Medio por Sector y Sexo")
+
+        col3, col4, col5 = st.columns(3)
+        años_sel_ratio = col3.multiselect("Seleccionar año(s)", ["Todos"] + años_sal, default=["Todos"], key="ratio_años")
+        sexo_sel = col4.multiselect("Seleccionar sexo(s)", ["Todos", "Hombres", "Mujeres"], default=["Todos"], key="ratio_sexo")
+        sector_sel = col5.multiselect("Seleccionar Sector(es)", ["Todos"] + sectores, default=["Todos"], key="ratio_sector")
+
+        # Creación del gráfico: Barras horizontales
+        fig3 = px.bar(
+            agregado_poder_adquisitivo(GENERACION, tuple(años_sel_ratio), tuple(sexo_sel), tuple(sector_sel)),
+            y="sector_cnae", x="ratio_poder_adquisitivo",
+            color="sexo", barmode="group",
+            orientation='h', template="plotly_dark",
+            title="3. Ranking de Poder Adquisitivo por Sector y Sexo",
+            color_discrete_map={
+                "Hombres": "#9B5DE5",  # Morado
+                "Mujeres": "#00F5D4"   # Turquesa
+            }
+        )
+
+        fig3.update_layout(
+            plot_bgcolor="#000000",
+            paper_bgcolor="#000000",
+            # Color global y de título
+            font=dict(color="white"),
+            title_font_color="white",
+            # Eje X (Ratio)
+            xaxis=dict(
+                title=dict(text="RATIO PODER ADQUISITIVO (Media)", font=dict(color="white")),
+                tickfont=dict(color="white"),
+                gridcolor="#333333"
+            ),
+            # Eje Y (Sectores - Muy importante que sea blanco para leerlos)
+            yaxis=dict(
+                tickfont=dict(color="white"),
+                title=None # Quitamos el título "sector_cnae" para que quede más limpio
+            ),
+            legend=dict(
+                orientation="h",
+                y=-0.2,
+                font=dict(color="white")
+            ),
+            height=700,
+            margin=dict(l=200)
+        )
+        st.plotly_chart(fig3, use_container_width=True)
+
+
+# Cada sección es un fragmento: al tocar uno de sus widgets solo se re-ejecuta esa función
+seccion_mapa()
+seccion_ipc()
+seccion_salarios()
+seccion_poder_adquisitivo()
+
+st.session_state["latencias"]["Script completo"] = (time.perf_counter() - _t0_script) * 1000
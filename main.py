@@ -1,3 +1,7 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from config.constantes import (
     IPC,
     IPV,
@@ -6,28 +10,169 @@ from config.constantes import (
     EAES_OCUPACION,
     EAES_PERCENTILES,
     ETCL,
+    INE_CONEXIONES_POR_HOST,
+    BACKFILL_ANIO_INICIO,
+    BACKFILL_ANIOS_VENTANA,
+    FILTRO_SERIES,
 )
 from src.inedata import INEDataExtractor
 from src.procesar import procesar_datos
-from src.almacenar import insertar_datos
+from src.almacenar import insertar_datos, insertar_columnas, cargar_huellas, guardar_huellas
 from src.db import DatabaseConnection, crear_base_datos
+from src import backfill, lago, sombra
+
+TABLAS = [IPC, IPV, TASA_PARO, TEMPORALIDAD, EAES_OCUPACION, EAES_PERCENTILES, ETCL]
+
+
+def _argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="ETL de tablas del INE")
+    parser.add_argument(
+        "--replay", nargs="?", const="ultimo", metavar="SNAPSHOT",
+        help="Reconstruye la BD desde un snapshot del lago sin usar la red (por defecto, el último)",
+    )
+    parser.add_argument("--forzar", action="store_true", help="Procesa todas las series aunque su huella no haya cambiado")
+    parser.add_argument("--sin-lago", action="store_true", help="No guarda las respuestas descargadas en el lago")
+    parser.add_argument("--vectorial", action="store_true", help="Usa la transformación vectorizada con Polars (src/procesar_vectorial.py)")
+    parser.add_argument("--sombra", action="store_true", help="Carga en una copia de la BD y la sustituye de forma atómica al terminar")
+    parser.add_argument("--sin-oro", action="store_true", help="No publica el snapshot Arrow de la Capa de Oro (data_gold/)")
+    parser.add_argument(
+        "--backfill", action="store_true",
+        help="Descarga la historia de cada tabla en ventanas de fechas paralelas y reanudables (src/backfill.py)",
+    )
+    parser.add_argument(
+        "--desde", type=int, metavar="AÑO",
+        help="Primer año del backfill; sin él se pide toda la historia (ventanas desde BACKFILL_ANIO_INICIO)",
+    )
+    parser.add_argument("--anios-ventana", type=int, default=BACKFILL_ANIOS_VENTANA, metavar="N", help="Años por ventana del backfill")
+    parser.add_argument(
+        "--tabla-completa", action="store_true",
+        help="Descarga entera (DATOS_TABLA) también las tablas con filtro de series en FILTRO_SERIES",
+    )
+    parser.add_argument("--listar-snapshots", action="store_true", help="Muestra los snapshots disponibles y termina")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _argumentos(argv)
+
+    if args.listar_snapshots:
+        for nombre, entrada in lago.cargar_indice()["snapshots"].items():
+            tablas = entrada["tablas"].values()
+            print(f"{nombre}: {len(tablas)} tablas, "
+                  f"{sum(t['bytes'] for t in tablas) / 1024:.0f} KB -> {sum(t['bytes_comprimidos'] for t in tablas) / 1024:.0f} KB")
+        return
 
+    snapshot = None
+    if args.replay:
+        snapshot = lago.ultimo_snapshot() if args.replay == "ultimo" else args.replay
+        if snapshot not in lago.listar_snapshots():
+            print(f"No existe el snapshot '{args.replay}' en el lago ({lago.RUTA_INDICE})")
+            return
+        print(f"Modo replay: reconstruyendo desde el snapshot {snapshot}")
+    elif not args.sin_lago:
+        snapshot = lago.nuevo_snapshot()
 
-def main():
+    # En replay se reprocesan todas las series: el objetivo es volver a aplicar la transformación
+    forzar = args.forzar or bool(args.replay)
 
-    db = DatabaseConnection().get_connection()
+    t0 = time.time()
+    if cargar(args, snapshot, forzar) is None:
+        return
+    print(f"ETL completado en {time.time() - t0:.2f}s" + (f" (snapshot {snapshot})" if snapshot else ""))
+
+    if not args.sin_oro:
+        publicar_capa_oro()
+
+
+def cargar(args, snapshot, forzar, tablas=TABLAS, trabajadores=INE_CONEXIONES_POR_HOST):
+    """
+    cargar_tablas en la BD en uso o, con --sombra, en una copia. Un replay reconstruye la BD
+    desde cero en una sombra vacía. None si la sombra no valida
+    """
+    if args.sombra or args.replay:
+        # La carga se hace en una copia de la BD que solo sustituye a la original si valida:
+        # los lectores no ven nunca una carga a medias ni esperan a los commits del ETL.
+        # En un replay la sombra empieza vacía: si han cambiado las reglas de limpieza o de
+        # _aplanar_nombre_serie, las filas con las etiquetas antiguas no se quedan en la BD
+        try:
+            with sombra.base_sombra(vacia=bool(args.replay)) as resumen:
+                transferencia, tablas_cargadas = cargar_tablas(args, snapshot, forzar, tablas, trabajadores)
+                faltan = [codigo for codigo, r in tablas_cargadas.items() if not r["obtenido"]]
+                if args.replay and faltan:
+                    # La BD reconstruida no tendría esas tablas: se perderían sus datos
+                    raise sombra.SombraInvalida(f"el replay no ha podido leer las tablas {', '.join(map(str, faltan))}")
+        except sombra.SombraInvalida as e:
+            print(f"La carga en la BD sombra no es válida, la BD en uso no se modifica: {e}")
+            return None
+        print("BD sustituida por la sombra. Filas: " + ", ".join(
+            f"{tabla} {resumen['antes'][tabla]} -> {resumen['despues'][tabla]}" for tabla in resumen["despues"]
+        ))
+    else:
+        transferencia, tablas_cargadas = cargar_tablas(args, snapshot, forzar, tablas, trabajadores)
+    if transferencia:
+        print(f"Descarga: {sum(m['bytes_red'] for m in transferencia) / 1024:.0f} KB transferidos, "
+              f"{sum(m['bytes'] for m in transferencia) / 1024:.0f} KB JSON, "
+              f"{sum(m['reintentos'] for m in transferencia)} reintentos")
+    return transferencia, tablas_cargadas
+
+
+def cargar_tablas(args, snapshot, forzar, tablas=TABLAS, trabajadores=INE_CONEXIONES_POR_HOST):
+    """
+    Descarga (o lee del lago), transforma y carga las tablas en la BD configurada en src.db.
+    Devuelve (métricas de transferencia, {codigo: resumen}); el resumen de cada tabla indica
+    si se obtuvo, cuántas filas se cargaron y el último periodo que trae la respuesta.
+    """
+    DatabaseConnection().get_connection()
     crear_base_datos()
 
-    tablas = [IPC, IPV, TASA_PARO, TEMPORALIDAD, EAES_OCUPACION, EAES_PERCENTILES, ETCL]
-    for codigo in tablas:
-        extractor = INEDataExtractor(codigo)
-        if extractor.obtener_datos():
-            datos_procesados = procesar_datos(codigo, extractor.raw_data)
-            
-            print("Procesando datos de tabla (Mostrando la primera fila)", codigo)
-            print(datos_procesados[0])
+    # Las descargas se lanzan en paralelo (limitadas por host en src/http_ine.py);
+    # la transformación y la carga en SQLite siguen en serie y en el orden de la lista
+    pool = ThreadPoolExecutor(max_workers=trabajadores)
+    extractores = {codigo: INEDataExtractor(codigo) for codigo in tablas}
+    if args.replay:
+        futuros = {codigo: pool.submit(ex.cargar_desde_lago, snapshot) for codigo, ex in extractores.items()}
+    elif args.backfill:
+        ventanas = backfill.ventanas(
+            args.desde or BACKFILL_ANIO_INICIO, anios=args.anios_ventana, historia_anterior=args.desde is None,
+        )
+        print(f"Backfill: {len(ventanas)} ventanas de {args.anios_ventana} años por tabla desde {ventanas[0][0]:%Y}")
+        if args.desde is not None:
+            print(f"Aviso: con --desde {args.desde} no se descargan los datos anteriores a {args.desde} "
+                  "(una descarga completa sí los trae)")
+        futuros = {codigo: pool.submit(ex.obtener_por_ventanas, snapshot, ventanas) for codigo, ex in extractores.items()}
+    else:
+        # Las tablas con filtro de series solo piden las series que se usan (src/indice_series.py)
+        futuros = {
+            codigo: pool.submit(ex.obtener_series_filtradas, snapshot, FILTRO_SERIES[codigo])
+            if codigo in FILTRO_SERIES and not args.tabla_completa else pool.submit(ex.obtener_datos, snapshot)
+            for codigo, ex in extractores.items()
+        }
+    transferencia = []
+    resumen = {codigo: {"obtenido": False, "filas": 0, "ultimo_periodo": None} for codigo in tablas}
+    # id_periodo cargados por tabla de hechos: los indicadores derivados solo recalculan esos años
+    periodos = {}
 
-            print("Número de filas a insertar", len(datos_procesados))
+    for codigo in tablas:
+        extractor = extractores[codigo]
+        obtenido = futuros[codigo].result()
+        if obtenido:
+            resumen[codigo]["obtenido"] = True
+            resumen[codigo]["ultimo_periodo"] = ultimo_periodo(extractor.raw_data)
+            if extractor.metricas:
+                m = extractor.metricas
+                transferencia.append(m)
+                print(f"Tabla {codigo}: {m['bytes_red'] / 1024:.0f} KB transferidos ({m['compresion']}, "
+                      f"{m['bytes'] / 1024:.0f} KB JSON) en {m['segundos']:.2f}s, {m['reintentos']} reintentos"
+                      + (f", {m['ventanas']} ventanas ({m['reanudadas']} reanudadas)" if "ventanas" in m else "")
+                      + (f", {m['series']} series" if "series" in m else ""))
+            # Solo se transforman y cargan las series cuya huella ha cambiado
+            huellas_guardadas = {} if forzar else cargar_huellas(codigo)
+            series = extractor.series_cambiadas(huellas_guardadas)
+            print(f"Tabla {codigo}: {len(series)} de {len(extractor.raw_data)} series nuevas o modificadas")
+            if not series:
+                if args.backfill:
+                    backfill.limpiar(codigo)
+                continue
 
             tabla_destino = ""
 
@@ -38,15 +183,80 @@ def main():
             elif codigo in [TASA_PARO, TEMPORALIDAD]:
                 tabla_destino = "T_empleo"
 
-            # Llamamos a almacenar pasándole el nombre
-            if tabla_destino and datos_procesados:
-                insertar_datos(tabla_destino, datos_procesados)
-                pass
+            if args.vectorial:
+                # Ruta vectorizada: Polars de principio a fin y carga por columnas
+                # (se importa aquí para que el ETL por defecto no cargue Polars)
+                from src.procesar_vectorial import procesar_datos_vectorial
+                # Si han cambiado todas las series se lee el cuerpo en bruto directamente a Arrow
+                entrada = extractor.contenido if len(series) == len(extractor.raw_data) and extractor.contenido else series
+                df_procesado = procesar_datos_vectorial(codigo, entrada)
+                print("Número de filas a insertar", 0 if df_procesado is None else df_procesado.height)
+                filas = None
+                if tabla_destino and df_procesado is not None and df_procesado.height:
+                    filas = insertar_columnas(tabla_destino, df_procesado)
+                    periodos.setdefault(tabla_destino, set()).update(df_procesado["id_periodo"].unique().to_list())
+            else:
+                datos_procesados = procesar_datos(codigo, series)
+            
+                print("Procesando datos de tabla (Mostrando la primera fila)", codigo)
+                if datos_procesados:
+                    print(datos_procesados[0])
+
+                print("Número de filas a insertar", len(datos_procesados))
+
+                # Llamamos a almacenar pasándole el nombre
+                filas = None
+                if tabla_destino and datos_procesados:
+                    filas = insertar_datos(tabla_destino, datos_procesados)
+                    periodos.setdefault(tabla_destino, set()).update(fila[0] for fila in datos_procesados)
+
+            # Las huellas se guardan solo si la carga ha ido bien, para reintentar si falla
+            if filas is not None:
+                print("Filas insertadas o actualizadas", filas)
+                resumen[codigo]["filas"] = filas
+                guardar_huellas(codigo, {
+                    clave: extractor.huellas[clave]
+                    for clave in (extractor.clave_serie(serie) for serie in series)
+                })
+                # Tabla cargada: sus ventanas del backfill ya no hacen falta para reanudar
+                if args.backfill:
+                    backfill.limpiar(codigo)
             # ---------------------------------------------------------
         else:
             print(f"No se pudieron obtener los datos de la tabla {codigo}")
 
+    pool.shutdown()
+
+    # Indicadores derivados (variaciones interanuales, temporalidad, poder adquisitivo):
+    # solo los años con datos nuevos, o todos si se reprocesa todo (Polars se importa aquí)
+    from src.derivados import calcular_derivados
+    t = time.time()
+    recalculados = calcular_derivados(None if forzar else periodos)
+    if recalculados:
+        print(f"Indicadores derivados en {time.time() - t:.2f}s: "
+              + ", ".join(f"{nombre} ({filas} filas)" for nombre, filas in recalculados.items()))
+
     DatabaseConnection().close()
+    return transferencia, resumen
+
+
+def ultimo_periodo(series):
+    """Fecha (AAAA-MM-DD) del periodo más reciente con dato en la respuesta, o None"""
+    fechas = [backfill.fecha_dato(dato) for serie in series or [] for dato in serie.get("Data", [])]
+    return max(fechas).isoformat() if fechas else None
+
+
+def publicar_capa_oro():
+    """Publica el snapshot Arrow de la Capa de Oro si falta o ya no refleja la BD"""
+    # Polars se importa aquí: el arranque del ETL no lo necesita
+    from src import db as base_datos, snapshot_oro
+
+    if snapshot_oro.generacion_vigente(base_datos.DB_NAME) is not None:
+        print("Capa de Oro: el snapshot vigente ya refleja la BD")
+        return
+    t = time.time()
+    generacion = snapshot_oro.publicar_desde_bd(base_datos.DB_NAME)
+    print(f"Capa de Oro publicada en {snapshot_oro.RUTA_ORO}/{generacion} ({time.time() - t:.2f}s)")
 
 
 if __name__ == "__main__":
@@ -5,60 +5,64 @@ turquesa = '\033[38;5;44m'
 lima = '\33[38;5;46m'
 reset = '\033[0m'
 
+import argparse
+import pickle
+import statistics
+import sys
+import time
+
 import polars as pl
-import pandas as pd
-import sqlite3
-import os
 import numpy as np
-import plotly.express as px
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.cluster import KMeans
-from sklearn.metrics import r2_score, mean_absolute_error, mean_squared_error, silhouette_score
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
+
+from src import memoria, modelo_salarial
+from src.acceso_datos import leer_consulta
+from src.capa_oro import FILTRO_SALARIOS, compactar, esquema_compacto
+from src.hiperparametros import cargar_hiperparametros_rf
+from src.informes import renderizar_informe
+
+# sklearn, pandas y plotly se importan dentro de cada función: así tuning.py y cli.py
+# pueden usar la carga de datos sin arrastrar toda la pila de modelado y gráficos
 
 DB_PATH = "proyecto_datos.db"
 VIS_DIR = "visualizaciones_modelado"
 
-os.makedirs(VIS_DIR, exist_ok=True)
-
 # CARGA DE DATOS (Versión ultra-robusta contra errores de esquema)
 def cargar_datos():
     print(f"{amarillo}\nCargando datos con limpieza profunda...{reset}")
-    conn = sqlite3.connect(DB_PATH)
-
-    # Forzamos que fecha_iso sea tratada como texto desde la base de datos
-    query = """
-    SELECT CAST(s.valor AS FLOAT) AS salario, 
-           CAST(s.sector_cnae AS TEXT) AS sector_cnae, 
-           CAST(s.sexo AS TEXT) AS sexo, 
-           CAST(g.nombre AS TEXT) AS comunidad,
-           CAST(t.fecha_iso AS TEXT) AS fecha_iso
+
+    # El periodo llega ya tipado (anio y fecha_key enteros) desde tbl_periodo; las dimensiones
+    # pasan a pl.Enum con el esquema compacto de la Capa de Oro (src/capa_oro.py)
+    query = f"""
+    SELECT s.valor AS salario,
+           sc.nombre AS sector_cnae,
+           sx.nombre AS sexo,
+           g.nombre AS comunidad,
+           t.anio,
+           t.fecha_key
     FROM T_salarios s
     INNER JOIN tbl_periodo t ON s.id_periodo = t.id_periodo
     INNER JOIN tbl_geografia g ON s.id_geografia = g.id_geografia
-    WHERE s.sector_cnae IS NOT NULL 
-      AND s.sexo != 'Total' 
-      AND t.fecha_iso IS NOT NULL
-      AND t.fecha_iso != ''
+    INNER JOIN tbl_sector_cnae sc ON s.id_sector_cnae = sc.id_sector_cnae
+    INNER JOIN tbl_sexo sx ON s.id_sexo = sx.id_sexo
+    INNER JOIN tbl_indicador i ON s.id_indicador = i.id_indicador
+    WHERE sx.nombre != 'Total' AND {FILTRO_SALARIOS}
     """
     
     # Cargamos y eliminamos cualquier rastro de nulos antes de transformar
-    df = pl.read_database(query=query, connection=conn).drop_nulls()
-    conn.close()
+    df = compactar(leer_consulta(query, DB_PATH).drop_nulls(), esquema_compacto(DB_PATH))
 
-    # Ahora sí extraemos el año y el sexo numérico de forma segura
-    df = df.with_columns([
-        pl.col("fecha_iso").str.slice(0, 4).cast(pl.Int32).alias("anio"),
-        pl.when(pl.col("sexo") == "Hombres").then(0).otherwise(1).alias("sexo_num")
-    ])
+    # El año ya llega como entero desde tbl_periodo; solo calculamos el sexo numérico
+    df = df.with_columns(
+        pl.when(pl.col("sexo") == "Hombres").then(0).otherwise(1).cast(pl.Int8).alias("sexo_num")
+    )
 
     print(f"{lima}Dataset cargado correctamente. Filas listas: {df.shape[0]}{reset}")
     return df
 
 # PROCESADO DE CATEGORÍAS
 def preparar_variables_ia(df):
+    from sklearn.preprocessing import OneHotEncoder
+
     data = df.to_pandas()
     encoder = OneHotEncoder(sparse_output=False, handle_unknown='ignore')
     categoricas = ['sector_cnae', 'comunidad']
@@ -68,16 +72,37 @@ def preparar_variables_ia(df):
     y = data['salario'].values
     return X, y, encoder.get_feature_names_out(categoricas)
 
+# Mismas variables, pero cada categoría es un código ordinal (0..n-1) en una sola columna:
+# el gradient boosting las trata como categóricas sin expandirlas a una columna por valor.
+# Con pl.Enum el rank sigue el orden de las categorías (id de la dimensión), no el alfabético:
+# los códigos solo identifican la categoría, así que el orden no cambia el modelo
+def preparar_variables_categoricas(df):
+    categoricas = ['sector_cnae', 'comunidad']
+    codigos = df.select(
+        pl.col('anio'), pl.col('sexo_num'),
+        *(pl.col(c).rank('dense').cast(pl.Int32) - 1 for c in categoricas),
+    )
+    X = codigos.to_numpy().astype(np.float64)
+    y = df['salario'].to_numpy()
+    return X, y, [False, False, True, True]
+
 # MATRIZ DE CORRELACIÓN
 def grafico_correlacion(df):
+    import plotly.express as px
+
     print(f"{amarillo}Generando matriz de correlación...{reset}")
     df_pd = df.select(["salario", "sexo_num", "anio"]).to_pandas()
     corr = df_pd.corr()
     fig = px.imshow(corr, text_auto=True, title="Correlación: Salario, Sexo y Año")
-    fig.write_html(f"{VIS_DIR}/correlacion.html")
+    return fig
 
 # REGRESIÓN LINEAL MÚLTIPLE
 def regresion_lineal(df):
+    import plotly.express as px
+    from sklearn.linear_model import LinearRegression
+    from sklearn.metrics import mean_absolute_error, r2_score
+    from sklearn.model_selection import train_test_split
+
     print(f"{turquesa}\nRegresión Lineal Múltiple{reset}")
     X, y, _ = preparar_variables_ia(df)
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
@@ -90,15 +115,21 @@ def regresion_lineal(df):
     print(f"{magenta}MAE:{reset}", mean_absolute_error(y_test, pred))
 
     fig = px.scatter(x=y_test, y=pred, title="Regresión: Salario Real vs Predicho", labels={'x': 'Real', 'y': 'Predicho'})
-    fig.write_html(f"{VIS_DIR}/regresion_lineal.html")
+    return fig
 
 # RANDOM FOREST
 def random_forest(df):
+    import pandas as pd
+    import plotly.express as px
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.metrics import r2_score
+    from sklearn.model_selection import train_test_split
+
     print(f"{turquesa}\nRandom Forest Regressor{reset}")
     X, y, nombres_col = preparar_variables_ia(df)
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-    modelo = RandomForestRegressor(n_estimators=200, max_depth=10,min_samples_split=5, random_state=42, n_jobs=-1)
+    modelo = RandomForestRegressor(**cargar_hiperparametros_rf(), random_state=42, n_jobs=-1)
     modelo.fit(X_train, y_train)
     pred = modelo.predict(X_test)
 
@@ -108,29 +139,78 @@ def random_forest(df):
     importancia = pd.DataFrame({"Var": todas_vars, "Imp": modelo.feature_importances_}).sort_values(by="Imp", ascending=False).head(10)
     
     fig = px.bar(importancia, x="Imp", y="Var", orientation='h', title="Top 10 Factores Determinantes")
-    fig.write_html(f"{VIS_DIR}/random_forest_importancia.html")
+    return fig
 
 # COMPARACIÓN DE MODELOS
+def _medir_modelo(modelo, X_train, X_test, y_train, y_test, repeticiones=50):
+    """R2, tiempo de ajuste, latencia de predicción (1 fila y lote de test) y memoria"""
+    from sklearn.metrics import r2_score
+
+    t0 = time.perf_counter()
+    modelo.fit(X_train, y_train)
+    ajuste = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    pred = modelo.predict(X_test)
+    lote = time.perf_counter() - t0
+
+    una_fila = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        modelo.predict(X_test[:1])
+        una_fila.append(time.perf_counter() - t0)
+
+    return {
+        "R2": r2_score(y_test, pred),
+        "Ajuste (s)": ajuste,
+        "Predicción 1 fila (ms)": 1000 * statistics.median(una_fila),
+        "Predicción test (ms)": 1000 * lote,
+        # Matriz de entrada (one-hot frente a códigos) + modelo serializado
+        "Memoria (MB)": (X_train.nbytes + len(pickle.dumps(modelo))) / 2 ** 20,
+        "Columnas": X_train.shape[1],
+    }
+
 def comparar_modelos(df):
+    import pandas as pd
+    import plotly.express as px
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.linear_model import LinearRegression
+    from sklearn.model_selection import train_test_split
+
     print(f"{turquesa}\nComparación de Modelos{reset}")
     X, y, _ = preparar_variables_ia(df)
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-    lr = LinearRegression().fit(X_train, y_train)
-    rf = RandomForestRegressor(n_estimators=50, n_jobs=1, random_state=42).fit(X_train, y_train)
-
-    r2_lr = r2_score(y_test, lr.predict(X_test))
-    r2_rf = r2_score(y_test, rf.predict(X_test))
+    X_cat, _, categoricas = preparar_variables_categoricas(df)
+    # Mismo reparto train/test para las dos codificaciones
+    idx_train, idx_test = train_test_split(np.arange(len(y)), test_size=0.2, random_state=42)
 
-    print(f"{magenta}R2 Regresión Lineal:{reset}", r2_lr)
-    print(f"{magenta}R2 RandomForest:{reset}", r2_rf)
+    candidatos = [
+        ("Regresión Lineal", LinearRegression(), X),
+        ("Random Forest", RandomForestRegressor(**cargar_hiperparametros_rf(), n_jobs=1, random_state=42), X),
+        ("Gradient Boosting (categorías nativas)", modelo_salarial.crear_hgb(categoricas), X_cat),
+    ]
+    resultados = []
+    for nombre, modelo, matriz in candidatos:
+        metricas = _medir_modelo(modelo, matriz[idx_train], matriz[idx_test], y[idx_train], y[idx_test])
+        resultados.append({"Modelo": nombre, **metricas})
+        print(f"{magenta}{nombre}:{reset} R2 {metricas['R2']:.4f} | ajuste {metricas['Ajuste (s)']:.2f}s | "
+              f"predicción 1 fila {metricas['Predicción 1 fila (ms)']:.2f} ms, test {metricas['Predicción test (ms)']:.1f} ms | "
+              f"{metricas['Memoria (MB)']:.1f} MB | {metricas['Columnas']} columnas")
 
-    df_comp = pd.DataFrame({"Modelo": ["Regresión Lineal", "Random Forest"], "R2": [r2_lr, r2_rf]})
-    fig = px.bar(df_comp, x="Modelo", y="R2", title="Comparativa R2")
-    fig.write_html(f"{VIS_DIR}/comparacion_modelos.html")
+    df_comp = pd.DataFrame(resultados).drop(columns="Columnas").melt(id_vars="Modelo", var_name="Métrica", value_name="Valor")
+    fig = px.bar(df_comp, x="Modelo", y="Valor", color="Modelo", facet_col="Métrica", facet_col_wrap=3,
+                 title="Comparativa de modelos: R2, tiempos y memoria")
+    fig.update_yaxes(matches=None, showticklabels=True)
+    fig.update_xaxes(showticklabels=False)
+    fig.for_each_annotation(lambda a: a.update(text=a.text.split("=")[-1]))
+    return fig
 
 # CLUSTERING
 def clustering(df):
+    import plotly.express as px
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import silhouette_score
+    from sklearn.preprocessing import StandardScaler
+
     print(f"{turquesa}\nClustering K-Means{reset}")
     df_pd = df.to_pandas()
     X = df_pd[["salario", "sexo_num", "anio"]]
@@ -146,17 +226,32 @@ def clustering(df):
     print(f"{magenta}Silhouette Score:{reset}", score)
 
     fig = px.scatter(df_pd, x="anio", y="salario", color="sexo", symbol="cluster", title="Clusters de Salarios")
-    fig.write_html(f"{VIS_DIR}/clustering.html")
+    return fig
 
 # MAIN
-def main():
-    df = cargar_datos()
-    grafico_correlacion(df)
-    regresion_lineal(df)
-    random_forest(df)
-    comparar_modelos(df)
-    clustering(df)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Entrena los modelos y genera sus gráficos")
+    parser.add_argument("--memoria", action="store_true",
+                        help="Perfil de memoria por etapas (también con PERFIL_MEMORIA=1)")
+    args = parser.parse_args(argv)
+
+    with memoria.PerfilMemoria("modelado", args.memoria or memoria.activado_por_entorno()) as perfil:
+        df = perfil.medir("cargar_datos", cargar_datos)
+        figuras = {}
+        for fichero, funcion in [
+            ("correlacion.html", grafico_correlacion),
+            ("regresion_lineal.html", regresion_lineal),
+            ("random_forest_importancia.html", random_forest),
+            ("comparacion_modelos.html", comparar_modelos),
+            ("clustering.html", clustering),
+        ]:
+            figuras[f"{VIS_DIR}/{fichero}"] = perfil.medir(funcion.__name__, funcion, df)
+        # Los HTML se escriben al final, en paralelo y con plotly.js compartido
+        perfil.medir("renderizar_informe", renderizar_informe, figuras)
     print(f"{lima}\nModelado completado con éxito. Puedes ver los gráficos en la carpeta:{reset} {VIS_DIR}")
 
+    if not perfil.finalizar():
+        sys.exit(1)
+
 if __name__ == "__main__":
     main()
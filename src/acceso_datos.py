@@ -0,0 +1,55 @@
+"""
+Lectura de la BD a DataFrames de Polars, compartida por todos los cargadores
+(analisis_bigdata, dashboard, app y modelado).
+
+Con connectorx la consulta se lee desde SQLite directamente a columnas Arrow en Rust
+(sin crear una tupla de Python por fila) y Polars adopta esos buffers sin copiarlos.
+Opcionalmente la consulta se parte en rangos de periodo (fecha_key) que se leen en
+paralelo, cada uno con su propia conexión. Si connectorx no está instalado se usa
+pl.read_database sobre sqlite3, la ruta de siempre.
+"""
+import importlib.util
+import os
+import sqlite3
+
+import polars as pl
+
+from config.constantes import MOTOR_LECTURA, PARTICIONES_LECTURA
+
+MOTORES = ("connectorx", "sqlite3")
+
+# Polars importa connectorx por su cuenta; aquí solo se comprueba que está instalado
+CONNECTORX_DISPONIBLE = importlib.util.find_spec("connectorx") is not None
+
+
+def uri_sqlite(db_path):
+    """URI de connectorx para un fichero SQLite (ruta absoluta: no depende del directorio de trabajo)"""
+    return f"sqlite://{os.path.abspath(db_path)}"
+
+
+def motor_efectivo(motor=None):
+    motor = motor or MOTOR_LECTURA
+    if motor not in MOTORES:
+        raise ValueError(f"Motor de lectura desconocido: {motor} (opciones: {', '.join(MOTORES)})")
+    return motor if motor != "connectorx" or CONNECTORX_DISPONIBLE else "sqlite3"
+
+
+def leer_consulta(query, db_path, motor=None, particiones=None, columna_particion="fecha_key"):
+    """
+    Ejecuta `query` sobre la BD y devuelve un DataFrame de Polars.
+    - motor: "connectorx" (Arrow directo) o "sqlite3" (tuplas de Python); por defecto MOTOR_LECTURA.
+    - particiones: nº de rangos de `columna_particion` leídos en paralelo (solo connectorx);
+      la columna tiene que ser entera y formar parte del SELECT.
+    """
+    particiones = PARTICIONES_LECTURA if particiones is None else particiones
+    if motor_efectivo(motor) == "connectorx":
+        opciones = {}
+        if particiones > 1:
+            opciones = {"partition_on": columna_particion, "partition_num": particiones}
+        return pl.read_database_uri(query, uri_sqlite(db_path), engine="connectorx", **opciones)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        return pl.read_database(query=query, connection=conn)
+    finally:
+        conn.close()
@@ -0,0 +1,125 @@
+"""
+Alineación de calendario entre indicadores de distinta frecuencia.
+El IPC es mensual, la ETCL y la EPA trimestrales y la EES anual: en lugar de
+cruzar por fecha exacta (y perder las filas que no coinciden), la serie de
+referencia se agrega a la frecuencia de cada hecho y se cruza con un join
+as-of sobre claves ordenadas. Todo son expresiones de Polars, sin bucles por fila.
+"""
+import polars as pl
+
+# Frecuencia -> intervalo de truncado de Polars
+FRECUENCIAS = {"mes": "1mo", "trimestre": "1q", "anio": "1y"}
+
+# Tolerancia por defecto del join as-of (un periodo hacia atrás). El join as-of
+# no admite meses de calendario, así que se expresa en días
+TOLERANCIAS = {"mes": "31d", "trimestre": "92d", "anio": "366d"}
+
+AGREGACIONES = {
+    "media": lambda c: pl.col(c).mean(),
+    "mediana": lambda c: pl.col(c).median(),
+    "suma": lambda c: pl.col(c).sum(),
+    "max": lambda c: pl.col(c).max(),
+    "min": lambda c: pl.col(c).min(),
+    "primero": lambda c: pl.col(c).first(),
+    "ultimo": lambda c: pl.col(c).last(),
+}
+
+
+def _expr_agregacion(valores):
+    # valores: lista de columnas (se agregan con la media) o {columna: agregación}
+    if not isinstance(valores, dict):
+        valores = {c: "media" for c in valores}
+    return [AGREGACIONES[agregacion](col).alias(col) for col, agregacion in valores.items()]
+
+
+def _expr_fecha_key(col_fecha):
+    fecha = pl.col(col_fecha)
+    return (fecha.dt.year() * 10000 + fecha.dt.month().cast(pl.Int32) * 100 + 1).alias("fecha_key")
+
+
+def inferir_frecuencia(df, por=(), col_mes="mes"):
+    """
+    Añade la columna "frecuencia" según los meses en los que publica cada serie
+    (agrupando por `por`): solo enero -> anio, 1/4/7/10 -> trimestre, resto -> mes.
+    """
+    meses = pl.col(col_mes)
+    frecuencia = (
+        pl.when((meses.n_unique() == 1) & (meses.first() == 1)).then(pl.lit("anio"))
+        .when(meses.is_in([1, 4, 7, 10]).all()).then(pl.lit("trimestre"))
+        .otherwise(pl.lit("mes"))
+        .alias("frecuencia")
+    )
+    por = list(por)
+    if not por:
+        return df.with_columns(df.select(frecuencia).to_series())
+    return df.join(df.group_by(por).agg(frecuencia), on=por, how="left")
+
+
+def a_frecuencia(df, frecuencia, valores, por=(), col_fecha="fecha_iso"):
+    """
+    Lleva los hechos a la frecuencia indicada (mes / trimestre / anio):
+    trunca la fecha al inicio del periodo y agrega `valores` por periodo y `por`.
+    """
+    return (
+        df.with_columns(pl.col(col_fecha).dt.truncate(FRECUENCIAS[frecuencia]))
+        .group_by([col_fecha, *por])
+        .agg(_expr_agregacion(valores))
+        .with_columns(_expr_fecha_key(col_fecha))
+        .sort(col_fecha)
+    )
+
+
+def alinear_asof(izquierda, derecha, por=(), col_fecha="fecha_iso", estrategia="backward", tolerancia=None):
+    """Join as-of sobre la fecha (ordenando ambos lados), opcionalmente por grupos"""
+    return izquierda.sort(col_fecha).join_asof(
+        derecha.sort(col_fecha),
+        on=col_fecha,
+        by=list(por) or None,
+        strategy=estrategia,
+        tolerance=tolerancia,
+        check_sortedness=False,
+    )
+
+
+def alinear(hechos, referencia, valores, por=(), frecuencia=None, frecuencia_por=(),
+            col_fecha="fecha_iso", tolerancia=None, descartar_sin_referencia=True):
+    """
+    Añade a cada hecho los `valores` de la serie de referencia agregados al periodo del hecho.
+
+    - frecuencia: fuerza una frecuencia objetivo; si es None se usa la propia de cada
+      serie de hechos (inferida agrupando por `frecuencia_por`).
+    - valores: columnas de la referencia, o {columna: agregación} (media, suma, ultimo...).
+    - tolerancia: hasta dónde puede retroceder el as-of si falta el periodo exacto
+      (por defecto un periodo de la frecuencia).
+    Las filas de hechos se conservan tal cual (misma fecha y orden cronológico).
+    """
+    columnas_hechos = hechos.columns
+    nombres_valores = list(valores)
+
+    if frecuencia is not None:
+        hechos = hechos.with_columns(pl.lit(frecuencia).alias("frecuencia"))
+    else:
+        hechos = inferir_frecuencia(hechos, frecuencia_por)
+
+    partes = []
+    # Como mucho tres iteraciones (una por frecuencia presente), no una por fila
+    for freq in hechos.get_column("frecuencia").unique().sort().to_list():
+        grupo = hechos.filter(pl.col("frecuencia") == freq).with_columns(
+            pl.col(col_fecha).dt.truncate(FRECUENCIAS[freq]).alias("_periodo")
+        )
+        ref = a_frecuencia(referencia, freq, valores, por=por, col_fecha=col_fecha).rename({col_fecha: "_periodo"})
+        partes.append(alinear_asof(
+            grupo, ref.select(["_periodo", *por, *nombres_valores]),
+            por=por, col_fecha="_periodo",
+            tolerancia=tolerancia or TOLERANCIAS[freq],
+        ))
+
+    if not partes:
+        return hechos.select(columnas_hechos).with_columns(
+            [pl.lit(None, dtype=referencia.schema[c]).alias(c) for c in nombres_valores]
+        )
+
+    resultado = pl.concat(partes, how="vertical_relaxed").select([*columnas_hechos, *nombres_valores])
+    if descartar_sin_referencia:
+        resultado = resultado.drop_nulls(subset=nombres_valores)
+    return resultado.sort(col_fecha, maintain_order=True)
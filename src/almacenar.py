@@ -2,51 +2,102 @@
 Recibe los datos procesados de procesar.py y los inserta en la BD
 """
 import sqlite3
+from datetime import datetime
 
 from src.db import get_cursor
 
+# Orden de las columnas de cada tabla de hechos en los INSERT (la última siempre es el valor)
+COLUMNAS_HECHOS = {
+    "T_precios": ["id_periodo", "id_indicador", "id_geografia", "id_categoria_gasto", "valor"],
+    "T_salarios": ["id_periodo", "id_indicador", "id_geografia", "id_sexo", "id_sector_cnae", "id_ocupacion_cno11", "valor"],
+    "T_empleo": ["id_periodo", "id_indicador", "id_geografia", "id_sexo", "id_grupo_edad", "id_tipo_jornada", "id_tipo_contrato", "valor"],
+}
+
 def insertar_datos( tabla, datos):
     
     if not datos:
         print(f"No existen datos para insertar en la tabla: {tabla}.")
-        return
+        return 0
 
     
     sql = ""
 
     
     # CONSULTAS SQL SEGUN LA TABLA DE DESTINO:
+    # UPSERT: si la fila ya existe (misma clave UNIQUE) se actualiza el valor,
+    # así las revisiones del INE sustituyen a los datos antiguos.
+    # El WHERE evita reescribir filas cuyo valor no ha cambiado.
     if tabla == "T_precios":
         sql = """
-        INSERT OR IGNORE INTO T_precios 
-        (id_periodo, id_indicador, id_geografia, categoria_gasto, valor) 
+        INSERT INTO T_precios 
+        (id_periodo, id_indicador, id_geografia, id_categoria_gasto, valor) 
         VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(id_periodo, id_indicador, id_geografia, id_categoria_gasto)
+        DO UPDATE SET valor = excluded.valor WHERE valor IS NOT excluded.valor
         """
-        #Ignore para evitar valores duplicados 
 
     elif tabla == "T_salarios":
         sql = """
-        INSERT OR IGNORE INTO T_salarios 
-        (id_periodo, id_indicador, id_geografia, sexo, sector_cnae, ocupacion_cno11, valor) 
+        INSERT INTO T_salarios 
+        (id_periodo, id_indicador, id_geografia, id_sexo, id_sector_cnae, id_ocupacion_cno11, valor) 
         VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(id_periodo, id_indicador, id_geografia, id_sexo, id_sector_cnae, id_ocupacion_cno11)
+        DO UPDATE SET valor = excluded.valor WHERE valor IS NOT excluded.valor
         """
 
     elif tabla == "T_empleo":
         sql = """
-        INSERT OR IGNORE INTO T_empleo 
-        (id_periodo, id_indicador, id_geografia, sexo, grupo_edad, tipo_jornada, tipo_contrato, valor) 
+        INSERT INTO T_empleo 
+        (id_periodo, id_indicador, id_geografia, id_sexo, id_grupo_edad, id_tipo_jornada, id_tipo_contrato, valor) 
         VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(id_periodo, id_indicador, id_geografia, id_sexo, id_grupo_edad, id_tipo_jornada, id_tipo_contrato)
+        DO UPDATE SET valor = excluded.valor WHERE valor IS NOT excluded.valor
         """
 
     else:
         print(f"La tabla '{tabla}' no existe")
-        return
+        return 0
 
+    # Los datos secretos/no disponibles del INE llegan con Valor nulo (valor es NOT NULL)
+    datos = [fila for fila in datos if fila[-1] is not None]
 
 
 # INSERCIÓN MASIVA DE DATOS 
     with get_cursor() as cursor:
         try:
             cursor.executemany(sql, datos)
+            return cursor.rowcount
         except sqlite3.Error as e:
             print(f"Se ha producido un error al insertar datos en la tabla {tabla}: {e}")
+            return None
+
+
+def insertar_columnas(tabla, df):
+    """Carga un DataFrame de Polars con las columnas de COLUMNAS_HECHOS[tabla] (ruta vectorizada)"""
+    if tabla not in COLUMNAS_HECHOS:
+        print(f"La tabla '{tabla}' no existe")
+        return 0
+    # Los nulos se filtran en Polars y las filas pasan directamente al mismo UPSERT masivo
+    df = df.select(COLUMNAS_HECHOS[tabla]).drop_nulls("valor")
+    return insertar_datos(tabla, df.rows())
+
+
+# CONTROL DE HUELLAS POR SERIE
+def cargar_huellas(codigo_tabla):
+    """Devuelve {cod_serie: huella} de la última carga correcta de la tabla"""
+    with get_cursor() as cursor:
+        cursor.execute("SELECT cod_serie, huella FROM tbl_control_series WHERE codigo_tabla = ?", (codigo_tabla,))
+        return dict(cursor.fetchall())
+
+
+def guardar_huellas(codigo_tabla, huellas):
+    """Guarda {cod_serie: (nombre, huella)} una vez cargadas las series"""
+    fecha = datetime.now().isoformat(timespec="seconds")
+    filas = [(codigo_tabla, cod, nombre, huella, fecha) for cod, (nombre, huella) in huellas.items()]
+    with get_cursor() as cursor:
+        cursor.executemany("""
+        INSERT INTO tbl_control_series (codigo_tabla, cod_serie, nombre, huella, fecha_carga)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(codigo_tabla, cod_serie)
+        DO UPDATE SET nombre = excluded.nombre, huella = excluded.huella, fecha_carga = excluded.fecha_carga
+        """, filas)
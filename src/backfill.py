@@ -0,0 +1,187 @@
+"""
+Carga histórica por ventanas de fechas (python main.py --backfill).
+
+En vez de pedir toda la historia de una tabla en una sola respuesta, se parte en ventanas
+de BACKFILL_ANIOS_VENTANA años con el parámetro de rango del INE
+(DATOS_TABLA/<codigo>?date=AAAAMMDD:AAAAMMDD) y:
+- las ventanas se descargan a la vez con BACKFILL_TRABAJADORES hilos por tabla (el semáforo
+  por host de src/http_ine.py sigue limitando las conexiones contra el INE),
+- una ventana que falla se reintenta sola, sin repetir las demás,
+- cada ventana descargada se guarda en RUTA_BACKFILL/<codigo>/, así que si la tabla no se
+  completa, la siguiente ejecución solo pide las que faltan,
+- al final las series se fusionan en orden cronológico, como si fueran una única respuesta.
+"""
+import gzip
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+from config.constantes import (
+    BACKFILL_ANIO_INICIO,
+    BACKFILL_ANIOS_VENTANA,
+    BACKFILL_CADUCIDAD_HORAS,
+    BACKFILL_REINTENTOS_VENTANA,
+    BACKFILL_TRABAJADORES,
+    INE_BACKOFF,
+    RUTA_BACKFILL,
+)
+from src.http_ine import descargar
+
+# FK_Periodo de los datos del INE -> mes en que empieza el periodo (trimestres y año)
+_MES_PERIODO = {**{m: m for m in range(1, 13)}, 19: 1, 20: 4, 21: 7, 22: 10, 28: 1}
+# Inicio de la primera ventana: lo que el INE tenga antes de BACKFILL_ANIO_INICIO entra en ella
+INICIO_HISTORIA = date(1900, 1, 1)
+
+# El campo Fecha del INE son milisegundos de la medianoche del primer día del periodo en Madrid
+ZONA_INE = ZoneInfo("Europe/Madrid")
+
+
+class VentanasIncompletas(Exception):
+    """Alguna ventana ha agotado sus reintentos; las descargadas quedan guardadas para reanudar"""
+
+
+def ventanas(desde=BACKFILL_ANIO_INICIO, hasta=None, anios=BACKFILL_ANIOS_VENTANA, historia_anterior=True):
+    """
+    [(primer día, último día)] en bloques de `anios` años, de `desde` al año `hasta` (incluido).
+    Con historia_anterior la primera ventana empieza en INICIO_HISTORIA: lo anterior a `desde`
+    se pide en esa ventana en lugar de perderse.
+    """
+    hasta = hasta or date.today().year
+    lista = [
+        (date(anio, 1, 1), date(min(anio + anios - 1, hasta), 12, 31))
+        for anio in range(desde, hasta + 1, anios)
+    ]
+    if historia_anterior and lista:
+        lista[0] = (INICIO_HISTORIA, lista[0][1])
+    return lista
+
+
+def parametro_fecha(ventana):
+    inicio, fin = ventana
+    return f"{inicio:%Y%m%d}:{fin:%Y%m%d}"
+
+
+def fecha_dato(dato):
+    """Fecha de inicio del periodo de un dato: Fecha (ms) si viene, si no Anyo y FK_Periodo"""
+    if dato.get("Fecha"):
+        # En UTC esa medianoche aún es el día anterior (el 1 de enero saldría 31 de diciembre)
+        return datetime.fromtimestamp(dato["Fecha"] / 1000, tz=ZONA_INE).date()
+    return date(int(dato["Anyo"]), _MES_PERIODO.get(dato.get("FK_Periodo"), 1), 1)
+
+
+def filtrar_rango(series, ventana):
+    """Series con solo los datos dentro de la ventana (lo que responde el INE a ?date=)"""
+    inicio, fin = ventana
+    return [
+        {**serie, "Data": [dato for dato in serie.get("Data", []) if inicio <= fecha_dato(dato) <= fin]}
+        for serie in series
+    ]
+
+
+def fusionar(respuestas):
+    """
+    Une las respuestas de las ventanas (en orden cronológico) en una sola lista de series:
+    cada serie conserva sus metadatos de la primera ventana en que aparece y sus datos se
+    concatenan en el orden de las ventanas, sin repetir periodos.
+    """
+    series = {}
+    vistos = {}
+    for respuesta in respuestas:
+        for serie in respuesta if isinstance(respuesta, list) else [respuesta]:
+            clave = serie.get("COD") or serie.get("Nombre", "")
+            if clave not in series:
+                series[clave] = {**serie, "Data": []}
+                vistos[clave] = set()
+            for dato in serie.get("Data", []):
+                periodo = (dato.get("Anyo"), dato.get("FK_Periodo"), dato.get("Fecha"))
+                if periodo not in vistos[clave]:
+                    vistos[clave].add(periodo)
+                    series[clave]["Data"].append(dato)
+    return list(series.values())
+
+
+# VENTANAS GUARDADAS (reanudación)
+def _carpeta(codigo):
+    return os.path.join(RUTA_BACKFILL, str(codigo))
+
+
+def _ruta_ventana(codigo, ventana):
+    return os.path.join(_carpeta(codigo), f"{parametro_fecha(ventana).replace(':', '-')}.json.gz")
+
+
+def _leer_guardada(codigo, ventana):
+    ruta = _ruta_ventana(codigo, ventana)
+    if not os.path.exists(ruta) or time.time() - os.path.getmtime(ruta) > BACKFILL_CADUCIDAD_HORAS * 3600:
+        return None
+    with gzip.open(ruta, "rb") as f:
+        return f.read()
+
+
+def _guardar(codigo, ventana, contenido):
+    ruta = _ruta_ventana(codigo, ventana)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    tmp = f"{ruta}.tmp"
+    with gzip.open(tmp, "wb", compresslevel=6) as f:
+        f.write(contenido)
+    os.replace(tmp, ruta)
+
+
+def limpiar(codigo):
+    """Borra las ventanas guardadas de una tabla (cuando ya se ha cargado)"""
+    shutil.rmtree(_carpeta(codigo), ignore_errors=True)
+
+
+def _descargar_ventana(url, codigo, ventana, sesion):
+    """(contenido, métricas) de una ventana, con BACKFILL_REINTENTOS_VENTANA intentos propios"""
+    for intento in range(1, BACKFILL_REINTENTOS_VENTANA + 1):
+        try:
+            r, metricas = descargar(f"{url}?date={parametro_fecha(ventana)}", sesion=sesion)
+            json.loads(r.content)  # una respuesta cortada no se guarda
+            _guardar(codigo, ventana, r.content)
+            metricas["reintentos"] += intento - 1
+            return r.content, metricas
+        except Exception as e:
+            print(f"[{codigo}] Ventana {parametro_fecha(ventana)}: intento {intento}/{BACKFILL_REINTENTOS_VENTANA} fallido ({e})")
+            if intento == BACKFILL_REINTENTOS_VENTANA:
+                raise
+            time.sleep(INE_BACKOFF * 2 ** intento)
+
+
+def descargar_ventanas(url, codigo, lista_ventanas, sesion=None, trabajadores=BACKFILL_TRABAJADORES):
+    """
+    Descarga (o reutiliza del disco) todas las ventanas y devuelve (series fusionadas, métricas).
+    Si alguna ventana falla tras sus reintentos lanza VentanasIncompletas.
+    """
+    t0 = time.perf_counter()
+    contenidos = {v: _leer_guardada(codigo, v) for v in lista_ventanas}
+    pendientes = [v for v in lista_ventanas if contenidos[v] is None]
+    metricas = {
+        "bytes_red": 0, "bytes": 0, "segundos": 0.0, "reintentos": 0, "compresion": "identity",
+        "ventanas": len(lista_ventanas), "reanudadas": len(lista_ventanas) - len(pendientes),
+    }
+
+    fallidas = []
+    with ThreadPoolExecutor(max_workers=trabajadores) as pool:
+        futuros = {v: pool.submit(_descargar_ventana, url, codigo, v, sesion) for v in pendientes}
+        for ventana, futuro in futuros.items():
+            try:
+                contenidos[ventana], m = futuro.result()
+            except Exception:
+                fallidas.append(parametro_fecha(ventana))
+                continue
+            for campo in ("bytes_red", "bytes", "reintentos"):
+                metricas[campo] += m[campo]
+            metricas["compresion"] = m["compresion"]
+    if fallidas:
+        raise VentanasIncompletas(
+            f"{len(fallidas)} de {len(lista_ventanas)} ventanas sin descargar ({', '.join(fallidas)}); "
+            f"las demás quedan en {_carpeta(codigo)} para la próxima ejecución"
+        )
+
+    series = fusionar(json.loads(contenidos[v]) for v in lista_ventanas)
+    metricas["segundos"] = time.perf_counter() - t0
+    return series, metricas
@@ -0,0 +1,159 @@
+"""
+Capa de Oro compartida por analisis_bigdata.py, dashboard.py y app.py:
+lectura de los hechos desde la BD y cruce salarios - IPC - paro.
+Los salarios son solo los indicadores de INDICADORES_SALARIO (ni la mediana ni los percentiles,
+ni los derivados de src/derivados.py); precios y empleo incluyen los derivados como un indicador más.
+
+Los frames se leen con un esquema compacto común (esquema_compacto): las columnas de texto
+son dimensiones con pocos valores y pasan a pl.Enum con los nombres de su tabla de dimensión,
+los campos del periodo a enteros pequeños y, con VALORES_FLOAT32, los valores a Float32.
+"""
+import polars as pl
+
+from config.constantes import INDICADORES_SALARIO, VALORES_FLOAT32
+from src.acceso_datos import leer_consulta
+from src.alineacion import alinear
+
+# Columna de los frames -> tabla de dimensión de la que salen sus valores. Todas las columnas
+# de una misma tabla comparten el Enum, así los cruces (p. ej. salarios y paro por sexo) casan
+DIMENSIONES = {
+    "categoria_gasto": "tbl_categoria_gasto",
+    "indicador": "tbl_indicador",
+    "indicador_salario": "tbl_indicador",
+    "indicador_empleo": "tbl_indicador",
+    "sexo": "tbl_sexo",
+    "sector_cnae": "tbl_sector_cnae",
+    "ocupacion_cno11": "tbl_ocupacion_cno11",
+    "comunidad": "tbl_geografia",
+}
+ENTEROS = {"fecha_key": pl.Int32, "anio": pl.Int16, "trimestre": pl.Int8, "mes": pl.Int8}
+VALORES = ("valor_ipc", "valor_salario", "valor_empleo", "salario")
+
+# Condición SQL de las consultas de salarios (alias i = tbl_indicador)
+FILTRO_SALARIOS = "i.nombre IN ({})".format(", ".join(f"'{nombre}'" for nombre in INDICADORES_SALARIO))
+
+QUERY_PRECIOS = """
+SELECT p.valor AS valor_ipc, c.nombre AS categoria_gasto, t.fecha_key, t.anio, t.trimestre, t.mes, i.nombre as indicador
+FROM T_precios p
+JOIN tbl_periodo t ON p.id_periodo = t.id_periodo
+JOIN tbl_indicador i ON p.id_indicador = i.id_indicador
+JOIN tbl_categoria_gasto c ON p.id_categoria_gasto = c.id_categoria_gasto
+"""
+
+QUERY_SALARIOS = f"""
+SELECT s.valor AS valor_salario, sx.nombre AS sexo, TRIM(sc.nombre) AS sector_cnae, oc.nombre AS ocupacion_cno11,
+       t.fecha_key, t.anio, t.trimestre, t.mes,
+       i.nombre as indicador_salario, g.nombre as comunidad
+FROM T_salarios s
+JOIN tbl_periodo t ON s.id_periodo = t.id_periodo
+JOIN tbl_indicador i ON s.id_indicador = i.id_indicador
+JOIN tbl_geografia g ON s.id_geografia = g.id_geografia
+JOIN tbl_sexo sx ON s.id_sexo = sx.id_sexo
+JOIN tbl_sector_cnae sc ON s.id_sector_cnae = sc.id_sector_cnae
+JOIN tbl_ocupacion_cno11 oc ON s.id_ocupacion_cno11 = oc.id_ocupacion_cno11
+WHERE {FILTRO_SALARIOS}
+"""
+
+QUERY_EMPLEO = """
+SELECT e.valor AS valor_empleo, sx.nombre AS sexo, t.fecha_key, t.anio, t.trimestre, t.mes, i.nombre as indicador_empleo
+FROM T_empleo e
+JOIN tbl_periodo t ON e.id_periodo = t.id_periodo
+JOIN tbl_indicador i ON i.id_indicador = e.id_indicador
+JOIN tbl_sexo sx ON e.id_sexo = sx.id_sexo
+"""
+
+# Salarios del simulador de app.py (sin sector N/A)
+QUERY_SIMULADOR = f"""
+SELECT s.valor AS salario, sc.nombre AS sector_cnae, sx.nombre AS sexo, g.nombre AS comunidad, t.fecha_key, t.anio, t.mes
+FROM T_salarios s
+JOIN tbl_periodo t ON s.id_periodo = t.id_periodo
+JOIN tbl_indicador i ON s.id_indicador = i.id_indicador
+JOIN tbl_geografia g ON s.id_geografia = g.id_geografia
+JOIN tbl_sector_cnae sc ON s.id_sector_cnae = sc.id_sector_cnae
+JOIN tbl_sexo sx ON s.id_sexo = sx.id_sexo
+WHERE sc.nombre != 'N/A' AND {FILTRO_SALARIOS}
+"""
+
+
+def esquema_compacto(db_path, motor=None, float32=None):
+    """
+    {columna: tipo} para compactar los frames leídos de la BD. Las categorías de cada Enum son
+    los nombres de su tabla de dimensión en orden de id (sin espacios sobrantes), no solo los
+    que aparecen en un frame: todos los frames leídos de la misma BD tienen el mismo Enum.
+    """
+    tablas = sorted(set(DIMENSIONES.values()))
+    query = " UNION ALL ".join(f"SELECT '{tabla}' AS tabla, nombre, id_{tabla[4:]} AS id FROM {tabla}" for tabla in tablas)
+    nombres = leer_consulta(query, db_path, motor, particiones=1)
+    categorias = {}
+    for tabla in tablas:
+        columna = nombres.filter(pl.col("tabla") == tabla).sort("id").get_column("nombre")
+        categorias[tabla] = pl.concat([columna, columna.str.strip_chars()]).unique(maintain_order=True).to_list()
+    esquema = {columna: pl.Enum(categorias[tabla]) for columna, tabla in DIMENSIONES.items()} | ENTEROS
+    if VALORES_FLOAT32 if float32 is None else float32:
+        esquema |= {columna: pl.Float32 for columna in VALORES}
+    return esquema
+
+
+def compactar(df, esquema):
+    """Aplica a df los tipos del esquema de las columnas que tiene"""
+    return df.cast({columna: tipo for columna, tipo in esquema.items() if columna in df.columns})
+
+
+def leer_hechos(db_path, motor=None, particiones=None, esquema=None):
+    """
+    Devuelve (precios, salarios, empleo) con la fecha compuesta desde los enteros del periodo.
+    esquema: el de esquema_compacto (por defecto se lee de la BD); {} deja los tipos de la consulta.
+    """
+    esquema = esquema_compacto(db_path, motor) if esquema is None else esquema
+    fecha = pl.date(pl.col("anio"), pl.col("mes"), 1).alias("fecha_iso")
+    return tuple(
+        compactar(leer_consulta(query, db_path, motor, particiones), esquema).with_columns(fecha)
+        for query in (QUERY_PRECIOS, QUERY_SALARIOS, QUERY_EMPLEO)
+    )
+
+
+def leer_simulador(db_path, motor=None, esquema=None):
+    """Salarios para el simulador de app.py, con la fecha compuesta desde los enteros del periodo"""
+    esquema = esquema_compacto(db_path, motor) if esquema is None else esquema
+    fecha = pl.date(pl.col("anio"), pl.col("mes"), 1).alias("fecha_iso")
+    return compactar(leer_consulta(QUERY_SIMULADOR, db_path, motor), esquema).with_columns(fecha).drop("mes")
+
+
+def construir_capa_oro(df_precios, df_salarios, df_empleo):
+    """
+    Devuelve (df_ipc_general, df_relacion).
+    Cada salario se cruza con el IPC General y con la tasa de paro de su sexo
+    agregados (media) a la frecuencia de su propia serie: anual (EES) o trimestral (ETCL).
+    """
+    # Limpieza: quitamos nulos, espacios y valores negativos o basura
+    df_precios = df_precios.drop_nulls().filter(pl.col("valor_ipc") > 0)
+    # Los espacios del sector (que darían N/A falsos) ya se quitan en QUERY_SALARIOS
+    df_salarios = df_salarios.drop_nulls().filter(pl.col("valor_salario") > 0)
+    df_empleo = df_empleo.drop_nulls()
+
+    # IPC General (índice). Se filtra también por el indicador exacto: las variaciones del IPC
+    # comparten categoría y el índice de vivienda (IPV General) no debe mezclarse nunca
+    df_ipc_general = df_precios.filter(
+        (pl.col("categoria_gasto") == "IPC General") &
+        (pl.col("indicador") == "IPC Indice")
+    ).sort("fecha_key")
+
+    # Salarios + IPC del mismo periodo -> ratio de poder adquisitivo
+    df_analisis = alinear(
+        df_salarios, df_ipc_general,
+        valores={"valor_ipc": "media", "categoria_gasto": "primero", "indicador": "primero"},
+        frecuencia_por=["indicador_salario"],
+    ).with_columns(
+        (pl.col("valor_salario") / pl.col("valor_ipc")).alias("ratio_poder_adquisitivo")
+    )
+
+    # Relación empleo-salarios: tasa de paro del mismo periodo y sexo
+    df_paro = df_empleo.filter(pl.col("indicador_empleo") == "Tasa_Paro")
+    df_relacion = alinear(
+        df_analisis, df_paro,
+        valores={"valor_empleo": "media", "indicador_empleo": "primero"},
+        por=["sexo"],
+        frecuencia_por=["indicador_salario"],
+    ).sort("fecha_key", maintain_order=True)
+
+    return df_ipc_general, df_relacion
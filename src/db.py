@@ -11,6 +11,18 @@ from contextlib import contextmanager
 
 DB_NAME = 'proyecto_datos.db'
 
+# Valor que sustituye a NULL en las dimensiones codificadas (así las claves UNIQUE funcionan)
+NO_APLICA = "No aplica"
+
+# Dimensiones de texto de cada tabla de hechos. Cada columna X se guarda como
+# id_X apuntando a su propio lookup tbl_X (id_X, nombre)
+DIMENSIONES_HECHOS = {
+    "T_precios": ["categoria_gasto"],
+    "T_salarios": ["sexo", "sector_cnae", "ocupacion_cno11"],
+    "T_empleo": ["sexo", "grupo_edad", "tipo_jornada", "tipo_contrato"],
+}
+CLAVES_HECHOS = {"T_precios": "id_precio", "T_salarios": "id_salario", "T_empleo": "id_empleo"}
+
 class DatabaseConnection:
     _instance = None
     _connection = None
@@ -46,6 +58,32 @@ class DatabaseConnection:
             self._connection = None # Resetea oara permitir una nueva conexion si es necesario
     
 
+def configurar_ruta(ruta):
+    """Cambia el fichero de BD (cierra la conexión abierta; la siguiente usa la nueva ruta)"""
+    global DB_NAME
+    DatabaseConnection().close()
+    DB_NAME = ruta
+
+
+# Ajustes para cargar en la BD sombra (src/sombra.py): nadie la lee mientras se construye y,
+# si el proceso muere a medias, se descarta, así que se prescinde de los fsync y del diario
+# en disco. El diario queda en memoria para que los rollback de get_cursor sigan funcionando.
+PRAGMAS_CARGA_RAPIDA = {
+    "journal_mode": "MEMORY",
+    "synchronous": "OFF",
+    "locking_mode": "EXCLUSIVE",
+    "temp_store": "MEMORY",
+    "cache_size": -131072,  # 128 MB
+}
+
+
+def configurar_carga_rapida():
+    """Aplica PRAGMAS_CARGA_RAPIDA a la conexión actual (solo duran lo que dure la conexión)"""
+    conn = DatabaseConnection().get_connection()
+    for pragma, valor in PRAGMAS_CARGA_RAPIDA.items():
+        conn.execute(f"PRAGMA {pragma} = {valor}")
+
+
 @contextmanager
 def get_cursor():
     """
@@ -66,6 +104,11 @@ def get_cursor():
 def crear_base_datos():
     with get_cursor() as cursor:
 
+        # Migración en caliente: las BD antiguas guardaban las dimensiones como TEXTO
+        # en los hechos. Se apartan aquí y se copian codificadas al final, todo en
+        # una única transacción (los lectores ven la versión anterior hasta el commit)
+        tablas_texto = _apartar_hechos_con_texto(cursor)
+
         # --------------------------------------------------------------
         # TABLAS DE DIMENSIONES (LOOKUPS)
         # --------------------------------------------------------------
@@ -76,15 +119,22 @@ def crear_base_datos():
         # Se eliminó esa estructura porque hacía más difícil combinar datos.
         # Ahora existe un único lookup con flexibilidad para IPC (mensual),
         # IPV (trimestral), ETCL (trimestral) y EES (anual).
+        # Además de fecha_iso (texto, para CSV/Tableau) lleva una clave entera
+        # fecha_key (yyyymmdd) y año/trimestre/mes ya calculados, para que los
+        # consumidores filtren y crucen por enteros sin parsear fechas.
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS tbl_periodo (
             id_periodo INTEGER PRIMARY KEY,
             anio INTEGER NOT NULL,
-            trimestre INTEGER, -- NULL si es mensual o anual
-            mes INTEGER, -- NULL si es trimestral o anual
+            trimestre INTEGER NOT NULL, -- 1..4 (trimestre natural de la fecha)
+            mes INTEGER NOT NULL, -- 1..12 (primer mes del periodo)
+            fecha_key INTEGER NOT NULL, -- yyyymmdd
             fecha_iso TEXT NOT NULL UNIQUE -- YYYY-MM-DD 
         );
         """)
+        _migrar_claves_periodo(cursor)
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_periodo_fecha_key ON tbl_periodo(fecha_key)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_periodo_anio ON tbl_periodo(anio)")
         print(f"\n{turquesa}Tabla{reset} {amarillo}'tbl_periodo'{reset}{turquesa} creada o ya existente.{reset}")
 
         # TABLA INDICADOR
@@ -97,9 +147,11 @@ def crear_base_datos():
         CREATE TABLE IF NOT EXISTS tbl_indicador (
             id_indicador INTEGER PRIMARY KEY,
             nombre TEXT NOT NULL UNIQUE, -- Ej: 'IPC_Gral', 'Paro_Juvenil', 'Salario_Mediana'
-            unidad TEXT                        -- Ej: '%', 'Euros', 'Índice Base 100'
+            unidad TEXT,                       -- Ej: '%', 'Euros', 'Índice Base 100'
+            formula TEXT                       -- NULL: dato del INE; si no, definición del indicador derivado
         );
         """)
+        _migrar_formula_indicador(cursor)
         print(f"\n{turquesa}Tabla{reset} {amarillo}'tbl_indicador'{reset}{turquesa} creada o ya existente.{reset}")
         
         # 3. Dimensión Geografía 
@@ -111,6 +163,18 @@ def crear_base_datos():
         """)
         print(f"\n{turquesa}Tabla{reset} {amarillo}'tbl_geografia'{reset}{turquesa} creada o ya existente.{reset}")
 
+        # 4. Dimensiones de texto de los hechos (categoría de gasto, sexo, sector...)
+        # Antes eran TEXTO repetido en cada fila y formaban parte de las claves UNIQUE.
+        # Ahora cada una es un lookup con clave entera, resuelto en memoria en procesar.py
+        for dimension in sorted({d for dims in DIMENSIONES_HECHOS.values() for d in dims}):
+            cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS tbl_{dimension} (
+                id_{dimension} INTEGER PRIMARY KEY,
+                nombre TEXT NOT NULL UNIQUE
+            );
+            """)
+        print(f"\n{turquesa}Tablas{reset} {amarillo}de dimensiones de texto{reset}{turquesa} creadas o ya existentes.{reset}")
+
 
         # --------------------------------------------------------------
         # TABLAS DE HECHOS (ALMACENAN VALORES MULTIDIMENSIONALES)
@@ -126,22 +190,23 @@ def crear_base_datos():
         # * IPV (trimestral)
         # Campos comentados/eliminados:
         # - No añadimos "tipo_indice" porque ya lo define tbl_indicador.
-        # - No usamos "id_geografia" normalizada para no complicar
-        # la carga masiva; se usa texto libre.
+        # - La categoría de gasto era texto libre para no complicar la carga
+        # masiva; ahora es una clave entera (tbl_categoria_gasto).
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS T_precios (
             id_precio INTEGER PRIMARY KEY,
             id_periodo INTEGER NOT NULL,
             id_indicador INTEGER NOT NULL,
             id_geografia INTEGER NOT NULL,
-            categoria_gasto TEXT NOT NULL, -- IPC: alimentos, vivienda... IPV: nueva, usada...
+            id_categoria_gasto INTEGER NOT NULL, -- IPC: alimentos, vivienda... IPV: nueva, usada...
             valor REAL NOT NULL,
 
             FOREIGN KEY (id_periodo) REFERENCES tbl_periodo(id_periodo),
             FOREIGN KEY (id_indicador) REFERENCES tbl_indicador(id_indicador),
             FOREIGN KEY (id_geografia) REFERENCES tbl_geografia(id_geografia),
-                       
-            UNIQUE(id_periodo, id_indicador, id_geografia, categoria_gasto)
+            FOREIGN KEY (id_categoria_gasto) REFERENCES tbl_categoria_gasto(id_categoria_gasto),
+
+            UNIQUE(id_periodo, id_indicador, id_geografia, id_categoria_gasto)
         );
         """)
         print(f"{turquesa}Tabla {reset}{amarillo}'T_precios'{reset}{turquesa} creada o ya existente.{reset}")
@@ -161,17 +226,20 @@ def crear_base_datos():
             id_indicador INTEGER NOT NULL,      -- Coste salarial total, Mediana, P10, etc.
             id_geografia INTEGER NOT NULL,
             
-            sexo TEXT,                          -- Ambos, Hombres, Mujeres
-            sector_cnae TEXT,                   -- Sector de Actividad (solo en ETCL)
-            ocupacion_cno11 TEXT,               -- Ocupación (solo en EES)
+            id_sexo INTEGER NOT NULL,           -- Ambos, Hombres, Mujeres
+            id_sector_cnae INTEGER NOT NULL,    -- Sector de Actividad (solo en ETCL)
+            id_ocupacion_cno11 INTEGER NOT NULL, -- Ocupación (solo en EES)
             
             valor REAL NOT NULL,               -- Salario en euros
 
             FOREIGN KEY (id_periodo) REFERENCES tbl_periodo(id_periodo),
             FOREIGN KEY (id_indicador) REFERENCES tbl_indicador(id_indicador),
             FOREIGN KEY (id_geografia) REFERENCES tbl_geografia(id_geografia),
+            FOREIGN KEY (id_sexo) REFERENCES tbl_sexo(id_sexo),
+            FOREIGN KEY (id_sector_cnae) REFERENCES tbl_sector_cnae(id_sector_cnae),
+            FOREIGN KEY (id_ocupacion_cno11) REFERENCES tbl_ocupacion_cno11(id_ocupacion_cno11),
             
-            UNIQUE(id_periodo, id_indicador, id_geografia, sexo, sector_cnae, ocupacion_cno11)        
+            UNIQUE(id_periodo, id_indicador, id_geografia, id_sexo, id_sector_cnae, id_ocupacion_cno11)
         );
         """)
         print(f"{turquesa}Tabla{reset}{amarillo} 'T_salarios'{reset}{turquesa} creada o ya existente.{reset}")
@@ -182,7 +250,7 @@ def crear_base_datos():
         # Antes existía una tabla solo para tasa de paro.
         # Se amplió para almacenar también:
         # * Absolutos del 65132 (asalariados totales, temporales, indefinidos)
-        # * Temporalidad (%), calculado o directamente cargado
+        # * Tasa de temporalidad (%), calculada a partir de los absolutos (src/derivados.py)
 
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS T_empleo (
@@ -191,20 +259,209 @@ def crear_base_datos():
             id_indicador INTEGER NOT NULL, -- Tasa Paro, Total Asalariados, Temporalidad %
             id_geografia INTEGER NOT NULL,
 
-            sexo TEXT NOT NULL,
-            grupo_edad TEXT,                     -- 16-24, 25-54, etc.
-            tipo_jornada TEXT,                   -- Completa, Parcial
-            tipo_contrato TEXT,                  -- Indefinido, Temporal
+            id_sexo INTEGER NOT NULL,
+            id_grupo_edad INTEGER NOT NULL,      -- 16-24, 25-54, etc. ("No aplica" en temporalidad)
+            id_tipo_jornada INTEGER NOT NULL,    -- Completa, Parcial ("No aplica" en paro)
+            id_tipo_contrato INTEGER NOT NULL,   -- Indefinido, Temporal ("No aplica" en paro)
                         
             valor REAL NOT NULL,                 -- El dato numérico (Tasa o Miles de Personas)
 
             FOREIGN KEY (id_periodo) REFERENCES tbl_periodo(id_periodo),
             FOREIGN KEY (id_indicador) REFERENCES tbl_indicador(id_indicador),
             FOREIGN KEY (id_geografia) REFERENCES tbl_geografia(id_geografia), 
+            FOREIGN KEY (id_sexo) REFERENCES tbl_sexo(id_sexo),
+            FOREIGN KEY (id_grupo_edad) REFERENCES tbl_grupo_edad(id_grupo_edad),
+            FOREIGN KEY (id_tipo_jornada) REFERENCES tbl_tipo_jornada(id_tipo_jornada),
+            FOREIGN KEY (id_tipo_contrato) REFERENCES tbl_tipo_contrato(id_tipo_contrato),
             
-            UNIQUE(id_periodo, id_indicador, id_geografia, sexo, grupo_edad, tipo_jornada, tipo_contrato)
+            UNIQUE(id_periodo, id_indicador, id_geografia, id_sexo, id_grupo_edad, id_tipo_jornada, id_tipo_contrato)
         );
         """)
         print(f"{turquesa}Tabla{reset}{amarillo} 'T_empleo'{reset}{turquesa} creada o ya existente.{reset}")
+
+        _migrar_hechos_con_texto(cursor, tablas_texto)
+        _migrar_categoria_ipv(cursor)
+
+
+        # --------------------------------------------------------------
+        # TABLAS DE CONTROL DEL ETL
+        # --------------------------------------------------------------
+
+        # TABLA tbl_control_series
+        # Huella (hash) de cada serie descargada del INE. Si el INE republica una
+        # tabla, solo se transforman y cargan las series cuya huella ha cambiado.
+        _migrar_indicadores_por_serie(cursor)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS tbl_control_series (
+            codigo_tabla INTEGER NOT NULL,
+            cod_serie TEXT NOT NULL,           -- COD de la serie en el INE
+            nombre TEXT,
+            huella TEXT NOT NULL,              -- sha1 de COD + Nombre + Data
+            fecha_carga TEXT NOT NULL,
+
+            PRIMARY KEY (codigo_tabla, cod_serie)
+        );
+        """)
+        print(f"{turquesa}Tabla{reset}{amarillo} 'tbl_control_series'{reset}{turquesa} creada o ya existente.{reset}")
+
+        # TABLA tbl_control_derivados
+        # Huella de la definición de cada indicador derivado (src/derivados.py): si cambia,
+        # el indicador se recalcula entero; si no, solo los años con datos nuevos.
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS tbl_control_derivados (
+            nombre TEXT PRIMARY KEY,           -- nombre del indicador en tbl_indicador
+            huella TEXT NOT NULL,              -- sha1 de la definición
+            fecha_calculo TEXT NOT NULL
+        );
+        """)
+        print(f"{turquesa}Tabla{reset}{amarillo} 'tbl_control_derivados'{reset}{turquesa} creada o ya existente.{reset}")
         
     print(f"\n{turquesa}Base de Datos lista. Faltan las funciones de precarga.{reset}")
+
+
+# --------------------------------------------------------------
+# MIGRACIÓN: CLAVES ENTERAS DE PERIODO
+# --------------------------------------------------------------
+
+def _migrar_claves_periodo(cursor):
+    """Añade fecha_key y recalcula año/trimestre/mes en tbl_periodo antiguas (se parsea una sola vez)"""
+    columnas = [fila[1] for fila in cursor.execute("PRAGMA table_info(tbl_periodo)").fetchall()]
+    if "fecha_key" in columnas:
+        return
+    if not cursor.connection.in_transaction:
+        cursor.execute("BEGIN")
+    cursor.execute("ALTER TABLE tbl_periodo ADD COLUMN fecha_key INTEGER")
+    # La columna trimestre guardaba el código FK_Periodo del INE; se sustituye por el trimestre real
+    cursor.execute("""
+    UPDATE tbl_periodo SET
+        anio = CAST(substr(fecha_iso, 1, 4) AS INTEGER),
+        mes = CAST(substr(fecha_iso, 6, 2) AS INTEGER),
+        trimestre = (CAST(substr(fecha_iso, 6, 2) AS INTEGER) - 1) / 3 + 1,
+        fecha_key = CAST(replace(fecha_iso, '-', '') AS INTEGER)
+    """)
+    print(f"{turquesa}Tabla{reset}{amarillo} 'tbl_periodo'{reset}{turquesa} migrada a claves enteras de fecha.{reset}")
+
+
+# --------------------------------------------------------------
+# MIGRACIÓN: FÓRMULA DE LOS INDICADORES DERIVADOS
+# --------------------------------------------------------------
+
+def _migrar_formula_indicador(cursor):
+    """Añade la columna formula a tbl_indicador antiguas (los indicadores existentes son del INE)"""
+    columnas = [fila[1] for fila in cursor.execute("PRAGMA table_info(tbl_indicador)").fetchall()]
+    if "formula" in columnas:
+        return
+    if not cursor.connection.in_transaction:
+        cursor.execute("BEGIN")
+    cursor.execute("ALTER TABLE tbl_indicador ADD COLUMN formula TEXT")
+    print(f"{turquesa}Tabla{reset}{amarillo} 'tbl_indicador'{reset}{turquesa} migrada: columna formula.{reset}")
+
+
+# --------------------------------------------------------------
+# MIGRACIÓN: UN INDICADOR POR SERIE DE PRECIOS Y SALARIOS
+# --------------------------------------------------------------
+
+# Indicadores que en las BD anteriores a tbl_control_series mezclaban varias series
+INDICADORES_ANTIGUOS = {
+    "T_salarios": ["Salario_Anual_Ocupacion"],  # EES y ETCL juntos, Coste Laboral incluido
+    "T_precios": ["IPC Indice", "IPV Indice"],  # índice y variaciones con la misma clave
+}
+
+
+def _migrar_indicadores_por_serie(cursor):
+    """
+    Borra de las BD antiguas las filas de los indicadores que mezclaban series. Como la BD
+    aún no tiene huellas, la siguiente carga reprocesa todas las series y las vuelve a
+    insertar, cada una con su indicador (sin contar los salarios dos veces)
+    """
+    existe = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tbl_control_series'"
+    ).fetchone()
+    if existe:
+        return
+    for tabla, indicadores in INDICADORES_ANTIGUOS.items():
+        marcas = ", ".join("?" for _ in indicadores)
+        if not cursor.connection.in_transaction:
+            cursor.execute("BEGIN")
+        cursor.execute(f"""
+        DELETE FROM {tabla} WHERE id_indicador IN (
+            SELECT id_indicador FROM tbl_indicador WHERE nombre IN ({marcas})
+        )
+        """, indicadores)
+        if cursor.rowcount:
+            print(f"{turquesa}Tabla{reset}{amarillo} '{tabla}'{reset}{turquesa} migrada: "
+                  f"{cursor.rowcount} filas de {', '.join(indicadores)} se recargarán por serie.{reset}")
+
+
+# --------------------------------------------------------------
+# MIGRACIÓN: CATEGORÍA GENERAL DEL IPV
+# --------------------------------------------------------------
+
+def _migrar_categoria_ipv(cursor):
+    """Las filas del IPV guardadas con la categoría 'IPC General' pasan a 'IPV General'"""
+    viejas = cursor.execute("""
+    SELECT COUNT(*) FROM T_precios p
+    JOIN tbl_indicador i ON i.id_indicador = p.id_indicador
+    JOIN tbl_categoria_gasto c ON c.id_categoria_gasto = p.id_categoria_gasto
+    WHERE i.nombre LIKE 'IPV %' AND c.nombre = 'IPC General'
+    """).fetchone()[0]
+    if not viejas:
+        return
+    if not cursor.connection.in_transaction:
+        cursor.execute("BEGIN")
+    cursor.execute("INSERT OR IGNORE INTO tbl_categoria_gasto (nombre) VALUES ('IPV General')")
+    cursor.execute("""
+    UPDATE T_precios SET id_categoria_gasto = (
+        SELECT id_categoria_gasto FROM tbl_categoria_gasto WHERE nombre = 'IPV General'
+    )
+    WHERE id_indicador IN (SELECT id_indicador FROM tbl_indicador WHERE nombre LIKE 'IPV %')
+    AND id_categoria_gasto = (SELECT id_categoria_gasto FROM tbl_categoria_gasto WHERE nombre = 'IPC General')
+    """)
+    print(f"{turquesa}Tabla{reset}{amarillo} 'T_precios'{reset}{turquesa} migrada: {viejas} filas del IPV a 'IPV General'.{reset}")
+
+
+# --------------------------------------------------------------
+# MIGRACIÓN: DIMENSIONES DE TEXTO -> CLAVES ENTERAS
+# --------------------------------------------------------------
+
+def _apartar_hechos_con_texto(cursor):
+    """Renombra a <tabla>_texto los hechos que aún tienen las dimensiones como TEXTO"""
+    apartadas = []
+    for tabla, dimensiones in DIMENSIONES_HECHOS.items():
+        columnas = [fila[1] for fila in cursor.execute(f"PRAGMA table_info({tabla})").fetchall()]
+        if dimensiones[0] not in columnas:
+            continue
+        if not cursor.connection.in_transaction:
+            cursor.execute("BEGIN")
+        cursor.execute(f"ALTER TABLE {tabla} RENAME TO {tabla}_texto")
+        apartadas.append(tabla)
+    return apartadas
+
+
+def _migrar_hechos_con_texto(cursor, tablas):
+    """Rellena los lookups y copia los hechos apartados a su versión con claves enteras"""
+    for tabla in tablas:
+        dimensiones = DIMENSIONES_HECHOS[tabla]
+        clave = CLAVES_HECHOS[tabla]
+
+        for dim in dimensiones:
+            cursor.execute(f"""
+            INSERT OR IGNORE INTO tbl_{dim} (nombre)
+            SELECT DISTINCT COALESCE({dim}, ?) FROM {tabla}_texto
+            """, (NO_APLICA,))
+
+        columnas = ", ".join(f"id_{dim}" for dim in dimensiones)
+        valores = ", ".join(f"d{i}.id_{dim}" for i, dim in enumerate(dimensiones))
+        joins = "\n".join(
+            f"JOIN tbl_{dim} d{i} ON d{i}.nombre = COALESCE(v.{dim}, '{NO_APLICA}')"
+            for i, dim in enumerate(dimensiones)
+        )
+        # OR IGNORE: las filas duplicadas que permitían los NULL en la UNIQUE antigua se descartan
+        cursor.execute(f"""
+        INSERT OR IGNORE INTO {tabla} ({clave}, id_periodo, id_indicador, id_geografia, {columnas}, valor)
+        SELECT v.{clave}, v.id_periodo, v.id_indicador, v.id_geografia, {valores}, v.valor
+        FROM {tabla}_texto v
+        {joins}
+        """)
+        cursor.execute(f"DROP TABLE {tabla}_texto")
+        print(f"{turquesa}Tabla{reset}{amarillo} '{tabla}'{reset}{turquesa} migrada a dimensiones codificadas.{reset}")
@@ -0,0 +1,310 @@
+"""
+Indicadores derivados: se calculan en la ingesta a partir de las series del INE y se guardan
+como un indicador más (tbl_indicador, con su definición en la columna formula) en su tabla de hechos.
+
+Cada definición de DERIVADOS es declarativa:
+- "variacion_interanual": (valor / valor del mismo periodo del año anterior - 1) * 100.
+  El periodo anterior es fecha_key - 10000 con el resto de dimensiones iguales.
+- "cociente": numerador / denominador * factor, cruzados por las dimensiones de `por` y por
+  el periodo. Con `periodo` = "anio" o "trimestre" el denominador se promedia a esa frecuencia
+  (como hace la Capa de Oro al cruzar salarios anuales o trimestrales con el IPC mensual).
+Los selectores eligen el indicador y, opcionalmente, miembros de dimensiones por nombre;
+`tabla` permite leer el denominador de otra tabla de hechos.
+
+Se evalúan con Polars sobre series completas, pero solo para los años con datos nuevos
+(y los que dependen de ellos, p. ej. el año siguiente en una variación interanual).
+Si cambia una definición, ese indicador se recalcula entero. El resultado se carga con el
+mismo UPSERT del ETL, así que recalcular un año sin cambios no reescribe filas.
+"""
+import hashlib
+import json
+from datetime import datetime
+
+import polars as pl
+
+from src.almacenar import COLUMNAS_HECHOS, insertar_columnas
+from src.db import CLAVES_HECHOS, NO_APLICA, DatabaseConnection, get_cursor
+from src.procesar import reiniciar_vocabulario
+
+DERIVADOS = {
+    "IPC Variación interanual": {
+        "tipo": "variacion_interanual",
+        "tabla": "T_precios",
+        "unidad": "%",
+        "entrada": {"indicador": "IPC Indice"},
+    },
+    "IPV Variación interanual": {
+        "tipo": "variacion_interanual",
+        "tabla": "T_precios",
+        "unidad": "%",
+        "entrada": {"indicador": "IPV Indice"},
+    },
+    # Asalariados temporales / asalariados totales de la tabla 65132
+    "Tasa_Temporalidad": {
+        "tipo": "cociente",
+        "tabla": "T_empleo",
+        "unidad": "%",
+        "numerador": {"indicador": "Temporalidad", "tipo_contrato": "Temporal"},
+        "denominador": {"indicador": "Temporalidad", "tipo_contrato": "Total"},
+        "por": ["geografia", "sexo", "grupo_edad", "tipo_jornada"],
+        "factor": 100,
+        "fijar": {"tipo_contrato": NO_APLICA},
+    },
+    # Salario / IPC General del mismo periodo (el ratio_poder_adquisitivo de la Capa de Oro)
+    "Poder_Adquisitivo Coste salarial total": {
+        "tipo": "cociente",
+        "tabla": "T_salarios",
+        "unidad": "Euros / Índice",
+        "numerador": {"indicador": "Coste salarial total"},
+        "denominador": {"tabla": "T_precios", "indicador": "IPC Indice", "categoria_gasto": "IPC General"},
+        "periodo": "trimestre",
+    },
+    "Poder_Adquisitivo Mediana": {
+        "tipo": "cociente",
+        "tabla": "T_salarios",
+        "unidad": "Euros / Índice",
+        "numerador": {"indicador": "Mediana"},
+        "denominador": {"tabla": "T_precios", "indicador": "IPC Indice", "categoria_gasto": "IPC General"},
+        "periodo": "anio",
+    },
+}
+
+# Columnas del periodo por las que se cruza el denominador según la frecuencia
+CLAVES_PERIODO = {"fecha_key": ["fecha_key"], "trimestre": ["anio", "trimestre"], "anio": ["anio"]}
+
+
+def huella_definicion(definicion):
+    return hashlib.sha1(json.dumps(definicion, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _texto_selector(selector):
+    filtros = [f"{dim}={valor}" for dim, valor in selector.items() if dim not in ("indicador", "tabla")]
+    return selector["indicador"] + (f"[{', '.join(filtros)}]" if filtros else "")
+
+
+def formula(definicion):
+    """Definición legible que se guarda en tbl_indicador.formula"""
+    if definicion["tipo"] == "variacion_interanual":
+        base = _texto_selector(definicion["entrada"])
+        return f"({base} / {base}[fecha_key - 10000] - 1) * 100"
+    texto = f"{_texto_selector(definicion['numerador'])} / {_texto_selector(definicion['denominador'])}"
+    if definicion.get("periodo", "fecha_key") != "fecha_key":
+        texto += f" (media por {definicion['periodo']})"
+    return texto + (f" * {definicion['factor']}" if definicion.get("factor", 1) != 1 else "")
+
+
+def _leer(conn, tabla, selector, anios):
+    """Hechos de `tabla` que cumplen el selector (ids + fecha_key/anio/trimestre + valor)"""
+    condiciones, parametros = ["i.nombre = ?"], [selector["indicador"]]
+    for dimension, valor in selector.items():
+        if dimension not in ("indicador", "tabla"):
+            condiciones.append(f"h.id_{dimension} = (SELECT id_{dimension} FROM tbl_{dimension} WHERE nombre = ?)")
+            parametros.append(valor)
+    if anios is not None:
+        condiciones.append(f"t.anio IN ({', '.join('?' * len(anios))})")
+        parametros += sorted(anios)
+    columnas = ", ".join(f"h.{c}" for c in COLUMNAS_HECHOS[tabla])
+    query = f"""
+    SELECT {columnas}, t.fecha_key, t.anio, t.trimestre
+    FROM {tabla} h
+    JOIN tbl_periodo t ON h.id_periodo = t.id_periodo
+    JOIN tbl_indicador i ON h.id_indicador = i.id_indicador
+    WHERE {' AND '.join(condiciones)}
+    """
+    # Misma conexión que el ETL: en la BD sombra el bloqueo es exclusivo y otra conexión no leería.
+    # Tipos explícitos: sin filas, Polars no podría inferirlos y los joins fallarían
+    tipos = {c: pl.Int64 for c in [*COLUMNAS_HECHOS[tabla], "fecha_key", "anio", "trimestre"]} | {"valor": pl.Float64}
+    hechos = pl.read_database(query, connection=conn, execute_options={"parameters": parametros}, schema_overrides=tipos)
+    if anios is None and not hechos.height:
+        print(f"Aviso: el selector {_texto_selector(selector)} no tiene filas en {tabla}")
+    return hechos
+
+
+def _selectores(definicion):
+    if definicion["tipo"] == "variacion_interanual":
+        return [definicion["entrada"]]
+    return [definicion["numerador"], definicion["denominador"]]
+
+
+def _nombres_desconocidos(conn, definicion):
+    """Indicadores o miembros de dimensión de los selectores que no existen en la BD"""
+    desconocidos = []
+    for selector in _selectores(definicion):
+        for dimension, valor in selector.items():
+            if dimension == "tabla":
+                continue
+            existe = conn.execute(f"SELECT 1 FROM tbl_{dimension} WHERE nombre = ?", (valor,)).fetchone()
+            if not existe:
+                desconocidos.append(f"{dimension}={valor}")
+    return desconocidos
+
+
+def _borrar_obsoletas(conn, tabla, id_indicador, anios, resultado):
+    """
+    Borra las filas del indicador en los años recalculados que ya no salen en el resultado
+    (p. ej. una combinación de dimensiones que ha dejado de existir). Devuelve cuántas borra
+    """
+    clave = CLAVES_HECHOS[tabla]
+    dimensiones = [c for c in COLUMNAS_HECHOS[tabla] if c != "valor"]
+    condiciones, parametros = ["h.id_indicador = ?"], [id_indicador]
+    if anios is not None:
+        condiciones.append(f"t.anio IN ({', '.join('?' * len(anios))})")
+        parametros += sorted(anios)
+    guardadas = pl.read_database(
+        f"""
+        SELECT h.{clave}, {', '.join(f'h.{c}' for c in dimensiones)}
+        FROM {tabla} h JOIN tbl_periodo t ON h.id_periodo = t.id_periodo
+        WHERE {' AND '.join(condiciones)}
+        """,
+        connection=conn, execute_options={"parameters": parametros},
+        schema_overrides={c: pl.Int64 for c in [clave, *dimensiones]},
+    )
+    obsoletas = guardadas.join(resultado.select(dimensiones), on=dimensiones, how="anti")[clave].to_list()
+    if obsoletas:
+        with get_cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {tabla} WHERE {clave} = ?", [(i,) for i in obsoletas])
+    return len(obsoletas)
+
+
+def _variacion_interanual(conn, definicion, anios):
+    tabla = definicion["tabla"]
+    lectura = None if anios is None else anios | {anio - 1 for anio in anios}
+    base = _leer(conn, tabla, definicion["entrada"], lectura)
+    claves = [c for c in COLUMNAS_HECHOS[tabla] if c not in ("id_periodo", "id_indicador", "valor")]
+    anterior = base.select(
+        *claves, (pl.col("fecha_key") + 10000).alias("fecha_key"), pl.col("valor").alias("valor_anterior")
+    )
+    return base.join(anterior, on=[*claves, "fecha_key"]).with_columns(
+        ((pl.col("valor") / pl.col("valor_anterior") - 1) * 100).alias("valor")
+    )
+
+
+def _cociente(conn, definicion, anios):
+    tabla = definicion["tabla"]
+    numerador = _leer(conn, tabla, definicion["numerador"], anios)
+    denominador = definicion["denominador"]
+    por = [f"id_{dimension}" for dimension in definicion.get("por", [])]
+    claves = por + CLAVES_PERIODO[definicion.get("periodo", "fecha_key")]
+    # Media: si varias filas del denominador caen en la misma clave (p. ej. los meses de un año)
+    denominador = _leer(conn, denominador.get("tabla", tabla), denominador, anios).group_by(claves).agg(
+        pl.col("valor").mean().alias("valor_denominador")
+    )
+    return numerador.join(denominador, on=claves).with_columns(
+        (pl.col("valor") / pl.col("valor_denominador") * definicion.get("factor", 1)).alias("valor")
+    )
+
+
+EVALUADORES = {"variacion_interanual": _variacion_interanual, "cociente": _cociente}
+
+
+def _tablas_entrada(definicion):
+    if definicion["tipo"] == "variacion_interanual":
+        return {definicion["tabla"]}
+    return {definicion["tabla"], definicion["denominador"].get("tabla", definicion["tabla"])}
+
+
+def _anios_salida(definicion, anios_cambiados):
+    """Años a recalcular a partir de los años con datos nuevos en las tablas de entrada"""
+    if definicion["tipo"] == "variacion_interanual":
+        return anios_cambiados | {anio + 1 for anio in anios_cambiados}
+    return set(anios_cambiados)
+
+
+def _id_miembro(cursor, dimension, nombre):
+    cursor.execute(f"INSERT OR IGNORE INTO tbl_{dimension} (nombre) VALUES (?)", (nombre,))
+    cursor.execute(f"SELECT id_{dimension} FROM tbl_{dimension} WHERE nombre = ?", (nombre,))
+    return cursor.fetchone()[0]
+
+
+def _registrar_indicador(nombre, definicion):
+    with get_cursor() as cursor:
+        cursor.execute("""
+        INSERT INTO tbl_indicador (nombre, unidad, formula) VALUES (?, ?, ?)
+        ON CONFLICT(nombre) DO UPDATE SET unidad = excluded.unidad, formula = excluded.formula
+        """, (nombre, definicion["unidad"], formula(definicion)))
+        cursor.execute("SELECT id_indicador FROM tbl_indicador WHERE nombre = ?", (nombre,))
+        id_indicador = cursor.fetchone()[0]
+        fijos = {
+            f"id_{dimension}": _id_miembro(cursor, dimension, valor)
+            for dimension, valor in definicion.get("fijar", {}).items()
+        }
+    return id_indicador, fijos
+
+
+def _huellas_guardadas():
+    with get_cursor() as cursor:
+        cursor.execute("SELECT nombre, huella FROM tbl_control_derivados")
+        return dict(cursor.fetchall())
+
+
+def _anios_de_periodos(periodos):
+    """{tabla: {id_periodo}} -> {tabla: {anio}}"""
+    with get_cursor() as cursor:
+        cursor.execute("SELECT id_periodo, anio FROM tbl_periodo")
+        anio_de = dict(cursor.fetchall())
+    return {tabla: {anio_de[p] for p in ids if p in anio_de} for tabla, ids in periodos.items()}
+
+
+def calcular_derivados(periodos=None, derivados=None):
+    """
+    Calcula y carga los indicadores derivados en la BD configurada en src.db.
+    - periodos: {tabla de hechos: {id_periodo}} cargados en esta ejecución; None recalcula todo.
+    - derivados: {nombre: definición}; por defecto DERIVADOS (se evalúan en orden, así que
+      un derivado puede usar otro definido antes).
+    Devuelve {nombre: filas insertadas o actualizadas} de los indicadores recalculados.
+    """
+    derivados = DERIVADOS if derivados is None else derivados
+    conn = DatabaseConnection().get_connection()
+    cambiados = None if periodos is None else _anios_de_periodos(periodos)
+    huellas = _huellas_guardadas()
+    resumen = {}
+
+    for nombre, definicion in derivados.items():
+        huella = huella_definicion(definicion)
+        if cambiados is None or huellas.get(nombre) != huella:
+            anios = None  # definición nueva o modificada: se calcula entera
+        else:
+            entrada = set().union(*(cambiados.get(tabla, set()) for tabla in _tablas_entrada(definicion)))
+            if not entrada:
+                continue
+            anios = _anios_salida(definicion, entrada)
+
+        desconocidos = _nombres_desconocidos(conn, definicion)
+        if desconocidos:
+            # Un nombre mal escrito dejaría el indicador vacío sin avisar. No se guarda la huella:
+            # se vuelve a intentar entero en la próxima carga
+            print(f"Aviso: {nombre} no se calcula, no existen en la BD: {', '.join(desconocidos)}")
+            continue
+
+        tabla = definicion["tabla"]
+        id_indicador, fijos = _registrar_indicador(nombre, definicion)
+        resultado = EVALUADORES[definicion["tipo"]](conn, definicion, anios)
+        if anios is not None:
+            resultado = resultado.filter(pl.col("anio").is_in(sorted(anios)))
+        # Divisiones por cero o sin dato del año anterior: no se guardan. Se redondea porque las
+        # medias en paralelo de Polars pueden variar en el último bit entre ejecuciones y el
+        # UPSERT reescribiría filas que no han cambiado
+        resultado = resultado.filter(pl.col("valor").is_finite()).with_columns(
+            pl.col("valor").round(10),
+            pl.lit(id_indicador).alias("id_indicador"),
+            *(pl.lit(id_miembro).alias(columna) for columna, id_miembro in fijos.items()),
+        )
+
+        # El UPSERT no borra: lo que ya no sale en los años recalculados se quita aparte
+        _borrar_obsoletas(conn, tabla, id_indicador, anios, resultado)
+        filas = insertar_columnas(tabla, resultado) if resultado.height else 0
+        if filas is None:
+            continue  # error al cargar: se deja la huella anterior para recalcularlo entero la próxima vez
+        with get_cursor() as cursor:
+            cursor.execute("""
+            INSERT INTO tbl_control_derivados (nombre, huella, fecha_calculo) VALUES (?, ?, ?)
+            ON CONFLICT(nombre) DO UPDATE SET huella = excluded.huella, fecha_calculo = excluded.fecha_calculo
+            """, (nombre, huella, datetime.now().isoformat(timespec="seconds")))
+        resumen[nombre] = filas
+        # Los años recalculados cuentan como cambiados para los derivados que dependan de este
+        if cambiados is not None:
+            cambiados.setdefault(tabla, set()).update(resultado["anio"].unique().to_list())
+
+    # Se han insertado miembros de dimensiones e indicadores sin pasar por el vocabulario en memoria
+    reiniciar_vocabulario()
+    return resumen
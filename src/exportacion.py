@@ -0,0 +1,73 @@
+"""
+Exportación de la Capa de Oro bajo demanda para el botón de descarga de app.py.
+
+El fichero se escribe directamente desde Polars (sin pasar por pandas) a disco, en
+RUTA_EXPORTACIONES, y se reutiliza mientras no cambien la generación de los datos, el
+filtro y el formato: pulsar dos veces, o desde otra sesión, no lo vuelve a generar.
+El CSV se comprime con gzip mientras se escribe y el Parquet con zstd; en ningún
+momento se construye el fichero entero como un bloque de bytes en memoria.
+
+La descarga tampoco pasa por st.download_button, que guarda en memoria todo lo que sirve
+(también lo que devuelve una función o un fichero abierto): la app enlaza a url_descarga y
+Streamlit envía el fichero desde RUTA_EXPORTACIONES, dentro de su carpeta de estáticos.
+"""
+import gzip
+import hashlib
+import os
+import threading
+
+from config.constantes import RUTA_ESTATICOS, RUTA_EXPORTACIONES, URL_ESTATICOS
+
+# Formato -> (extensión, tipo MIME)
+FORMATOS = {
+    "CSV (.csv.gz)": ("csv.gz", "application/gzip"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+
+def ruta_exportacion(generacion, filtro, formato, raiz=RUTA_EXPORTACIONES):
+    extension, _ = FORMATOS[formato]
+    clave = hashlib.sha1(repr(filtro).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(raiz, f"{generacion}-{clave}.{extension}")
+
+
+def url_descarga(ruta):
+    """URL relativa con la que Streamlit sirve una exportación desde su carpeta de estáticos"""
+    relativa = os.path.relpath(ruta, RUTA_ESTATICOS).replace(os.sep, "/")
+    return f"{URL_ESTATICOS}/{relativa}"
+
+
+def _escribir(df, ruta, formato):
+    if FORMATOS[formato][0] == "parquet":
+        df.write_parquet(ruta, compression="zstd")
+    else:
+        with gzip.open(ruta, "wb", compresslevel=6) as f:
+            df.write_csv(f)
+
+
+def limpiar(generacion, raiz=RUTA_EXPORTACIONES):
+    """Borra las exportaciones de generaciones anteriores"""
+    for nombre in os.listdir(raiz):
+        if not nombre.startswith(f"{generacion}-"):
+            try:
+                os.remove(os.path.join(raiz, nombre))
+            except OSError:
+                pass  # otra sesión la está descargando o ya la ha borrado
+
+
+def exportar(df, generacion, filtro, formato, raiz=RUTA_EXPORTACIONES):
+    """Ruta del fichero con `df` en `formato`; solo se escribe si aún no existe"""
+    ruta = ruta_exportacion(generacion, filtro, formato, raiz)
+    if os.path.exists(ruta):
+        return ruta
+    os.makedirs(raiz, exist_ok=True)
+    limpiar(generacion, raiz)
+    # Temporal propio de cada hilo y renombrado atómico: dos sesiones a la vez no se pisan
+    temporal = f"{ruta}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        _escribir(df, temporal, formato)
+        os.replace(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+    return ruta
@@ -0,0 +1,116 @@
+"""
+Matriz de formatos de almacenamiento para elegir con números el formato de la Capa de Oro.
+
+Formatos: CSV, Parquet (snappy / zstd / lz4 con varios tamaños de row group), Arrow IPC
+(sin comprimir, lz4, zstd) y NDJSON. Para cada formato y escala (nº de filas) se mide:
+- escritura (s) y tamaño en disco (MB),
+- lectura completa a DataFrame,
+- lectura proyectada (solo algunas columnas, con scan + select),
+- scan perezoso con filtro (el formato puede saltarse datos: row groups, columnas).
+Los tiempos son la mediana de varias repeticiones. CSV y NDJSON no guardan los tipos
+(las fechas vuelven como texto), el resto sí.
+"""
+import os
+import statistics
+import tempfile
+import time
+
+import polars as pl
+
+from config.constantes import FILAS_MATRIZ_FORMATOS
+
+CODECS_PARQUET = ("snappy", "zstd", "lz4")
+FILAS_GRUPO_PARQUET = (10_000, 100_000, 1_000_000)
+CODECS_IPC = ("uncompressed", "lz4", "zstd")
+
+
+def _formatos():
+    """{nombre: (extensión, escribir(df, ruta), leer(ruta), escanear(ruta))}"""
+    formatos = {"csv": ("csv", lambda df, ruta: df.write_csv(ruta), pl.read_csv, pl.scan_csv)}
+    for codec in CODECS_PARQUET:
+        for grupo in FILAS_GRUPO_PARQUET:
+            formatos[f"parquet-{codec}-{grupo // 1000}k"] = (
+                "parquet",
+                lambda df, ruta, codec=codec, grupo=grupo: df.write_parquet(ruta, compression=codec, row_group_size=grupo),
+                pl.read_parquet,
+                pl.scan_parquet,
+            )
+    for codec in CODECS_IPC:
+        formatos[f"ipc-{codec}"] = (
+            "arrow",
+            lambda df, ruta, codec=codec: df.write_ipc(ruta, compression=codec),
+            # Sin memory_map: se mide la lectura real de los datos, no solo el mapeo
+            lambda ruta: pl.read_ipc(ruta, memory_map=False),
+            pl.scan_ipc,
+        )
+    formatos["ndjson"] = ("ndjson", lambda df, ruta: df.write_ndjson(ruta), pl.read_ndjson, pl.scan_ndjson)
+    return formatos
+
+
+FORMATOS = _formatos()
+
+
+def escalar(df, filas):
+    """
+    Repite df hasta tener exactamente `filas` filas. Las columnas decimales de las filas
+    repetidas llevan un ruido de ±1 %: con copias idénticas Parquet comprimiría la repetición
+    y la matriz no reflejaría el tamaño real de unos datos más grandes.
+    """
+    if df.is_empty():
+        raise ValueError("No se puede escalar un DataFrame vacío")
+    copias = -(-filas // df.height)
+    if copias <= 1:
+        return df.head(filas)
+    fila = pl.int_range(pl.len())
+    ruido = 1 + ((fila.hash(42) % 2001).cast(pl.Float64) - 1000) / 100_000
+    return pl.concat([df] * copias).head(filas).with_columns(
+        pl.when(fila < df.height).then(pl.col(columna)).otherwise(pl.col(columna) * ruido)
+        for columna, tipo in df.schema.items() if tipo.is_float()
+    )
+
+
+def _mediana(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - t0)
+    return statistics.median(tiempos)
+
+
+def matriz_formatos(df, filas=FILAS_MATRIZ_FORMATOS, columnas=None, filtro=None, repeticiones=3, formatos=None):
+    """
+    DataFrame con una fila por (formato, escala): escritura_s, tamano_mb, lectura_s,
+    proyeccion_s y filtro_s. Por defecto se proyectan las 3 primeras columnas y el filtro
+    deja pasar todo; conviene pasar un filtro selectivo propio de los datos.
+    """
+    columnas = columnas or df.columns[:3]
+    filtro = pl.lit(True) if filtro is None else filtro
+    nombres = formatos or list(FORMATOS)
+    resultados = []
+    with tempfile.TemporaryDirectory() as carpeta:
+        for n in filas:
+            datos = escalar(df, n)
+            for nombre in nombres:
+                extension, escribir, leer, escanear = FORMATOS[nombre]
+                ruta = os.path.join(carpeta, f"{nombre}.{extension}")
+                resultados.append({
+                    "formato": nombre,
+                    "filas": datos.height,
+                    "escritura_s": _mediana(lambda: escribir(datos, ruta), repeticiones),
+                    "tamano_mb": os.path.getsize(ruta) / 2 ** 20,
+                    "lectura_s": _mediana(lambda: leer(ruta), repeticiones),
+                    "proyeccion_s": _mediana(lambda: escanear(ruta).select(columnas).collect(), repeticiones),
+                    "filtro_s": _mediana(lambda: escanear(ruta).filter(filtro).collect(), repeticiones),
+                })
+                os.remove(ruta)
+    return pl.DataFrame(resultados)
+
+
+def mejores(matriz):
+    """{métrica: (formato, valor)} con el mejor formato de cada métrica en la escala mayor"""
+    mayor = matriz.filter(pl.col("filas") == pl.col("filas").max())
+    return {
+        metrica: tuple(mayor.sort(metrica).select("formato", metrica).row(0))
+        for metrica in ("tamano_mb", "escritura_s", "lectura_s", "proyeccion_s", "filtro_s")
+    }
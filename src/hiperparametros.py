@@ -0,0 +1,32 @@
+"""
+Lectura y escritura de la mejor configuración del RandomForest.
+tuning.py la calcula una sola vez y app.py / modelado.py la reutilizan.
+"""
+import json
+import os
+from datetime import datetime
+
+from config.constantes import RUTA_HIPERPARAMETROS_RF, HIPERPARAMETROS_RF_DEFECTO
+
+
+def cargar_hiperparametros_rf():
+    """Devuelve los hiperparámetros guardados o los de por defecto si no se ha hecho tuning"""
+    parametros = dict(HIPERPARAMETROS_RF_DEFECTO)
+    if os.path.exists(RUTA_HIPERPARAMETROS_RF):
+        with open(RUTA_HIPERPARAMETROS_RF, encoding="utf-8") as f:
+            parametros.update(json.load(f).get("parametros", {}))
+    return parametros
+
+
+def guardar_hiperparametros_rf(parametros, r2_cv=None, n_muestras=None):
+    """Escribe la mejor configuración de forma atómica para no dejar un JSON a medias"""
+    contenido = {
+        "parametros": parametros,
+        "r2_cv": r2_cv,
+        "n_muestras": n_muestras,
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+    }
+    tmp = f"{RUTA_HIPERPARAMETROS_RF}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(contenido, f, indent=4, ensure_ascii=False)
+    os.replace(tmp, RUTA_HIPERPARAMETROS_RF)
@@ -0,0 +1,91 @@
+"""
+Sesión HTTP compartida para las descargas del INE.
+- Una única requests.Session con pool de conexiones (keep-alive) para todas las tablas.
+- Transferencia comprimida (Accept-Encoding: gzip, deflate).
+- Reintentos acotados con backoff exponencial y jitter ante errores de red y 429/5xx.
+- Un semáforo por host limita las peticiones simultáneas contra el mismo servidor.
+"""
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config.constantes import (
+    INE_BACKOFF,
+    INE_BACKOFF_JITTER,
+    INE_CONEXIONES_POR_HOST,
+    INE_REINTENTOS,
+    INE_TIMEOUT,
+)
+
+ESTADOS_REINTENTABLES = (429, 500, 502, 503, 504)
+
+_sesion = None
+_semaforos = {}
+_bloqueo = threading.Lock()
+
+
+def crear_sesion(reintentos=INE_REINTENTOS, conexiones=INE_CONEXIONES_POR_HOST):
+    reintento = Retry(
+        total=reintentos,
+        connect=reintentos,
+        read=reintentos,
+        status=reintentos,
+        backoff_factor=INE_BACKOFF,
+        backoff_jitter=INE_BACKOFF_JITTER,
+        status_forcelist=ESTADOS_REINTENTABLES,
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,  # Tras agotar los reintentos devolvemos la respuesta y falla raise_for_status
+    )
+    adaptador = HTTPAdapter(pool_connections=conexiones, pool_maxsize=conexiones, max_retries=reintento)
+
+    sesion = requests.Session()
+    sesion.mount("https://", adaptador)
+    sesion.mount("http://", adaptador)
+    sesion.headers.update({"Accept-Encoding": "gzip, deflate", "Accept": "application/json"})
+    return sesion
+
+
+def obtener_sesion():
+    """Sesión única del proceso (se crea la primera vez que se pide)"""
+    global _sesion
+    with _bloqueo:
+        if _sesion is None:
+            _sesion = crear_sesion()
+        return _sesion
+
+
+def semaforo_host(url):
+    host = urlparse(url).netloc
+    with _bloqueo:
+        if host not in _semaforos:
+            _semaforos[host] = threading.BoundedSemaphore(INE_CONEXIONES_POR_HOST)
+        return _semaforos[host]
+
+
+def descargar(url, sesion=None, timeout=INE_TIMEOUT):
+    """
+    GET con la sesión compartida. Devuelve (respuesta, métricas) donde las métricas son
+    bytes transferidos (comprimidos), bytes del cuerpo, segundos y reintentos hechos.
+    """
+    sesion = sesion or obtener_sesion()
+    with semaforo_host(url):
+        t0 = time.perf_counter()
+        r = sesion.get(url, timeout=timeout)
+        contenido = r.content  # Lee y descomprime el cuerpo completo
+        segundos = time.perf_counter() - t0
+
+    historial = r.raw.retries.history if r.raw is not None and r.raw.retries else ()
+    metricas = {
+        "bytes_red": r.raw.tell() if r.raw is not None else len(contenido),
+        "bytes": len(contenido),
+        "segundos": segundos,
+        "reintentos": len(historial),
+        "compresion": r.headers.get("Content-Encoding", "identity"),
+    }
+    r.raise_for_status()
+    return r, metricas
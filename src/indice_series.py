@@ -0,0 +1,178 @@
+"""
+Descarga selectiva de series: en vez del volcado completo de una tabla (DATOS_TABLA), se piden
+solo las series que interesan con DATOS_SERIE, una petición por serie.
+
+Para saber qué series tiene una tabla se guarda un índice local por tabla en
+RUTA_INDICE_SERIES/<codigo>.json, construido a partir de SERIES_TABLA (solo metadatos, sin
+datos): código de cada serie, su Nombre, las dimensiones que se leen de él con
+ESPECIFICACION_NOMBRE, y el último periodo y la fecha en que se descargó por última vez.
+El índice solo se vuelve a pedir cuando tiene más de INDICE_SERIES_CADUCIDAD_DIAS días.
+
+Qué series se piden lo decide FILTRO_SERIES: {dimensión: fragmentos admitidos}. Las series
+que pasan el filtro se descargan a la vez con SERIES_TRABAJADORES hilos (el semáforo por
+host de src/http_ine.py sigue limitando las conexiones contra el INE).
+"""
+import json
+import os
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from config.constantes import (
+    INDICE_SERIES_CADUCIDAD_DIAS,
+    INDICE_SERIES_PAGINA,
+    RUTA_INDICE_SERIES,
+    SERIES_TRABAJADORES,
+)
+from src import backfill
+from src.http_ine import descargar
+from src.procesar import _aplanar_nombre_serie
+
+# Sin ?date= (ni ?nult=) DATOS_SERIE devuelve solo el último dato: así se pide toda la historia
+PARAMETRO_HISTORIA = "date=19000101:"
+
+
+class SeriesIncompletas(Exception):
+    """Alguna serie no se ha podido descargar; la tabla no se da por obtenida"""
+
+
+def url_funcion(url_base, funcion):
+    """URL de otra función de la API a partir de la de DATOS_TABLA (.../ES/DATOS_TABLA/)"""
+    return f"{url_base.rstrip('/').rsplit('/', 1)[0]}/{funcion}/"
+
+
+def _normalizar(texto):
+    sin_tildes = unicodedata.normalize("NFKD", texto or "").encode("ascii", "ignore").decode("ascii")
+    return sin_tildes.lower()
+
+
+def coincide(dimensiones, filtro):
+    """True si cada dimensión del filtro contiene alguno de sus fragmentos"""
+    return all(
+        any(_normalizar(fragmento) in _normalizar(dimensiones.get(campo)) for fragmento in fragmentos)
+        for campo, fragmentos in filtro.items()
+    )
+
+
+def filtrar(indice, filtro):
+    """Códigos de las series del índice que pasan el filtro (todas si no hay filtro)"""
+    return [cod for cod, serie in indice["series"].items() if not filtro or coincide(serie["dimensiones"], filtro)]
+
+
+# ÍNDICE
+def _ruta_indice(codigo):
+    return os.path.join(RUTA_INDICE_SERIES, f"{codigo}.json")
+
+
+def cargar_indice(codigo):
+    ruta = _ruta_indice(codigo)
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def guardar_indice(codigo, indice):
+    ruta = _ruta_indice(codigo)
+    os.makedirs(RUTA_INDICE_SERIES, exist_ok=True)
+    tmp = f"{ruta}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(indice, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, ruta)
+
+
+def construir_indice(codigo, metadatos, anterior=None):
+    """Índice a partir de la respuesta de SERIES_TABLA; conserva lo descargado del índice anterior"""
+    previas = (anterior or {}).get("series", {})
+    series = {}
+    for serie in metadatos:
+        cod = serie.get("COD")
+        if not cod:
+            continue
+        series[cod] = {
+            "nombre": serie.get("Nombre", ""),
+            "dimensiones": _aplanar_nombre_serie(codigo, serie.get("Nombre", "")),
+            "ultimo_periodo": previas.get(cod, {}).get("ultimo_periodo"),
+            "descargada": previas.get(cod, {}).get("descargada"),
+        }
+    return {"tabla": codigo, "actualizado": datetime.now().isoformat(timespec="seconds"), "series": series}
+
+
+def _caducado(indice):
+    actualizado = datetime.fromisoformat(indice["actualizado"])
+    return datetime.now() - actualizado > timedelta(days=INDICE_SERIES_CADUCIDAD_DIAS)
+
+
+def _descargar_metadatos(url_base, codigo, sesion):
+    """Todas las páginas de SERIES_TABLA/<codigo> y las métricas de transferencia sumadas"""
+    url = f"{url_funcion(url_base, 'SERIES_TABLA')}{codigo}"
+    metadatos = []
+    metricas = {"bytes_red": 0, "bytes": 0, "reintentos": 0}
+    pagina = 1
+    while True:
+        r, m = descargar(f"{url}?page={pagina}", sesion=sesion)
+        for campo in metricas:
+            metricas[campo] += m[campo]
+        bloque = r.json()
+        metadatos.extend(bloque)
+        if len(bloque) < INDICE_SERIES_PAGINA:
+            return metadatos, metricas
+        pagina += 1
+
+
+def obtener_indice(codigo, url_base, sesion=None, refrescar=False):
+    """(índice, métricas de transferencia); solo se pide SERIES_TABLA si falta o ha caducado"""
+    anterior = cargar_indice(codigo)
+    if anterior is not None and not refrescar and not _caducado(anterior):
+        return anterior, {"bytes_red": 0, "bytes": 0, "reintentos": 0}
+    metadatos, metricas = _descargar_metadatos(url_base, codigo, sesion)
+    indice = construir_indice(codigo, metadatos, anterior)
+    guardar_indice(codigo, indice)
+    return indice, metricas
+
+
+def registrar_descarga(codigo, indice, series):
+    """Anota en el índice el último periodo y la fecha de descarga de cada serie y lo guarda"""
+    ahora = datetime.now().isoformat(timespec="seconds")
+    for serie in series:
+        registro = indice["series"].get(serie.get("COD"))
+        if registro is None:
+            continue
+        fechas = [backfill.fecha_dato(dato) for dato in serie.get("Data", [])]
+        registro["ultimo_periodo"] = max(fechas).isoformat() if fechas else None
+        registro["descargada"] = ahora
+    guardar_indice(codigo, indice)
+
+
+# SERIES
+def descargar_series(url_base, codigos, sesion=None, trabajadores=SERIES_TRABAJADORES):
+    """
+    Descarga las series con DATOS_SERIE y devuelve (series en el orden de `codigos`, métricas).
+    Si alguna falla tras los reintentos de la sesión lanza SeriesIncompletas.
+    """
+    url = url_funcion(url_base, "DATOS_SERIE")
+    t0 = time.perf_counter()
+    metricas = {"bytes_red": 0, "bytes": 0, "segundos": 0.0, "reintentos": 0, "compresion": "identity"}
+
+    def _una(cod):
+        r, m = descargar(f"{url}{cod}?{PARAMETRO_HISTORIA}", sesion=sesion)
+        return r.json(), m
+
+    series, fallidas = [], []
+    with ThreadPoolExecutor(max_workers=trabajadores) as pool:
+        futuros = {cod: pool.submit(_una, cod) for cod in codigos}
+        for cod, futuro in futuros.items():
+            try:
+                serie, m = futuro.result()
+            except Exception as e:
+                fallidas.append(f"{cod} ({e})")
+                continue
+            series.append(serie)
+            for campo in ("bytes_red", "bytes", "reintentos"):
+                metricas[campo] += m[campo]
+            metricas["compresion"] = m["compresion"]
+    if fallidas:
+        raise SeriesIncompletas(f"{len(fallidas)} de {len(codigos)} series sin descargar: {', '.join(fallidas[:5])}")
+    metricas["segundos"] = time.perf_counter() - t0
+    return series, metricas
@@ -1,27 +1,33 @@
-import requests
 import json
+import hashlib
+
+from src import backfill, indice_series, lago
+from src.http_ine import descargar
 
 INE_BASE_URL = "https://servicios.ine.es/wstempus/jsCache/ES/DATOS_TABLA/"
 
 class INEDataExtractor:
-    def __init__(self, codigo_tabla):
+    def __init__(self, codigo_tabla, url_base=None, sesion=None):
         self.codigo_tabla = codigo_tabla
+        self.url_base = url_base
+        self.sesion = sesion
         self.raw_data = None
+        self.contenido = None  # cuerpo JSON en bruto (bytes) de la última respuesta
         self.esquema = None
+        self.huellas = None
+        self.metricas = None
 
-    def obtener_datos(self):
-        url = f"{INE_BASE_URL}{self.codigo_tabla}"
+    def obtener_datos(self, snapshot=None):
+        """Descarga la tabla; si se indica snapshot, guarda la respuesta en bruto en el lago"""
+        url = f"{self.url_base or INE_BASE_URL}{self.codigo_tabla}"
         try:
-            r = requests.get(url, timeout=30)
-            r.raise_for_status()
-            
-            respuesta = r.json()
-            
-            if isinstance(respuesta, list):
-                self.raw_data = respuesta
-            else:
-                self.raw_data = [respuesta] # Asegurar que siempre sea una lista
+            # Sesión compartida: keep-alive, gzip y reintentos con backoff (src/http_ine.py)
+            r, self.metricas = descargar(url, sesion=self.sesion)
+
+            if snapshot:
+                lago.guardar_respuesta(snapshot, self.codigo_tabla, r.content)
 
+            self._asignar(r.json(), r.content)
             return True
         
 
@@ -30,6 +36,121 @@ class INEDataExtractor:
             self.raw_data = None
             return False
 
+    def obtener_por_ventanas(self, snapshot=None, ventanas=None):
+        """
+        Como obtener_datos, pero la historia se pide en ventanas de fechas descargadas en
+        paralelo (src/backfill.py). Si alguna falla, las demás se conservan para reanudar.
+        """
+        url = f"{self.url_base or INE_BASE_URL}{self.codigo_tabla}"
+        try:
+            series, self.metricas = backfill.descargar_ventanas(
+                url, self.codigo_tabla, ventanas or backfill.ventanas(), sesion=self.sesion,
+            )
+            contenido = json.dumps(series, ensure_ascii=False).encode("utf-8")
+            self.metricas["bytes"] = len(contenido)
+
+            # En el lago queda como una respuesta completa: --replay no distingue cómo se descargó
+            if snapshot:
+                lago.guardar_respuesta(snapshot, self.codigo_tabla, contenido)
+
+            self._asignar(series, contenido)
+            return True
+
+        except Exception as e:
+            print(f"[{self.codigo_tabla}] Error en obtención por ventanas: {e}")
+            self.raw_data = None
+            return False
+
+    def obtener_series_filtradas(self, snapshot=None, filtro=None):
+        """
+        Como obtener_datos, pero solo con las series del índice local que pasan el filtro,
+        pedidas una a una con DATOS_SERIE y en paralelo (src/indice_series.py)
+        """
+        url = self.url_base or INE_BASE_URL
+        try:
+            indice, m_indice = indice_series.obtener_indice(self.codigo_tabla, url, self.sesion)
+            codigos = indice_series.filtrar(indice, filtro)
+            if not codigos:
+                # Un filtro que ya no casa (el INE ha cambiado los nombres) dejaría la tabla sin
+                # actualizar sin que nadie se entere: se avisa y se descarga la tabla completa
+                print(f"[{self.codigo_tabla}] El filtro {filtro} no selecciona ninguna de las "
+                      f"{len(indice['series'])} series del índice; se descarga la tabla completa")
+                return self.obtener_datos(snapshot)
+            series, self.metricas = indice_series.descargar_series(url, codigos, self.sesion)
+            indice_series.registrar_descarga(self.codigo_tabla, indice, series)
+            for campo in ("bytes_red", "bytes", "reintentos"):
+                self.metricas[campo] += m_indice[campo]
+            self.metricas["series"] = f"{len(series)} de {len(indice['series'])}"
+
+            contenido = json.dumps(series, ensure_ascii=False).encode("utf-8")
+            # En el lago queda como una respuesta completa: --replay no distingue cómo se descargó
+            if snapshot:
+                lago.guardar_respuesta(snapshot, self.codigo_tabla, contenido)
+
+            self._asignar(series, contenido)
+            return True
+
+        except Exception as e:
+            print(f"[{self.codigo_tabla}] Error en obtención por series: {e}")
+            self.raw_data = None
+            return False
+
+    def cargar_desde_lago(self, snapshot):
+        """
+        Reproduce una descarga anterior desde el lago, sin red: la última copia de la tabla
+        hasta ese snapshot (un snapshot del planificador no tiene todas las tablas)
+        """
+        try:
+            origen = lago.snapshot_de_tabla(self.codigo_tabla, snapshot)
+            if origen is None:
+                raise KeyError(f"La tabla {self.codigo_tabla} no está en ningún snapshot hasta {snapshot}")
+            if origen != snapshot:
+                print(f"[{self.codigo_tabla}] Se reproduce la copia del snapshot {origen}")
+            contenido = lago.leer_respuesta(origen, self.codigo_tabla)
+            self._asignar(json.loads(contenido), contenido)
+            return True
+        except Exception as e:
+            print(f"[{self.codigo_tabla}] Error leyendo el lago ({snapshot}): {e}")
+            self.raw_data = None
+            return False
+
+    def _asignar(self, respuesta, contenido=None):
+        self.contenido = contenido
+        if isinstance(respuesta, list):
+            self.raw_data = respuesta
+        else:
+            self.raw_data = [respuesta] # Asegurar que siempre sea una lista
+        self.huellas = None
+
+    # Huellas por serie: permiten saltarse las series que el INE no ha cambiado
+    @staticmethod
+    def clave_serie(serie):
+        return serie.get("COD") or serie.get("Nombre", "")
+
+    @staticmethod
+    def huella_serie(serie):
+        contenido = json.dumps(
+            [serie.get("COD"), serie.get("Nombre"), serie.get("Data", [])],
+            sort_keys=True, separators=(",", ":"), ensure_ascii=False,
+        )
+        return hashlib.sha1(contenido.encode("utf-8")).hexdigest()
+
+    def calcular_huellas(self):
+        """Devuelve {clave_serie: (nombre, huella)} de todas las series descargadas"""
+        self.huellas = {
+            self.clave_serie(serie): (serie.get("Nombre"), self.huella_serie(serie))
+            for serie in self.raw_data or []
+        }
+        return self.huellas
+
+    def series_cambiadas(self, huellas_guardadas):
+        """Filtra raw_data dejando solo las series nuevas o cuyo contenido ha cambiado"""
+        huellas = self.huellas if self.huellas is not None else self.calcular_huellas()
+        return [
+            serie for serie in self.raw_data or []
+            if huellas_guardadas.get(self.clave_serie(serie)) != huellas[self.clave_serie(serie)][1]
+        ]
+
     # Para inspeccionar la estructura de la tabla
     def _tipo_simple(self, valor):
         if isinstance(valor, bool): return "BOOLEAN"
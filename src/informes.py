@@ -0,0 +1,165 @@
+"""
+Renderizado de informes HTML de Plotly para visualizaciones/ y visualizaciones_modelado/.
+Todas las salidas comparten un único plotly.js, los trazos con muchos puntos se
+reducen antes de serializar y cada figura se escribe en un proceso independiente.
+"""
+import base64
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from config.constantes import UMBRAL_PUNTOS_GRAFICO
+
+ASSETS_DIR = "assets"
+
+# Atributos por punto que hay que recortar junto con x/y para no desalinear el hover
+_CLAVES_POR_PUNTO = ("x", "y", "text", "hovertext", "customdata", "ids")
+_CLAVES_MARKER = ("color", "size", "symbol", "opacity")
+
+
+def ruta_plotlyjs():
+    """Escribe plotly.js una sola vez (versionado) y devuelve su ruta"""
+    import plotly
+    from plotly.offline import get_plotlyjs
+
+    ruta = os.path.join(ASSETS_DIR, f"plotly-{plotly.__version__}.min.js")
+    if not os.path.exists(ruta):
+        os.makedirs(ASSETS_DIR, exist_ok=True)
+        tmp = f"{ruta}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(get_plotlyjs())
+        os.replace(tmp, ruta)
+    return ruta
+
+
+# REDUCCIÓN DE PUNTOS
+def _decodificar(valor):
+    # Plotly serializa los arrays numéricos como {"dtype": "f8", "bdata": "<base64>"}
+    if isinstance(valor, dict) and "bdata" in valor:
+        datos = np.frombuffer(base64.b64decode(valor["bdata"]), dtype=np.dtype(valor["dtype"]))
+        return datos.reshape(valor["shape"]) if "shape" in valor else datos
+    return valor
+
+
+def _a_numerico(valores):
+    valores = np.asarray(valores)
+    if valores.dtype.kind in "iufb":
+        return valores.astype(np.float64)
+    try:
+        return valores.astype("datetime64[ns]").astype(np.int64).astype(np.float64)
+    except (ValueError, TypeError):
+        pass
+    try:
+        return valores.astype(np.float64)
+    except (ValueError, TypeError):
+        # Ejes categóricos: usamos el código de cada categoría
+        return np.unique(valores.astype(str), return_inverse=True)[1].astype(np.float64)
+
+
+def indices_lttb(x, y, n_salida):
+    """Largest-Triangle-Three-Buckets: conserva la forma de una línea con n_salida puntos"""
+    n = len(x)
+    if n_salida >= n or n_salida < 3:
+        return np.arange(n)
+
+    bordes = np.linspace(1, n - 1, n_salida - 1).astype(np.int64)
+    indices = np.empty(n_salida, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    anterior = 0
+
+    for i in range(n_salida - 2):
+        inicio, fin = bordes[i], bordes[i + 1]
+        sig_inicio, sig_fin = bordes[i + 1], bordes[i + 2] if i + 2 < len(bordes) else n
+        # Vértice medio del siguiente cubo
+        media_x = x[sig_inicio:sig_fin].mean()
+        media_y = y[sig_inicio:sig_fin].mean()
+        # Área del triángulo (anterior, candidato, media siguiente) para todo el cubo a la vez
+        areas = np.abs(
+            (x[anterior] - media_x) * (y[inicio:fin] - y[anterior])
+            - (x[anterior] - x[inicio:fin]) * (media_y - y[anterior])
+        )
+        anterior = inicio + int(np.argmax(areas))
+        indices[i + 1] = anterior
+
+    return indices
+
+
+def indices_rejilla(x, y, n_salida):
+    """Binning por densidad: un punto representativo por celda ocupada de la rejilla"""
+    n = len(x)
+    if n_salida >= n:
+        return np.arange(n)
+
+    lado = max(int(np.sqrt(n_salida)), 1)
+
+    def _celda(v):
+        rango = v.max() - v.min()
+        if rango == 0:
+            return np.zeros(len(v), dtype=np.int64)
+        return np.minimum(((v - v.min()) / rango * lado).astype(np.int64), lado - 1)
+
+    celdas = _celda(x) * lado + _celda(y)
+    _, indices = np.unique(celdas, return_index=True)
+    return np.sort(indices)
+
+
+def reducir_figura(fig_dict, umbral=UMBRAL_PUNTOS_GRAFICO):
+    """Reduce en sitio los trazos scatter/line que superan el umbral de puntos"""
+    for traza in fig_dict.get("data", []):
+        if traza.get("type", "scatter") not in ("scatter", "scattergl") or "x" not in traza or "y" not in traza:
+            continue
+
+        x, y = _decodificar(traza["x"]), _decodificar(traza["y"])
+        n = len(x)
+        if n <= umbral:
+            continue
+
+        x_num, y_num = _a_numerico(x), _a_numerico(y)
+        if "lines" in traza.get("mode", "markers"):
+            indices = indices_lttb(x_num, y_num, umbral)
+        else:
+            indices = indices_rejilla(x_num, y_num, umbral)
+
+        for clave in _CLAVES_POR_PUNTO:
+            valor = _decodificar(traza.get(clave))
+            if valor is not None and not isinstance(valor, str) and len(valor) == n:
+                traza[clave] = np.asarray(valor)[indices]
+
+        marker = traza.get("marker") or {}
+        for clave in _CLAVES_MARKER:
+            valor = _decodificar(marker.get(clave))
+            if valor is not None and not isinstance(valor, (str, int, float)) and len(valor) == n:
+                marker[clave] = np.asarray(valor)[indices]
+
+    return fig_dict
+
+
+# ESCRITURA
+def _escribir_html(fig_dict, ruta, umbral, ruta_js):
+    import plotly.io as pio
+
+    reducir_figura(fig_dict, umbral)
+    src_js = os.path.relpath(ruta_js, os.path.dirname(os.path.abspath(ruta))).replace(os.sep, "/")
+    pio.write_html(fig_dict, ruta, include_plotlyjs=src_js, full_html=True, validate=False, auto_open=False)
+    return ruta, os.path.getsize(ruta) / 1024
+
+
+def renderizar_informe(figuras, umbral=UMBRAL_PUNTOS_GRAFICO, procesos=None):
+    """
+    Escribe un diccionario {ruta_html: figura} en paralelo.
+    Devuelve una lista de (ruta, KB) en el mismo orden.
+    """
+    ruta_js = os.path.abspath(ruta_plotlyjs())
+    trabajos = []
+    for ruta, fig in figuras.items():
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        trabajos.append((fig.to_plotly_json(), ruta, umbral, ruta_js))
+
+    procesos = procesos or min(len(trabajos), os.cpu_count() or 1)
+    if procesos <= 1:
+        return [_escribir_html(*t) for t in trabajos]
+
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        futuros = [pool.submit(_escribir_html, *t) for t in trabajos]
+        return [f.result() for f in futuros]
@@ -0,0 +1,129 @@
+"""
+Lago local de respuestas en bruto del INE.
+Cada descarga se guarda comprimida (zstd si está instalado, si no gzip) en
+lago/<snapshot>/<codigo>.json.<ext> y se registra en lago/indice.json, de modo
+que el ETL se puede reconstruir sin red a partir de cualquier snapshot.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+from config.constantes import RUTA_LAGO
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+RUTA_INDICE = os.path.join(RUTA_LAGO, "indice.json")
+_EXTENSIONES = {"zstd": "zst", "gzip": "gz"}
+
+# Las descargas concurrentes comparten el índice
+_bloqueo_indice = threading.Lock()
+
+
+def compresion_disponible():
+    return "zstd" if zstandard is not None else "gzip"
+
+
+def _comprimir(contenido, compresion):
+    if compresion == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(contenido)
+    return gzip.compress(contenido, compresslevel=9)
+
+
+def _descomprimir(contenido, compresion):
+    if compresion == "zstd":
+        if zstandard is None:
+            raise RuntimeError("El snapshot está en zstd y el paquete 'zstandard' no está instalado")
+        return zstandard.ZstdDecompressor().decompress(contenido)
+    return gzip.decompress(contenido)
+
+
+def _escribir_atomico(ruta, contenido):
+    tmp = f"{ruta}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(contenido)
+    os.replace(tmp, ruta)
+
+
+# ÍNDICE
+def cargar_indice():
+    if not os.path.exists(RUTA_INDICE):
+        return {"snapshots": {}}
+    with open(RUTA_INDICE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def listar_snapshots():
+    return sorted(cargar_indice()["snapshots"])
+
+
+def ultimo_snapshot():
+    snapshots = listar_snapshots()
+    return snapshots[-1] if snapshots else None
+
+
+def snapshot_de_tabla(codigo_tabla, hasta=None):
+    """
+    Snapshot más reciente (no posterior a `hasta`) que contiene la tabla, o None.
+    El planificador solo guarda en cada snapshot las tablas que le tocaban, así que el estado
+    completo en una fecha es la última copia de cada tabla hasta ese snapshot.
+    """
+    snapshots = cargar_indice()["snapshots"]
+    candidatos = [
+        nombre for nombre, entrada in snapshots.items()
+        if str(codigo_tabla) in entrada["tablas"] and (hasta is None or nombre <= hasta)
+    ]
+    return max(candidatos, default=None)
+
+
+def nuevo_snapshot():
+    """Nombre del snapshot: fecha y hora de la descarga (ordenable como texto)"""
+    return datetime.now().strftime("%Y%m%dT%H%M%S")
+
+
+# ESCRITURA Y LECTURA
+def guardar_respuesta(snapshot, codigo_tabla, contenido):
+    """Guarda los bytes de una respuesta DATOS_TABLA y la registra en el índice"""
+    compresion = compresion_disponible()
+    carpeta = os.path.join(RUTA_LAGO, snapshot)
+    os.makedirs(carpeta, exist_ok=True)
+
+    fichero = f"{codigo_tabla}.json.{_EXTENSIONES[compresion]}"
+    comprimido = _comprimir(contenido, compresion)
+    _escribir_atomico(os.path.join(carpeta, fichero), comprimido)
+
+    with _bloqueo_indice:
+        indice = cargar_indice()
+        entrada = indice["snapshots"].setdefault(snapshot, {"fecha": datetime.now().isoformat(timespec="seconds"), "tablas": {}})
+        entrada["tablas"][str(codigo_tabla)] = {
+            "fichero": fichero,
+            "compresion": compresion,
+            "sha256": hashlib.sha256(contenido).hexdigest(),
+            "bytes": len(contenido),
+            "bytes_comprimidos": len(comprimido),
+        }
+        _escribir_atomico(RUTA_INDICE, json.dumps(indice, indent=2, sort_keys=True).encode("utf-8"))
+
+    return os.path.join(carpeta, fichero)
+
+
+def leer_respuesta(snapshot, codigo_tabla):
+    """Devuelve los bytes originales de una tabla de un snapshot, comprobando su sha256"""
+    entrada = cargar_indice()["snapshots"].get(snapshot)
+    if entrada is None:
+        raise KeyError(f"El snapshot {snapshot} no existe en {RUTA_INDICE}")
+    tabla = entrada["tablas"].get(str(codigo_tabla))
+    if tabla is None:
+        raise KeyError(f"La tabla {codigo_tabla} no está en el snapshot {snapshot}")
+
+    with open(os.path.join(RUTA_LAGO, snapshot, tabla["fichero"]), "rb") as f:
+        contenido = _descomprimir(f.read(), tabla["compresion"])
+
+    if hashlib.sha256(contenido).hexdigest() != tabla["sha256"]:
+        raise ValueError(f"Fichero corrupto en el lago: {snapshot}/{tabla['fichero']}")
+    return contenido
@@ -0,0 +1,252 @@
+"""
+Perfil de memoria por etapas para los scripts de análisis (analisis_bigdata.py, modelado.py).
+Se activa con --memoria o con la variable de entorno PERFIL_MEMORIA=1; si no, no mide nada.
+
+Por cada etapa registra:
+- RSS del proceso al empezar y su pico durante la etapa (un hilo lo muestrea cada pocos ms),
+- pico de tracemalloc: memoria de Python, incluidos los arrays de numpy/pandas,
+- tamaño de los DataFrames que devuelve: buffers Arrow de Polars y memoria de pandas.
+Al terminar imprime las etapas que más memoria reservan, guarda el informe en JSON y
+comprueba PRESUPUESTO_MEMORIA (config/constantes.py).
+"""
+# colores
+rojo = '\033[91m'
+amarillo = '\033[93m'
+turquesa = '\033[38;5;44m'
+lima = '\33[38;5;46m'
+reset = '\033[0m'
+
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+from config.constantes import PRESUPUESTO_MEMORIA, RUTA_PERFILES_MEMORIA
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+MB = 2 ** 20
+
+
+def activado_por_entorno():
+    return os.environ.get("PERFIL_MEMORIA", "") not in ("", "0")
+
+
+def rss_actual():
+    """RSS del proceso en bytes: psutil si está instalado, /proc en Linux, None si no se puede medir"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def pico_rss_proceso():
+    """Pico de RSS de toda la vida del proceso en bytes (None si no se puede medir)"""
+    if psutil is not None and hasattr(psutil.Process().memory_info(), "peak_wset"):
+        return psutil.Process().memory_info().peak_wset  # Windows
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico if sys.platform == "darwin" else pico * 1024  # KB en Linux, bytes en macOS
+
+
+def tamano_datos(valor):
+    """(bytes Arrow de los DataFrames de Polars, bytes de los de pandas) contenidos en valor"""
+    if isinstance(valor, (tuple, list)):
+        tamanos = [tamano_datos(v) for v in valor]
+        return sum(t[0] for t in tamanos), sum(t[1] for t in tamanos)
+    if isinstance(valor, dict):
+        return tamano_datos(list(valor.values()))
+    # Se mira el módulo del tipo para no importar polars ni pandas aquí
+    modulo = type(valor).__module__.split(".")[0]
+    if modulo == "polars" and hasattr(valor, "estimated_size"):
+        return valor.estimated_size(), 0
+    if modulo == "pandas" and hasattr(valor, "memory_usage"):
+        uso = valor.memory_usage(deep=True)
+        return 0, int(uso.sum() if hasattr(uso, "sum") else uso)
+    return 0, 0
+
+
+class _Muestreador(threading.Thread):
+    """Hilo que guarda el máximo de RSS observado"""
+
+    def __init__(self, intervalo):
+        super().__init__(daemon=True)
+        self.intervalo = intervalo
+        self.pico = rss_actual() or 0
+        # El hilo principal reinicia el pico en cada etapa: sin el cerrojo, un máximo leído
+        # antes del reinicio lo pisaría y el pico de la etapa anterior pasaría a la siguiente
+        self._cerrojo = threading.Lock()
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.wait(self.intervalo):
+            self.observar(rss_actual() or 0)
+
+    def observar(self, rss):
+        """Actualiza el pico con una medida de RSS y lo devuelve"""
+        with self._cerrojo:
+            self.pico = max(self.pico, rss)
+            return self.pico
+
+    def reiniciar(self, rss):
+        with self._cerrojo:
+            self.pico = rss
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+
+
+class PerfilMemoria:
+    """
+    with PerfilMemoria("modelado", activo) as perfil:
+        df = perfil.medir("cargar_datos", cargar_datos)
+        with perfil.etapa("otra"):
+            ...
+    perfil.finalizar()   # informe + presupuesto; False si se ha superado
+    """
+
+    def __init__(self, script, activo=True, intervalo=0.005):
+        self.script = script
+        self.activo = activo
+        self.intervalo = intervalo
+        self.etapas = []
+        self._abiertas = []
+        self._muestreador = None
+        self._iniciado_tracemalloc = False
+
+    def __enter__(self):
+        if self.activo:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._iniciado_tracemalloc = True
+            self._muestreador = _Muestreador(self.intervalo)
+            self._muestreador.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.activo:
+            self._muestreador.parar()
+            if self._iniciado_tracemalloc:
+                tracemalloc.stop()
+        return False
+
+    def _volcar_picos(self):
+        # Los picos de tracemalloc y del muestreador son globales: antes de reiniciarlos (o al
+        # cerrar una etapa) se trasladan a todas las etapas abiertas, así se pueden anidar
+        pico_rss = self._muestreador.observar(rss_actual() or 0)
+        pico_python = tracemalloc.get_traced_memory()[1]
+        for abierta in self._abiertas:
+            abierta["_pico_python"] = max(abierta["_pico_python"], pico_python)
+            abierta["_pico_rss"] = max(abierta["_pico_rss"], pico_rss)
+
+    @contextmanager
+    def etapa(self, nombre):
+        """Mide el bloque; el dict que devuelve admite arrow/pandas (bytes) para anotar datos"""
+        if not self.activo:
+            yield {}
+            return
+        self._volcar_picos()
+        registro = {
+            "etapa": nombre,
+            "_rss_inicio": rss_actual() or 0,
+            "_python_inicio": tracemalloc.get_traced_memory()[0],
+            "_pico_python": 0,
+            "_pico_rss": 0,
+            "arrow": 0,
+            "pandas": 0,
+        }
+        tracemalloc.reset_peak()
+        self._muestreador.reiniciar(registro["_rss_inicio"])
+        self._abiertas.append(registro)
+        t0 = time.perf_counter()
+        try:
+            yield registro
+        finally:
+            segundos = time.perf_counter() - t0
+            self._volcar_picos()
+            self._abiertas.remove(registro)
+            self.etapas.append({
+                "etapa": nombre,
+                "segundos": round(segundos, 3),
+                "rss_inicio_mb": round(registro["_rss_inicio"] / MB, 1),
+                "rss_pico_mb": round(registro["_pico_rss"] / MB, 1),
+                "rss_incremento_mb": round((registro["_pico_rss"] - registro["_rss_inicio"]) / MB, 1),
+                "python_pico_mb": round((registro["_pico_python"] - registro["_python_inicio"]) / MB, 1),
+                "arrow_mb": round(registro["arrow"] / MB, 1),
+                "pandas_mb": round(registro["pandas"] / MB, 1),
+            })
+
+    def medir(self, nombre, funcion, *args, **kwargs):
+        """Ejecuta funcion como una etapa y anota el tamaño de los DataFrames que devuelve"""
+        with self.etapa(nombre) as registro:
+            resultado = funcion(*args, **kwargs)
+            if self.activo:
+                registro["arrow"], registro["pandas"] = tamano_datos(resultado)
+        return resultado
+
+    def pico_total_mb(self):
+        picos = [e["rss_pico_mb"] for e in self.etapas]
+        pico = pico_rss_proceso()
+        if pico is not None:
+            picos.append(pico / MB)
+        return round(max(picos, default=0), 1)
+
+    def superados(self):
+        """Mensajes de los presupuestos de PRESUPUESTO_MEMORIA[script] que se han superado"""
+        presupuesto = PRESUPUESTO_MEMORIA.get(self.script, {})
+        mensajes = []
+        if "total" in presupuesto and self.pico_total_mb() > presupuesto["total"]:
+            mensajes.append(f"pico de RSS {self.pico_total_mb():.0f} MB > {presupuesto['total']} MB")
+        for e in self.etapas:
+            limite = presupuesto.get(e["etapa"])
+            if limite is not None and e["rss_incremento_mb"] > limite:
+                mensajes.append(f"{e['etapa']}: +{e['rss_incremento_mb']:.0f} MB > {limite} MB")
+        return mensajes
+
+    def informe(self, top=5):
+        """Imprime las etapas que más memoria reservan y guarda el informe completo en JSON"""
+        ordenadas = sorted(self.etapas, key=lambda e: max(e["rss_incremento_mb"], e["python_pico_mb"]), reverse=True)
+        print(f"\n{turquesa}PERFIL DE MEMORIA ({self.script}), etapas que más reservan:{reset}")
+        print(f"{amarillo}{'etapa':<24} {'seg':>7} {'RSS pico':>9} {'+RSS':>8} {'Python':>8} {'Arrow':>8} {'pandas':>8}{reset}")
+        for e in ordenadas[:top]:
+            print(f"{e['etapa']:<24} {e['segundos']:>7.2f} {e['rss_pico_mb']:>8.0f}M {e['rss_incremento_mb']:>7.0f}M "
+                  f"{e['python_pico_mb']:>7.0f}M {e['arrow_mb']:>7.0f}M {e['pandas_mb']:>7.0f}M")
+        print(f"{lima}Pico de RSS del proceso: {self.pico_total_mb():.0f} MB{reset}")
+
+        os.makedirs(RUTA_PERFILES_MEMORIA, exist_ok=True)
+        ruta = os.path.join(RUTA_PERFILES_MEMORIA, f"{self.script}_{datetime.now():%Y%m%dT%H%M%S}.json")
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump({
+                "script": self.script,
+                "fecha": datetime.now().isoformat(timespec="seconds"),
+                "pico_rss_mb": self.pico_total_mb(),
+                "presupuesto_mb": PRESUPUESTO_MEMORIA.get(self.script, {}),
+                "superados": self.superados(),
+                "etapas": self.etapas,
+            }, f, ensure_ascii=False, indent=1)
+        print(f"{turquesa}Informe guardado en {ruta}{reset}")
+        return ruta
+
+    def finalizar(self):
+        """Informe + comprobación del presupuesto. Devuelve False si se ha superado"""
+        if not self.activo:
+            return True
+        self.informe()
+        superados = self.superados()
+        for mensaje in superados:
+            print(f"{rojo}Presupuesto de memoria superado: {mensaje}{reset}")
+        return not superados
@@ -0,0 +1,112 @@
+"""
+Modelo del simulador salarial de app.py a partir de sector, sexo y comunidad. Hay dos tipos:
+- "rf": one-hot de las tres variables + RandomForest (hiperparámetros de tuning.py),
+- "hgb": HistGradientBoosting con categorías nativas; las variables entran como códigos
+  ordinales, sin una columna por categoría.
+MODELO_SALARIAL (config/constantes.py) elige el tipo por defecto.
+No se entrena al abrir la app: se carga (o entrena y guarda con joblib) la primera vez
+que se pide una predicción. El fichero va asociado a una huella de la BD y de los
+hiperparámetros (uno por tipo), así que se reentrena solo cuando alguno de los dos cambia.
+El servicio de predicción (src/servicio_prediccion.py) usa el mismo fichero y puntúa
+muchos perfiles de una vez con predecir_lote.
+sklearn, joblib y pandas se importan dentro de las funciones.
+"""
+import hashlib
+import json
+import os
+
+from config.constantes import HIPERPARAMETROS_HGB, INDICADORES_SALARIO, MODELO_SALARIAL, RUTA_MODELO_SALARIAL
+from src.hiperparametros import cargar_hiperparametros_rf
+
+VARIABLES = ["sector_cnae", "sexo", "comunidad"]
+TIPOS = {
+    "rf": "Random Forest (one-hot)",
+    "hgb": "Gradient Boosting (categorías nativas)",
+}
+
+
+def ruta_modelo(tipo=MODELO_SALARIAL):
+    if tipo == "rf":
+        return RUTA_MODELO_SALARIAL
+    base, extension = os.path.splitext(RUTA_MODELO_SALARIAL)
+    return f"{base}_{tipo}{extension}"
+
+
+def huella_modelo(db_path, tipo=MODELO_SALARIAL):
+    stat = os.stat(db_path)
+    if tipo == "rf":
+        partes = [stat.st_size, stat.st_mtime_ns, cargar_hiperparametros_rf()]
+    else:
+        partes = [stat.st_size, stat.st_mtime_ns, tipo, HIPERPARAMETROS_HGB]
+    # El objetivo del entrenamiento son los salarios de INDICADORES_SALARIO
+    partes.append(list(INDICADORES_SALARIO))
+    base = json.dumps(partes, sort_keys=True)
+    return hashlib.sha1(base.encode()).hexdigest()[:16]
+
+
+def crear_hgb(categoricas):
+    """HistGradientBoosting que trata como categóricas las columnas marcadas en `categoricas`"""
+    from sklearn.ensemble import HistGradientBoostingRegressor
+
+    return HistGradientBoostingRegressor(**HIPERPARAMETROS_HGB, categorical_features=categoricas, random_state=42)
+
+
+def entrenar(df, tipo=MODELO_SALARIAL):
+    """Entrena el modelo a partir del DataFrame de Polars de salarios"""
+    import numpy as np
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder
+
+    datos = df.select([*VARIABLES, "salario"]).to_pandas()
+    if tipo == "hgb":
+        # Categoría desconocida -> NaN, que el modelo trata como valor ausente
+        encoder = OrdinalEncoder(handle_unknown="use_encoded_value", unknown_value=np.nan)
+        modelo = crear_hgb([True] * len(VARIABLES))
+    else:
+        encoder = OneHotEncoder(sparse_output=False, handle_unknown="ignore")
+        modelo = RandomForestRegressor(**cargar_hiperparametros_rf(), random_state=42)
+    X_encoded = encoder.fit_transform(datos[VARIABLES])
+    modelo.fit(X_encoded, datos["salario"])
+    return modelo, encoder
+
+
+def cargar_guardado(huella, tipo=MODELO_SALARIAL, ruta=None):
+    """(modelo, encoder) del disco si existe y la huella coincide; None si hay que entrenar"""
+    import joblib
+
+    ruta = ruta or ruta_modelo(tipo)
+    if os.path.exists(ruta):
+        guardado = joblib.load(ruta)
+        if guardado.get("huella") == huella:
+            return guardado["modelo"], guardado["encoder"]
+    return None
+
+
+def cargar_o_entrenar(df, huella, tipo=MODELO_SALARIAL, ruta=None):
+    """Devuelve (modelo, encoder) del disco si la huella coincide; si no, entrena y guarda"""
+    import joblib
+
+    ruta = ruta or ruta_modelo(tipo)
+    guardado = cargar_guardado(huella, tipo, ruta)
+    if guardado is not None:
+        return guardado
+
+    modelo, encoder = entrenar(df, tipo)
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    tmp = f"{ruta}.tmp"
+    joblib.dump({"huella": huella, "modelo": modelo, "encoder": encoder}, tmp)
+    os.replace(tmp, ruta)
+    return modelo, encoder
+
+
+def predecir_lote(modelo, encoder, perfiles):
+    """Salario de cada perfil ({variable: valor}) con una sola llamada a predict"""
+    import pandas as pd
+
+    entrada = pd.DataFrame([[perfil[v] for v in VARIABLES] for perfil in perfiles], columns=VARIABLES)
+    return modelo.predict(encoder.transform(entrada)).tolist()
+
+
+def predecir(modelo, encoder, sector, sexo, comunidad):
+    perfil = {"sector_cnae": sector, "sexo": sexo, "comunidad": comunidad}
+    return predecir_lote(modelo, encoder, [perfil])[0]
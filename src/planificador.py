@@ -0,0 +1,193 @@
+"""
+Planificador de la ingesta (python cli.py schedule): proceso de larga duración que refresca
+cada tabla del INE solo cuando le toca, en vez de descargar las siete en cada ejecución.
+
+Cada tabla tiene su frecuencia de publicación (FRECUENCIA_TABLAS) y un estado guardado en
+RUTA_ESTADO_PLANIFICADOR: último intento, última carga con filas, último periodo publicado,
+fallos seguidos y la próxima fecha en que toca mirarla. Esa fecha se calcula así:
+- si la respuesta trae un periodo nuevo, no se vuelve a mirar hasta ESPERA_PERIODO_NUEVO días,
+- si no hay periodo nuevo (el INE aún no ha publicado), se mira cada ESPERA_SIN_NOVEDADES días,
+- si la descarga falla, se reintenta a los PLANIFICADOR_REINTENTO_MIN minutos, duplicando la
+  espera con cada fallo seguido,
+y a cada espera se le suma un jitter aleatorio para que las tablas no coincidan siempre.
+
+En cada ciclo se refrescan como mucho PLANIFICADOR_TABLAS_A_LA_VEZ tablas (las más atrasadas
+primero). Lo que va detrás de la carga (el snapshot de la Capa de Oro, del que cuelgan las
+cachés de app.py y dashboard.py, y las descargas ya exportadas) solo se regenera si algún
+ciclo ha cargado filas. Debe haber un único planificador por BD.
+"""
+import json
+import os
+import random
+import threading
+from datetime import datetime, timedelta
+
+from config.constantes import (
+    ESPERA_PERIODO_NUEVO,
+    ESPERA_SIN_NOVEDADES,
+    FRECUENCIA_TABLAS,
+    PLANIFICADOR_JITTER,
+    PLANIFICADOR_REINTENTO_MAX_H,
+    PLANIFICADOR_REINTENTO_MIN,
+    PLANIFICADOR_TABLAS_A_LA_VEZ,
+    PLANIFICADOR_TICK,
+    RUTA_ESTADO_PLANIFICADOR,
+)
+
+
+# ESTADO
+def cargar_estado(ruta=RUTA_ESTADO_PLANIFICADOR):
+    if not os.path.exists(ruta):
+        return {"tablas": {}}
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def guardar_estado(estado, ruta=RUTA_ESTADO_PLANIFICADOR):
+    tmp = f"{ruta}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(estado, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, ruta)
+
+
+def _fecha(texto):
+    return datetime.fromisoformat(texto) if texto else None
+
+
+def pendientes(estado, ahora, frecuencias=FRECUENCIA_TABLAS):
+    """Tablas a las que ya les toca, de la más atrasada a la menos (las nunca cargadas primero)"""
+    vencidas = []
+    for codigo in frecuencias:
+        proxima = _fecha(estado["tablas"].get(str(codigo), {}).get("proxima"))
+        if proxima is None or proxima <= ahora:
+            vencidas.append((proxima or datetime.min, codigo))
+    return [codigo for _, codigo in sorted(vencidas)]
+
+
+def proxima_revision(estado, frecuencias=FRECUENCIA_TABLAS):
+    """Fecha más cercana en que toca alguna tabla (None si alguna no tiene estado)"""
+    fechas = [_fecha(estado["tablas"].get(str(codigo), {}).get("proxima")) for codigo in frecuencias]
+    return None if None in fechas else min(fechas, default=None)
+
+
+def programar(registro, frecuencia, resultado, ahora, azar):
+    """Actualiza el estado de una tabla con el resultado de su refresco y calcula la próxima vez"""
+    registro["frecuencia"] = frecuencia
+    registro["ultimo_intento"] = ahora.isoformat(timespec="seconds")
+    if not resultado["obtenido"]:
+        registro["fallos"] = registro.get("fallos", 0) + 1
+        espera = min(
+            timedelta(minutes=PLANIFICADOR_REINTENTO_MIN * 2 ** (registro["fallos"] - 1)),
+            timedelta(hours=PLANIFICADOR_REINTENTO_MAX_H),
+        )
+    else:
+        registro["fallos"] = 0
+        if resultado["filas"]:
+            registro["ultima_carga"] = registro["ultimo_intento"]
+        periodo = resultado["ultimo_periodo"]
+        if periodo and periodo > (registro.get("ultimo_periodo") or ""):
+            registro["ultimo_periodo"] = periodo
+            espera = timedelta(days=ESPERA_PERIODO_NUEVO[frecuencia])
+        else:
+            espera = timedelta(days=ESPERA_SIN_NOVEDADES[frecuencia])
+    espera *= 1 + azar.uniform(0, PLANIFICADOR_JITTER)
+    registro["proxima"] = (ahora + espera).isoformat(timespec="seconds")
+    return registro
+
+
+# TAREAS POSTERIORES A UNA CARGA
+def refrescar_posteriores():
+    """Capa de Oro (y con ella las cachés de los consumidores) y limpieza de exportaciones antiguas"""
+    import main
+    from src import exportacion, snapshot_oro
+
+    main.publicar_capa_oro()
+    generacion = snapshot_oro.generacion_actual()
+    if generacion and os.path.isdir(exportacion.RUTA_EXPORTACIONES):
+        exportacion.limpiar(generacion)
+
+
+class Planificador:
+    """
+    planificador = Planificador(["--sombra"])   # opciones de main.py para cada carga
+    planificador.ejecutar()                     # hasta planificador.parar() (o una_vez=True)
+    """
+
+    def __init__(self, opciones_etl=(), ruta_estado=RUTA_ESTADO_PLANIFICADOR, a_la_vez=PLANIFICADOR_TABLAS_A_LA_VEZ,
+                 tick=PLANIFICADOR_TICK, frecuencias=FRECUENCIA_TABLAS, posteriores=refrescar_posteriores, semilla=None):
+        import main
+
+        self.args = main._argumentos(list(opciones_etl))
+        self.ruta_estado = ruta_estado
+        self.a_la_vez = a_la_vez
+        self.tick = tick
+        self.frecuencias = frecuencias
+        self.posteriores = posteriores
+        self.azar = random.Random(semilla)
+        self.estado = cargar_estado(ruta_estado)
+        self._hay_cambios = False
+        self._parar = threading.Event()
+
+    def ciclo(self, ahora=None):
+        """Refresca las tablas que tocan (como mucho a_la_vez). Devuelve las tablas refrescadas"""
+        import main
+        from src import lago, procesar
+
+        ahora = ahora or datetime.now()
+        tablas = pendientes(self.estado, ahora, self.frecuencias)[:self.a_la_vez]
+        if not tablas:
+            return []
+        # Vocabulario de dimensiones desde la BD en uso: el de un ciclo anterior puede traer ids
+        # de una sombra descartada o de una BD que otro proceso ha sustituido
+        procesar.reiniciar_vocabulario()
+        print(f"[{ahora:%Y-%m-%d %H:%M:%S}] Refrescando {', '.join(map(str, tablas))}")
+
+        snapshot = None if self.args.sin_lago else lago.nuevo_snapshot()
+        fallido = {"obtenido": False, "filas": 0, "ultimo_periodo": None}
+        try:
+            cargado = main.cargar(self.args, snapshot, self.args.forzar, tablas, trabajadores=len(tablas))
+            resumen = cargado[1] if cargado is not None else {codigo: fallido for codigo in tablas}
+        except Exception as e:
+            # El planificador sigue vivo: las tablas del ciclo se reintentarán como un fallo de descarga
+            print(f"Error refrescando {tablas}: {e}")
+            resumen = {codigo: fallido for codigo in tablas}
+
+        for codigo in tablas:
+            registro = self.estado["tablas"].setdefault(str(codigo), {})
+            programar(registro, self.frecuencias[codigo], resumen[codigo], ahora, self.azar)
+            self._hay_cambios |= bool(resumen[codigo]["filas"])
+            print(f"  {codigo} ({self.frecuencias[codigo]}): {resumen[codigo]['filas']} filas, "
+                  f"último periodo {registro.get('ultimo_periodo')}, próxima {registro['proxima']}")
+        guardar_estado(self.estado, self.ruta_estado)
+        return tablas
+
+    def _posteriores(self):
+        # Una sola vez cuando ya no quedan tablas pendientes, aunque hayan hecho falta varios ciclos
+        if self._hay_cambios and self.posteriores:
+            if not self.args.sin_oro:
+                self.posteriores()
+            self._hay_cambios = False
+
+    def ejecutar(self, una_vez=False):
+        """Bucle principal; con una_vez refresca lo que toque ahora y termina"""
+        while not self._parar.is_set():
+            if self.ciclo():
+                continue
+            self._posteriores()
+            if una_vez:
+                return
+            proxima = proxima_revision(self.estado, self.frecuencias)
+            espera = self.tick if proxima is None else (proxima - datetime.now()).total_seconds()
+            self._parar.wait(min(max(espera, 1), self.tick))
+
+    def parar(self):
+        self._parar.set()
+
+    def resumen(self):
+        """Filas (tabla, frecuencia, última carga, último periodo, fallos, próxima) para mostrar"""
+        filas = []
+        for codigo, frecuencia in self.frecuencias.items():
+            registro = self.estado["tablas"].get(str(codigo), {})
+            filas.append((codigo, frecuencia, registro.get("ultima_carga"), registro.get("ultimo_periodo"),
+                          registro.get("fallos", 0), registro.get("proxima") or "ahora"))
+        return filas
@@ -7,7 +7,12 @@ from config.constantes import (
     TASA_PARO,
     TEMPORALIDAD,
 )
-from src.db import get_cursor
+from src.db import get_cursor, NO_APLICA
+
+# Vocabulario en memoria de los lookups: {tabla: {valor: id}}.
+# Cada tabla se carga entera la primera vez que se usa y los valores nuevos
+# se añaden al insertarlos, así la transformación no consulta la BD por cada dato.
+_vocabulario = {}
 
 def procesar_datos(codigo, datos):
     if not datos:
@@ -22,66 +27,69 @@ def procesar_datos(codigo, datos):
         print(f"[Procesar] ERROR: Código {codigo} no mapeado.")
         return []
 
+# Posición de cada campo en el Nombre de la serie, una vez partido por "." y sin partes vacías
+# (ej: "Total Nacional. Industria. Coste salarial total. Euros."). La comparten el bucle
+# (_aplanar_nombre_serie) y la transformación vectorizada (src/procesar_vectorial.py)
+ESPECIFICACION_NOMBRE = {
+    TASA_PARO: {"Sexo": 1, "Geografia": 2, "Grupo_Edad": 3},
+    TEMPORALIDAD: {"Geografia": 0, "Sexo": 2, "Tipo_Contrato": 3, "Tipo_Jornada": 4},
+    IPC: {"Geografia": 0, "Categoria": 1, "Tipo_Dato": 2},
+    IPV: {"Geografia": 0, "Categoria": 1, "Tipo_Dato": 2},
+    ETCL: {"Geografia": 0, "Sector": 1, "Indicador": 2},
+    EAES_OCUPACION: {"Ocupacion": 0, "Sexo": 1, "Geografia": 2},
+    EAES_PERCENTILES: {"Sexo": 0, "Geografia": 1, "Indicador": 3},
+}
+
 def _aplanar_nombre_serie(codigo, nombre_serie):
-    metadata = {}
     partes = [p.strip() for p in nombre_serie.split(".") if p.strip()]
-    if codigo == TASA_PARO:
-        metadata["Sexo"] = partes[1]
-        metadata["Geografia"] = partes[2]
-        metadata["Grupo_Edad"] = partes[3]
-    elif codigo == TEMPORALIDAD:
-        metadata["Geografia"] = partes[0]
-        metadata["Sexo"] = partes[2]
-        metadata["Tipo_Contrato"] = partes[3]
-        metadata["Tipo_Jornada"] = partes[4]
-    elif codigo in [IPC, IPV]:
-        metadata["Geografia"] = partes[0]
-        metadata["Categoria"] = partes[1]
-        metadata["Tipo_Dato"] = partes[2]
-    elif codigo == ETCL:
-        metadata["Geografia"] = partes[0]
-        metadata["Sector"] = partes[1]
-        metadata["Indicador"] = partes[2]
-    elif codigo == EAES_OCUPACION:
-        metadata["Ocupacion"] = partes[0]
-        metadata["Sexo"] = partes[1]
-        metadata["Geografia"] = partes[2]
-    elif codigo == EAES_PERCENTILES:
-        metadata["Sexo"] = partes[0]
-        metadata["Geografia"] = partes[1]
-        metadata["Indicador"] = partes[3]
-    return metadata
+    # Los campos que no aparecen en el nombre se omiten (cada tabla aplica su valor por defecto)
+    return {campo: partes[i] for campo, i in ESPECIFICACION_NOMBRE.get(codigo, {}).items() if i < len(partes)}
 
 def _procesar_precios(codigo, data):
     filas_insertar = []
     for serie in data:
         meta = _aplanar_nombre_serie(codigo, serie.get("Nombre", ""))
-        # Aseguramos que la categoría sea exactamente "IPC General" para que tu filtro funcione
-        categoria = "IPC General" if "general" in meta.get("Categoria", "").lower() else meta.get("Categoria")
-        # Aseguramos que el indicador contenga "Indice"
-        nombre_indicador = "IPC Indice" if codigo == IPC else "IPV Indice"
+        prefijo = "IPC" if codigo == IPC else "IPV"
+        # Aseguramos que la categoría sea exactamente "IPC General" para que tu filtro funcione;
+        # la general del IPV es "IPV General", para que no se cuele en el IPC General
+        categoria = f"{prefijo} General" if "general" in meta.get("Categoria", "").lower() else meta.get("Categoria")
+        # Aseguramos que el indicador del índice contenga "Indice"; las variaciones
+        # (mensual, anual...) van a su propio indicador para no pisar el índice al actualizar
+        tipo_dato = meta.get("Tipo_Dato", "")
+        if not tipo_dato or tipo_dato.lower().startswith(("índice", "indice")):
+            nombre_indicador, unidad = f"{prefijo} Indice", "Índice"
+        else:
+            nombre_indicador, unidad = f"{prefijo} {tipo_dato}", "%"
         id_geografia = _obtener_o_crear("geografia", "nombre", meta.get("Geografia", "Total Nacional"))
-        id_indicador = _obtener_o_crear("indicador", "nombre", nombre_indicador, unidad="Índice")
+        id_indicador = _obtener_o_crear("indicador", "nombre", nombre_indicador, unidad=unidad)
+        id_categoria = _obtener_o_crear("categoria_gasto", "nombre", categoria or NO_APLICA)
         for dato in serie.get("Data", []):
             id_periodo = _obtener_o_crear_periodo(dato.get("Anyo"), trimestre_fk=dato.get("FK_Periodo"))
-            filas_insertar.append((id_periodo, id_indicador, id_geografia, categoria, dato.get("Valor")))
+            filas_insertar.append((id_periodo, id_indicador, id_geografia, id_categoria, dato.get("Valor")))
     return filas_insertar
 
 def _procesar_salarios(codigo, data):
     filas_insertar = []
     for serie in data:
         meta = _aplanar_nombre_serie(codigo, serie.get("Nombre", ""))
+        # ETCL: se descarta el Coste Laboral y se conserva el Coste Salarial (salario bruto)
+        if codigo == ETCL and "laboral" in meta.get("Indicador", "").lower():
+            continue
         # Forzamos "Total Nacional" para que el filtro != funcione
         geo_nombre = meta.get("Geografia", "Total Nacional")
         if geo_nombre == "España": geo_nombre = "Total Nacional"
         id_geografia = _obtener_o_crear("geografia", "nombre", geo_nombre)
-        id_indicador = _obtener_o_crear("indicador", "nombre", "Salario_Anual_Ocupacion", unidad="Euros")
+        # Coste salarial total (ETCL), Media, Mediana, Percentiles (EES)... cada uno con su indicador
+        id_indicador = _obtener_o_crear("indicador", "nombre", meta.get("Indicador", "Salario_Anual_Ocupacion"), unidad="Euros")
+        # Evitamos el null que rompe Polars: usamos Ocupación si no hay Sector
+        ocupacion = meta.get("Ocupacion", "Total")
+        sector = meta.get("Sector", ocupacion)
+        id_sexo = _obtener_o_crear("sexo", "nombre", meta.get("Sexo", "Ambos"))
+        id_sector = _obtener_o_crear("sector_cnae", "nombre", sector)
+        id_ocupacion = _obtener_o_crear("ocupacion_cno11", "nombre", ocupacion)
         for dato in serie.get("Data", []):
             id_periodo = _obtener_o_crear_periodo(dato.get("Anyo"), trimestre_fk=dato.get("FK_Periodo"))
-            # Evitamos el null que rompe Polars: usamos Ocupación si no hay Sector
-            ocupacion = meta.get("Ocupacion", "Total")
-            sector = meta.get("Sector", ocupacion)
-            filas_insertar.append((id_periodo, id_indicador, id_geografia, meta.get("Sexo", "Ambos"), sector, ocupacion, dato.get("Valor")))
+            filas_insertar.append((id_periodo, id_indicador, id_geografia, id_sexo, id_sector, id_ocupacion, dato.get("Valor")))
     return filas_insertar
 
 def _procesar_empleo(codigo, data):
@@ -91,29 +99,46 @@ def _procesar_empleo(codigo, data):
         id_geografia = _obtener_o_crear("geografia", "nombre", meta.get("Geografia", "Total Nacional"))
         nombre_indicador = "Tasa_Paro" if codigo == TASA_PARO else "Temporalidad"
         id_indicador = _obtener_o_crear("indicador", "nombre", nombre_indicador, unidad="%")
+        id_sexo = _obtener_o_crear("sexo", "nombre", meta.get("Sexo") or NO_APLICA)
+        id_grupo_edad = _obtener_o_crear("grupo_edad", "nombre", meta.get("Grupo_Edad") or NO_APLICA)
+        id_tipo_jornada = _obtener_o_crear("tipo_jornada", "nombre", meta.get("Tipo_Jornada") or NO_APLICA)
+        id_tipo_contrato = _obtener_o_crear("tipo_contrato", "nombre", meta.get("Tipo_Contrato") or NO_APLICA)
         for dato in serie.get("Data", []):
             id_periodo = _obtener_o_crear_periodo(dato.get("Anyo"), trimestre_fk=dato.get("FK_Periodo"))
-            filas_insertar.append((id_periodo, id_indicador, id_geografia, meta.get("Sexo"), meta.get("Grupo_Edad"), meta.get("Tipo_Jornada"), meta.get("Tipo_Contrato"), dato.get("Valor")))
+            filas_insertar.append((id_periodo, id_indicador, id_geografia, id_sexo, id_grupo_edad, id_tipo_jornada, id_tipo_contrato, dato.get("Valor")))
     return filas_insertar
 
 def _obtener_o_crear_periodo(anio, mes=None, trimestre_fk=None):
+    # FK_Periodo del INE: 1-12 meses, 19-22 trimestres, el resto (28 = anual) se fecha en enero
     if trimestre_fk in [19, 20, 21, 22]:
         mes = {19: 1, 20: 4, 21: 7, 22: 10}[trimestre_fk]
+    elif trimestre_fk in range(1, 13):
+        mes = trimestre_fk
     else: mes = 1
-    fecha_iso = f"{anio}-{str(mes).zfill(2)}-01"
-    return _obtener_o_crear("periodo", "fecha_iso", fecha_iso, anio=anio, mes=mes, trimestre=trimestre_fk)
+    anio = int(anio)
+    fecha_key = anio * 10000 + mes * 100 + 1
+    return _obtener_o_crear("periodo", "fecha_key", fecha_key, anio=anio, mes=mes, trimestre=(mes - 1) // 3 + 1)
+
+def reiniciar_vocabulario():
+    """Vacía el vocabulario en memoria (p. ej. si se cambia de fichero de BD)"""
+    _vocabulario.clear()
 
 def _obtener_o_crear(tabla, columna_busqueda, valor_busqueda, **kwargs):
     id_col = f"id_{tabla}"
     tabla_nombre = f"tbl_{tabla}"
+    if tabla not in _vocabulario:
+        with get_cursor() as cursor:
+            cursor.execute(f"SELECT {columna_busqueda}, {id_col} FROM {tabla_nombre}")
+            _vocabulario[tabla] = dict(cursor.fetchall())
+    ids = _vocabulario[tabla]
+    if valor_busqueda in ids: return ids[valor_busqueda]
     with get_cursor() as cursor:
-        cursor.execute(f"SELECT {id_col} FROM {tabla_nombre} WHERE {columna_busqueda} = ?", (valor_busqueda,))
-        res = cursor.fetchone()
-        if res: return res[0]
         if tabla == "periodo":
-            cursor.execute("INSERT INTO tbl_periodo (anio, mes, trimestre, fecha_iso) VALUES (?, ?, ?, ?)", (kwargs.get("anio"), kwargs.get("mes"), kwargs.get("trimestre"), valor_busqueda))
-        elif tabla == "geografia":
-            cursor.execute("INSERT INTO tbl_geografia (nombre) VALUES (?)", (valor_busqueda,))
+            fecha_iso = f"{kwargs.get('anio')}-{str(kwargs.get('mes')).zfill(2)}-01"
+            cursor.execute("INSERT INTO tbl_periodo (anio, mes, trimestre, fecha_key, fecha_iso) VALUES (?, ?, ?, ?, ?)", (kwargs.get("anio"), kwargs.get("mes"), kwargs.get("trimestre"), valor_busqueda, fecha_iso))
         elif tabla == "indicador":
             cursor.execute("INSERT INTO tbl_indicador (nombre, unidad) VALUES (?, ?)", (valor_busqueda, kwargs.get("unidad")))
+        else: # geografía y dimensiones de texto de los hechos (sexo, sector, categoría...)
+            cursor.execute(f"INSERT INTO {tabla_nombre} (nombre) VALUES (?)", (valor_busqueda,))
+        ids[valor_busqueda] = cursor.lastrowid
         return cursor.lastrowid
\ No newline at end of file
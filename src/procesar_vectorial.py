@@ -0,0 +1,187 @@
+"""
+Transformación vectorizada de las respuestas DATOS_TABLA (alternativa a procesar.py).
+Todo el payload pasa a una tabla de Polars/Arrow: el Nombre se parte con operaciones
+de texto vectorizadas según ESPECIFICACION_NOMBRE, Data se explota a una fila por dato
+y los ids de las dimensiones se añaden con joins contra las tablas tbl_*.
+Devuelve un DataFrame con las columnas de COLUMNAS_HECHOS, listo para insertar_columnas().
+"""
+import io
+
+import polars as pl
+
+from config.constantes import (
+    IPC,
+    IPV,
+    ETCL,
+    EAES_OCUPACION,
+    EAES_PERCENTILES,
+    TASA_PARO,
+    TEMPORALIDAD,
+)
+from src.almacenar import COLUMNAS_HECHOS
+from src.db import get_cursor, NO_APLICA
+from src.procesar import ESPECIFICACION_NOMBRE, reiniciar_vocabulario
+
+# Solo los campos de la serie y de cada dato que usa la transformación
+ESQUEMA_SERIE = {
+    "COD": pl.Utf8,
+    "Nombre": pl.Utf8,
+    "Data": pl.List(pl.Struct({"FK_Periodo": pl.Int64, "Anyo": pl.Int64, "Valor": pl.Float64})),
+}
+
+_TRIMESTRE_A_MES = {19: 1, 20: 4, 21: 7, 22: 10}
+
+
+def tabla_series(series):
+    """
+    Series -> DataFrame con una fila por serie y Data como lista de structs.
+    Acepta el cuerpo crudo de la respuesta (bytes, se lee directamente a Arrow sin pasar
+    por objetos de Python) o la lista de series ya parseada.
+    """
+    if isinstance(series, (bytes, bytearray)):
+        return pl.read_json(io.BytesIO(series), schema=ESQUEMA_SERIE)
+    return pl.from_dicts(series, schema=ESQUEMA_SERIE) if series else pl.DataFrame(schema=ESQUEMA_SERIE)
+
+
+def _metadatos(codigo, df):
+    # El Nombre se parte una vez por serie (no por dato) y se extrae cada campo por posición
+    partes = (
+        pl.col("Nombre").fill_null("").str.split(".")
+        .list.eval(pl.element().str.strip_chars())
+        .list.eval(pl.element().filter(pl.element() != ""))
+    )
+    campos = [
+        pl.col("_partes").list.get(posicion, null_on_oob=True).alias(campo)
+        for campo, posicion in ESPECIFICACION_NOMBRE[codigo].items()
+    ]
+    return df.with_columns(partes.alias("_partes")).with_columns(campos).drop("_partes")
+
+
+def _periodos(df):
+    # FK_Periodo del INE: 1-12 meses, 19-22 trimestres, el resto (28 = anual) se fecha en enero
+    fk = pl.col("FK_Periodo")
+    mes = (
+        pl.when(fk.is_in(list(_TRIMESTRE_A_MES))).then(fk.replace_strict(_TRIMESTRE_A_MES, default=1))
+        .when(fk.is_between(1, 12)).then(fk)
+        .otherwise(1)
+    )
+    return df.with_columns(
+        pl.col("Anyo").alias("anio"),
+        mes.cast(pl.Int64).alias("mes"),
+    ).with_columns(
+        (pl.col("anio") * 10000 + pl.col("mes") * 100 + 1).alias("fecha_key"),
+        ((pl.col("mes") - 1) // 3 + 1).alias("trimestre"),
+    )
+
+
+# REGLAS DE NEGOCIO (las mismas que los bucles de procesar.py, como expresiones)
+def _reglas_precios(codigo, df):
+    prefijo = "IPC" if codigo == IPC else "IPV"
+    tipo = pl.col("Tipo_Dato").fill_null("")
+    es_indice = (tipo == "") | tipo.str.to_lowercase().str.starts_with("índice") | tipo.str.to_lowercase().str.starts_with("indice")
+    categoria = pl.col("Categoria")
+    return df.with_columns(
+        pl.col("Geografia").fill_null("Total Nacional").alias("geografia"),
+        pl.when(es_indice).then(pl.lit(f"{prefijo} Indice")).otherwise(pl.lit(f"{prefijo} ") + tipo).alias("indicador"),
+        pl.when(es_indice).then(pl.lit("Índice")).otherwise(pl.lit("%")).alias("unidad"),
+        pl.when(categoria.fill_null("").str.to_lowercase().str.contains("general", literal=True))
+        .then(pl.lit(f"{prefijo} General")).otherwise(categoria).fill_null(NO_APLICA).alias("categoria_gasto"),
+    )
+
+
+def _reglas_salarios(codigo, df):
+    if codigo == ETCL:
+        # ETCL: se descarta el Coste Laboral y se conserva el Coste Salarial (salario bruto)
+        df = df.filter(~pl.col("Indicador").fill_null("").str.to_lowercase().str.contains("laboral", literal=True))
+    for campo in ("Indicador", "Ocupacion", "Sector", "Sexo"):
+        if campo not in df.columns:
+            df = df.with_columns(pl.lit(None, dtype=pl.Utf8).alias(campo))
+    geografia = pl.col("Geografia").fill_null("Total Nacional")
+    ocupacion = pl.col("Ocupacion").fill_null("Total")
+    return df.with_columns(
+        pl.when(geografia == "España").then(pl.lit("Total Nacional")).otherwise(geografia).alias("geografia"),
+        pl.col("Indicador").fill_null("Salario_Anual_Ocupacion").alias("indicador"),
+        pl.lit("Euros").alias("unidad"),
+        pl.col("Sexo").fill_null("Ambos").alias("sexo"),
+        pl.col("Sector").fill_null(ocupacion).alias("sector_cnae"),
+        ocupacion.alias("ocupacion_cno11"),
+    )
+
+
+def _reglas_empleo(codigo, df):
+    for campo in ("Sexo", "Grupo_Edad", "Tipo_Jornada", "Tipo_Contrato"):
+        if campo not in df.columns:
+            df = df.with_columns(pl.lit(None, dtype=pl.Utf8).alias(campo))
+    return df.with_columns(
+        pl.col("Geografia").fill_null("Total Nacional").alias("geografia"),
+        pl.lit("Tasa_Paro" if codigo == TASA_PARO else "Temporalidad").alias("indicador"),
+        pl.lit("%").alias("unidad"),
+        pl.col("Sexo").fill_null(NO_APLICA).alias("sexo"),
+        pl.col("Grupo_Edad").fill_null(NO_APLICA).alias("grupo_edad"),
+        pl.col("Tipo_Jornada").fill_null(NO_APLICA).alias("tipo_jornada"),
+        pl.col("Tipo_Contrato").fill_null(NO_APLICA).alias("tipo_contrato"),
+    )
+
+
+# IDS DE DIMENSIÓN POR JOIN
+def _leer_dimension(cursor, tabla, columna, tipo):
+    cursor.execute(f"SELECT {columna}, id_{tabla} FROM tbl_{tabla}")
+    return pl.DataFrame(cursor.fetchall(), schema={columna: tipo, f"id_{tabla}": pl.Int64}, orient="row")
+
+
+def _adjuntar_ids(cursor, df, tabla, columna_df, columna_tabla="nombre", extra=()):
+    """
+    Añade id_<tabla> a df haciendo join por columna_df contra tbl_<tabla>.
+    Los valores que aún no existen se insertan antes en bloque (con sus columnas extra).
+    """
+    tipo = df.schema[columna_df]
+    existentes = _leer_dimension(cursor, tabla, columna_tabla, tipo)
+    nuevos = (
+        df.select([columna_df, *extra]).unique(subset=columna_df, keep="first", maintain_order=True)
+        .rename({columna_df: columna_tabla})
+        .join(existentes, on=columna_tabla, how="anti")
+    )
+    if nuevos.height:
+        columnas = [columna_tabla, *extra]
+        cursor.executemany(
+            f"INSERT INTO tbl_{tabla} ({', '.join(columnas)}) VALUES ({', '.join('?' * len(columnas))})",
+            nuevos.select(columnas).rows(),
+        )
+        existentes = _leer_dimension(cursor, tabla, columna_tabla, tipo)
+    return df.join(existentes.rename({columna_tabla: columna_df}), on=columna_df, how="left", maintain_order="left")
+
+
+def procesar_datos_vectorial(codigo, series):
+    """
+    Equivalente vectorizado de procesar_datos(): devuelve un DataFrame de Polars.
+    `series` puede ser la lista ya parseada o el cuerpo crudo de la respuesta (bytes).
+    """
+    if codigo in [IPC, IPV]:
+        tabla, reglas, dimensiones = "T_precios", _reglas_precios, ["categoria_gasto"]
+    elif codigo in [ETCL, EAES_OCUPACION, EAES_PERCENTILES]:
+        tabla, reglas, dimensiones = "T_salarios", _reglas_salarios, ["sexo", "sector_cnae", "ocupacion_cno11"]
+    elif codigo in [TASA_PARO, TEMPORALIDAD]:
+        tabla, reglas, dimensiones = "T_empleo", _reglas_empleo, ["sexo", "grupo_edad", "tipo_jornada", "tipo_contrato"]
+    else:
+        print(f"[Procesar] ERROR: Código {codigo} no mapeado.")
+        return None
+
+    df = reglas(codigo, _metadatos(codigo, tabla_series(series)))
+    # Una fila por dato; las series sin datos no generan filas
+    df = _periodos(df.explode("Data").unnest("Data").filter(pl.col("Anyo").is_not_null()))
+
+    with get_cursor() as cursor:
+        # fecha_iso solo se formatea una vez por periodo distinto, no por dato
+        periodos = df.select("fecha_key", "anio", "mes", "trimestre").unique(maintain_order=True).with_columns(
+            pl.date(pl.col("anio"), pl.col("mes"), 1).dt.strftime("%Y-%m-%d").alias("fecha_iso")
+        )
+        periodos = _adjuntar_ids(cursor, periodos, "periodo", "fecha_key", "fecha_key", extra=("anio", "mes", "trimestre", "fecha_iso"))
+        df = df.join(periodos.select("fecha_key", "id_periodo"), on="fecha_key", how="left", maintain_order="left")
+        df = _adjuntar_ids(cursor, df, "indicador", "indicador", extra=("unidad",))
+        df = _adjuntar_ids(cursor, df, "geografia", "geografia")
+        for dimension in dimensiones:
+            df = _adjuntar_ids(cursor, df, dimension, dimension)
+
+    # Las dimensiones nuevas se han insertado fuera del vocabulario en memoria del bucle
+    reiniciar_vocabulario()
+    return df.rename({"Valor": "valor"}).select(COLUMNAS_HECHOS[tabla])
@@ -0,0 +1,304 @@
+"""
+Servicio HTTP/JSON local que puntúa perfiles con el modelo salarial de app.py.
+
+El modelo y el encoder se cargan una sola vez al arrancar (el mismo fichero joblib que usa
+la app; si la huella no coincide se entrena y se guarda). Las peticiones que llegan a la vez
+no llaman cada una a predict: un hilo las agrupa en micro-lotes (hasta PREDICCION_MAX_LOTE
+perfiles o PREDICCION_ESPERA_LOTE segundos desde la primera) y hace una sola predicción
+vectorizada por lote.
+
+    POST /predecir   {"sector_cnae": ..., "sexo": ..., "comunidad": ...} -> {"salario": ...}
+                     {"perfiles": [{...}, ...]}                          -> {"salarios": [...]}
+    GET  /metricas   peticiones, perfiles, lotes, latencias (p50/p95/p99) y rendimiento
+    GET  /salud      huella del modelo y categorías que conoce el encoder
+"""
+import json
+import math
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config.constantes import (
+    MODELO_SALARIAL, PREDICCION_ESPERA_LOTE, PREDICCION_HOST, PREDICCION_MAX_LOTE, PREDICCION_MAX_PERFILES,
+    PREDICCION_PUERTO, PREDICCION_VENTANA_METRICAS,
+)
+from src import modelo_salarial
+
+TIEMPO_MAXIMO_RESPUESTA = 30  # segundos que una petición espera a su lote
+
+
+class PeticionInvalida(Exception):
+    """El cuerpo de la petición no tiene el formato esperado (respuesta 400)"""
+
+
+def cargar_modelo(db_path, tipo=MODELO_SALARIAL):
+    """(modelo, encoder, huella); solo se leen los datos si hay que volver a entrenar"""
+    huella = modelo_salarial.huella_modelo(db_path, tipo)
+    guardado = modelo_salarial.cargar_guardado(huella, tipo)
+    if guardado is not None:
+        return (*guardado, huella)
+
+    from src import snapshot_oro
+    from src.capa_oro import leer_simulador
+
+    generacion = snapshot_oro.generacion_lectura(db_path)
+    if snapshot_oro.es_snapshot(generacion):
+        df = snapshot_oro.abrir(generacion, ["simulador"])["simulador"]
+    else:
+        df = leer_simulador(db_path)
+    return (*modelo_salarial.cargar_o_entrenar(df, huella, tipo), huella)
+
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return None
+    return ordenados[min(len(ordenados) - 1, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+class Metricas:
+    """Contadores del servicio; las latencias son las de las últimas `ventana` peticiones"""
+
+    def __init__(self, ventana=PREDICCION_VENTANA_METRICAS):
+        self._bloqueo = threading.Lock()
+        self._inicio = time.perf_counter()
+        self._latencias = deque(maxlen=ventana)  # (instante de fin, segundos, perfiles)
+        self.peticiones = self.perfiles = self.errores = 0
+        self.lotes = self.perfiles_en_lotes = self.lote_maximo = 0
+        self.segundos_predict = 0.0
+
+    def registrar_peticion(self, segundos, perfiles):
+        with self._bloqueo:
+            self.peticiones += 1
+            self.perfiles += perfiles
+            self._latencias.append((time.perf_counter(), segundos, perfiles))
+
+    def registrar_error(self):
+        with self._bloqueo:
+            self.errores += 1
+
+    def registrar_lote(self, perfiles, segundos):
+        with self._bloqueo:
+            self.lotes += 1
+            self.perfiles_en_lotes += perfiles
+            self.lote_maximo = max(self.lote_maximo, perfiles)
+            self.segundos_predict += segundos
+
+    def resumen(self):
+        with self._bloqueo:
+            ahora = time.perf_counter()
+            ventana = list(self._latencias)
+            resumen = {
+                "segundos_activo": round(ahora - self._inicio, 1),
+                "peticiones": self.peticiones,
+                "perfiles": self.perfiles,
+                "errores": self.errores,
+                "lotes": self.lotes,
+                "lote_medio": round(self.perfiles_en_lotes / self.lotes, 2) if self.lotes else None,
+                "lote_maximo": self.lote_maximo,
+                "predict_medio_ms": round(1000 * self.segundos_predict / self.lotes, 3) if self.lotes else None,
+            }
+        latencias = sorted(segundos for _, segundos, _ in ventana)
+        for p in (50, 95, 99):
+            valor = _percentil(latencias, p)
+            resumen[f"latencia_p{p}_ms"] = round(1000 * valor, 3) if valor is not None else None
+        # Rendimiento de la ventana: desde la primera petición que contiene hasta ahora
+        if ventana:
+            duracion = max(ahora - (ventana[0][0] - ventana[0][1]), 1e-9)
+            resumen["peticiones_s"] = round(len(ventana) / duracion, 1)
+            resumen["perfiles_s"] = round(sum(n for _, _, n in ventana) / duracion, 1)
+        else:
+            resumen["peticiones_s"] = resumen["perfiles_s"] = 0.0
+        return resumen
+
+
+class MicroLotes:
+    """
+    Cola de peticiones que un único hilo vacía en lotes: toma la primera, espera como mucho
+    `espera` segundos a que lleguen más (o a reunir `max_lote` perfiles) y las puntúa todas
+    con una llamada a modelo_salarial.predecir_lote. Una petición con más de `max_lote`
+    perfiles forma un lote por sí sola.
+    """
+
+    def __init__(self, modelo, encoder, max_lote=PREDICCION_MAX_LOTE, espera=PREDICCION_ESPERA_LOTE, metricas=None):
+        self.modelo = modelo
+        self.encoder = encoder
+        self.max_lote = max_lote
+        self.espera = espera
+        self.metricas = metricas or Metricas()
+        self._cola = queue.Queue()
+        self._pendiente = None  # petición que no cabía en el lote anterior
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+
+    def enviar(self, perfiles):
+        """Encola los perfiles y devuelve un Future con la lista de salarios"""
+        futuro = Future()
+        self._cola.put((perfiles, futuro))
+        return futuro
+
+    def predecir(self, perfiles, timeout=TIEMPO_MAXIMO_RESPUESTA):
+        return self.enviar(perfiles).result(timeout)
+
+    def parar(self):
+        self._cola.put(None)
+        self._hilo.join()
+
+    def _reunir(self, primero):
+        lote, n = [primero], len(primero[0])
+        limite = time.perf_counter() + self.espera
+        while n < self.max_lote:
+            # Lo que ya está en la cola entra sin esperar; después, solo hasta el límite
+            try:
+                siguiente = self._cola.get_nowait()
+            except queue.Empty:
+                restante = limite - time.perf_counter()
+                if restante <= 0:
+                    break
+                try:
+                    siguiente = self._cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+            if siguiente is None:
+                self._cola.put(None)  # se atiende este lote y luego se para
+                break
+            if n + len(siguiente[0]) > self.max_lote:
+                self._pendiente = siguiente  # abre el lote siguiente
+                break
+            lote.append(siguiente)
+            n += len(siguiente[0])
+        return lote
+
+    def _bucle(self):
+        while True:
+            if self._pendiente is not None:
+                primero, self._pendiente = self._pendiente, None
+            else:
+                primero = self._cola.get()
+            if primero is None:
+                return
+            lote = self._reunir(primero)
+            perfiles = [perfil for peticion, _ in lote for perfil in peticion]
+            t0 = time.perf_counter()
+            try:
+                salarios = modelo_salarial.predecir_lote(self.modelo, self.encoder, perfiles)
+            except Exception as error:
+                for _, futuro in lote:
+                    futuro.set_exception(error)
+                continue
+            self.metricas.registrar_lote(len(perfiles), time.perf_counter() - t0)
+            inicio = 0
+            for peticion, futuro in lote:
+                futuro.set_result(salarios[inicio:inicio + len(peticion)])
+                inicio += len(peticion)
+
+
+def leer_perfiles(cuerpo):
+    """(perfiles, es_lista) a partir del JSON de /predecir; lanza PeticionInvalida"""
+    try:
+        datos = json.loads(cuerpo)
+    except (ValueError, UnicodeDecodeError) as error:
+        raise PeticionInvalida(f"JSON no válido: {error}")
+    if isinstance(datos, dict) and "perfiles" in datos:
+        perfiles, es_lista = datos["perfiles"], True
+    elif isinstance(datos, list):
+        perfiles, es_lista = datos, True
+    else:
+        perfiles, es_lista = [datos], False
+    if not isinstance(perfiles, list) or not perfiles:
+        raise PeticionInvalida("'perfiles' debe ser una lista no vacía")
+    if len(perfiles) > PREDICCION_MAX_PERFILES:
+        raise PeticionInvalida(f"como mucho {PREDICCION_MAX_PERFILES} perfiles por petición")
+    for i, perfil in enumerate(perfiles):
+        if not isinstance(perfil, dict):
+            raise PeticionInvalida(f"el perfil {i} no es un objeto")
+        faltan = [v for v in modelo_salarial.VARIABLES if not isinstance(perfil.get(v), str)]
+        if faltan:
+            raise PeticionInvalida(f"al perfil {i} le faltan (o no son texto): {', '.join(faltan)}")
+    return perfiles, es_lista
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, estado, datos):
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_GET(self):
+        servicio = self.server
+        ruta = self.path.split("?")[0].rstrip("/")
+        if ruta == "/metricas":
+            self._responder(200, servicio.metricas.resumen())
+        elif ruta == "/salud":
+            self._responder(200, {
+                "estado": "ok",
+                "huella": servicio.huella,
+                "max_lote": servicio.lotes.max_lote,
+                "espera_lote_ms": servicio.lotes.espera * 1000,
+                "categorias": {
+                    variable: [str(c) for c in categorias]
+                    for variable, categorias in zip(modelo_salarial.VARIABLES, servicio.lotes.encoder.categories_)
+                },
+            })
+        else:
+            self._responder(404, {"error": f"ruta desconocida: {ruta}"})
+
+    def do_POST(self):
+        servicio = self.server
+        t0 = time.perf_counter()
+        cuerpo = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.path.split("?")[0].rstrip("/") != "/predecir":
+            self._responder(404, {"error": f"ruta desconocida: {self.path}"})
+            return
+        try:
+            perfiles, es_lista = leer_perfiles(cuerpo)
+        except PeticionInvalida as error:
+            servicio.metricas.registrar_error()
+            self._responder(400, {"error": str(error)})
+            return
+        try:
+            salarios = servicio.lotes.predecir(perfiles)
+        except Exception as error:
+            servicio.metricas.registrar_error()
+            self._responder(500, {"error": f"{type(error).__name__}: {error}"})
+            return
+        servicio.metricas.registrar_peticion(time.perf_counter() - t0, len(perfiles))
+        self._responder(200, {"salarios": salarios} if es_lista else {"salario": salarios[0]})
+
+
+class ServicioPrediccion(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # con el valor por defecto (5) muchos clientes a la vez reciben un reset
+
+    def __init__(self, modelo, encoder, huella=None, host=PREDICCION_HOST, puerto=PREDICCION_PUERTO,
+                 max_lote=PREDICCION_MAX_LOTE, espera=PREDICCION_ESPERA_LOTE):
+        super().__init__((host, puerto), _Manejador)
+        self.huella = huella
+        self.metricas = Metricas()
+        self.lotes = MicroLotes(modelo, encoder, max_lote, espera, self.metricas)
+
+    @property
+    def url_base(self):
+        host, puerto = self.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def server_close(self):
+        super().server_close()
+        self.lotes.parar()
+
+
+def arrancar(modelo, encoder, **kwargs):
+    """Arranca el servicio en un hilo y lo devuelve (servicio.shutdown() para pararlo)"""
+    servicio = ServicioPrediccion(modelo, encoder, **kwargs)
+    threading.Thread(target=servicio.serve_forever, daemon=True).start()
+    return servicio
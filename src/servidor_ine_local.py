@@ -0,0 +1,203 @@
+"""
+Servidor local que imita DATOS_TABLA del INE para probar el cliente HTTP sin red.
+Sirve las respuestas del último snapshot del lago (o datos sintéticos si no hay
+ninguno), filtra por rango de fechas con ?date=AAAAMMDD:AAAAMMDD como el INE,
+comprime con gzip si el cliente lo pide y falla a propósito una parte de las
+peticiones (503 o cierre de la conexión sin responder).
+También responde a SERIES_TABLA/<tabla> (metadatos de las series, por páginas) y a
+DATOS_SERIE/<COD> (una serie de una tabla ya pedida) para la descarga selectiva.
+"""
+import gzip
+import json
+import math
+import random
+import threading
+import time
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from config.constantes import INDICE_SERIES_PAGINA
+from src import backfill, lago
+from src.procesar import ESPECIFICACION_NOMBRE
+
+
+def payload_sintetico(codigo, n_series=20, anios=range(2010, 2024)):
+    """
+    Series mensuales con el Nombre construido según ESPECIFICACION_NOMBRE de la tabla,
+    para que las dos transformaciones (bucle y vectorizada) las puedan procesar.
+    Cada serie tiene una combinación de dimensiones distinta.
+    """
+    especificacion = ESPECIFICACION_NOMBRE.get(codigo, {"Geografia": 0, "Categoria": 1})
+    n_partes = max(especificacion.values()) + 1
+    variantes = max(2, math.ceil(n_series ** (1 / len(especificacion))))
+    rnd = random.Random(codigo)
+    series = []
+    for i in range(n_series):
+        partes = [f"Parte {j}" for j in range(n_partes)]
+        for k, (campo, posicion) in enumerate(especificacion.items()):
+            partes[posicion] = f"{campo} {(i // variantes ** k) % variantes}"
+        series.append({
+            "COD": f"LOCAL{codigo}_{i}",
+            "Nombre": ". ".join(partes) + ". ",
+            "Data": [
+                {"FK_Periodo": mes, "Anyo": anio, "Valor": round(100 + rnd.random() * 10, 3)}
+                for anio in anios for mes in range(1, 13)
+            ],
+        })
+    return series
+
+
+def _ventana(rango):
+    """(inicio, fin) de un parámetro date=AAAAMMDD:AAAAMMDD; sin fin, sin límite"""
+    inicio, _, fin = rango.partition(":")
+    inicio = datetime.strptime(inicio, "%Y%m%d").date()
+    return inicio, datetime.strptime(fin, "%Y%m%d").date() if fin else date.max
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.bloqueo:
+            self.server.conexiones += 1
+
+    def do_GET(self):
+        servidor = self.server
+        with servidor.bloqueo:
+            servidor.peticiones += 1
+            azar = servidor.azar.random()
+            tipo_fallo = servidor.azar.random()
+
+        time.sleep(servidor.latencia)
+        if azar < servidor.tasa_fallos:
+            with servidor.bloqueo:
+                servidor.fallos += 1
+            if tipo_fallo < 0.5:
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            else:
+                # Cierre brusco: el cliente ve "Connection aborted"
+                self.close_connection = True
+            return
+
+        partes = urlsplit(self.path)
+        funcion, codigo = partes.path.rstrip("/").split("/")[-2:]
+        consulta = parse_qs(partes.query)
+        if funcion == "SERIES_TABLA":
+            cuerpo = servidor.metadatos(codigo, int(consulta.get("page", ["1"])[0]))
+        elif funcion == "DATOS_SERIE":
+            cuerpo = servidor.serie(codigo, consulta.get("date", [None])[0])
+        else:
+            cuerpo = servidor.respuesta(codigo, consulta.get("date", [None])[0])
+        if cuerpo is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            cuerpo = gzip.compress(cuerpo, compresslevel=6)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+
+class ServidorINELocal(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, puerto=0, tasa_fallos=0.3, latencia=0.05, semilla=42, snapshot=None):
+        super().__init__(("127.0.0.1", puerto), _Manejador)
+        self.tasa_fallos = tasa_fallos
+        self.latencia = latencia
+        self.azar = random.Random(semilla)
+        self.bloqueo = threading.Lock()
+        self.snapshot = snapshot if snapshot is not None else lago.ultimo_snapshot()
+        self.peticiones = self.conexiones = self.fallos = 0
+        self._cache = {}
+        self._series = {}  # COD -> serie, de las tablas ya servidas
+
+    @property
+    def url_base(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/wstempus/jsCache/ES/DATOS_TABLA/"
+
+    def respuesta(self, codigo, rango=None):
+        """Cuerpo de DATOS_TABLA/<codigo>; con rango (AAAAMMDD:AAAAMMDD) solo los datos de esas fechas"""
+        completa = self._respuesta_completa(codigo)
+        if completa is None or rango is None:
+            return completa
+        series = backfill.filtrar_rango(json.loads(completa), _ventana(rango))
+        return json.dumps(series, ensure_ascii=False).encode("utf-8")
+
+    def metadatos(self, codigo, pagina=1):
+        """Cuerpo de SERIES_TABLA/<codigo>: las series de la tabla sin sus datos, por páginas"""
+        completa = self._respuesta_completa(codigo)
+        if completa is None:
+            return None
+        series = self._registrar(codigo, completa)
+        inicio = (pagina - 1) * INDICE_SERIES_PAGINA
+        bloque = [
+            {clave: valor for clave, valor in serie.items() if clave != "Data"}
+            for serie in series[inicio:inicio + INDICE_SERIES_PAGINA]
+        ]
+        return json.dumps(bloque, ensure_ascii=False).encode("utf-8")
+
+    def serie(self, cod, rango=None):
+        """Cuerpo de DATOS_SERIE/<COD>; sin rango, como el INE, solo el último dato"""
+        if cod not in self._series:
+            # El cliente reutiliza su índice local: puede pedir series de tablas que aún no se han servido
+            for codigo in self._tablas_disponibles(cod):
+                self._registrar(codigo, self._respuesta_completa(codigo))
+        serie = self._series.get(cod)
+        if serie is None:
+            return None
+        if rango is None:
+            serie = {**serie, "Data": serie.get("Data", [])[-1:]}
+        else:
+            serie = backfill.filtrar_rango([serie], _ventana(rango))[0]
+        return json.dumps(serie, ensure_ascii=False).encode("utf-8")
+
+    def _registrar(self, codigo, completa):
+        series = json.loads(completa) if completa is not None else []
+        with self.bloqueo:
+            self._series.update((serie["COD"], serie) for serie in series if serie.get("COD"))
+        return series
+
+    def _tablas_disponibles(self, cod):
+        if self.snapshot:
+            snapshots = lago.cargar_indice()["snapshots"]
+            return sorted({codigo for nombre, entrada in snapshots.items() if nombre <= self.snapshot for codigo in entrada["tablas"]})
+        # Series sintéticas: LOCAL<tabla>_<n>
+        return [cod[len("LOCAL"):].split("_")[0]] if cod.startswith("LOCAL") else []
+
+    def _respuesta_completa(self, codigo):
+        if codigo not in self._cache:
+            # Se asigna una sola vez: otro hilo no debe ver la entrada a medio construir
+            try:
+                origen = lago.snapshot_de_tabla(codigo, self.snapshot) if self.snapshot else None
+                cuerpo = lago.leer_respuesta(origen, codigo) if origen else None
+            except KeyError:
+                cuerpo = None
+            if cuerpo is None and codigo.isdigit():
+                cuerpo = json.dumps(payload_sintetico(int(codigo)), ensure_ascii=False).encode("utf-8")
+            self._cache[codigo] = cuerpo
+        return self._cache[codigo]
+
+    def reiniciar_contadores(self):
+        with self.bloqueo:
+            self.peticiones = self.conexiones = self.fallos = 0
+
+
+def arrancar(**kwargs):
+    """Arranca el servidor en un hilo y lo devuelve (servidor.shutdown() para pararlo)"""
+    servidor = ServidorINELocal(**kwargs)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
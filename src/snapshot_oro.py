@@ -0,0 +1,165 @@
+"""
+Snapshot de la Capa de Oro en Arrow IPC (Feather v2) que comparten todos los procesos
+de la máquina: dashboard, app y scripts de análisis.
+
+    data_gold/<generacion>/<frame>.arrow     un fichero sin comprimir por DataFrame
+    data_gold/<generacion>/manifiesto.json   filas, bytes y huella de la BD de origen
+    data_gold/ACTUAL                         nombre de la generación vigente
+
+Los consumidores abren los ficheros con memory_map: los datos no se copian al heap de
+cada proceso, se comparten a través de la caché de páginas del sistema operativo.
+La publicación escribe la generación completa en un directorio temporal, lo renombra
+y solo entonces cambia el puntero ACTUAL con os.replace (atómico): un lector ve siempre
+una generación entera, la anterior o la nueva.
+"""
+import json
+import os
+import shutil
+from datetime import datetime
+
+import polars as pl
+
+from config.constantes import GENERACIONES_ORO, RUTA_ORO
+from src.capa_oro import construir_capa_oro, esquema_compacto, leer_hechos, leer_simulador
+
+PUNTERO = "ACTUAL"
+MANIFIESTO = "manifiesto.json"
+PREFIJO_BD = "bd-"
+
+
+def huella_bd(db_path):
+    """Tamaño y fecha de modificación de la BD: si cambian, el snapshot ya no la refleja"""
+    stat = os.stat(db_path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def generacion_actual(raiz=RUTA_ORO):
+    """Generación a la que apunta ACTUAL (o None si todavía no se ha publicado ninguna)"""
+    try:
+        with open(os.path.join(raiz, PUNTERO), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def leer_manifiesto(generacion, raiz=RUTA_ORO):
+    with open(os.path.join(raiz, generacion, MANIFIESTO), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def generacion_vigente(db_path, raiz=RUTA_ORO):
+    """
+    Generación actual si se publicó a partir del estado presente de la BD.
+    Devuelve None si no hay snapshot o si la BD ha cambiado después (hay que leer de la BD).
+    """
+    generacion = generacion_actual(raiz)
+    if generacion is None:
+        return None
+    try:
+        return generacion if leer_manifiesto(generacion, raiz)["bd"] == huella_bd(db_path) else None
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def generacion_lectura(db_path, raiz=RUTA_ORO):
+    """
+    Clave de caché de los lectores: la generación del snapshot vigente o, si no la hay, una
+    generación de la propia BD ("bd-<tamaño>-<mtime>") que cambia cuando el ETL la sustituye
+    (src/sombra.py). Así dashboard y app reabren los datos en cuanto hay una carga nueva.
+    """
+    generacion = generacion_vigente(db_path, raiz)
+    if generacion is not None:
+        return generacion
+    try:
+        tamano, mtime = huella_bd(db_path)
+    except OSError:
+        tamano = mtime = 0
+    return f"{PREFIJO_BD}{tamano}-{mtime}"
+
+
+def es_snapshot(generacion):
+    """True si la generación es un snapshot publicado; False si hay que leer de la BD"""
+    return not generacion.startswith(PREFIJO_BD)
+
+
+def abrir(generacion, nombres=None, raiz=RUTA_ORO):
+    """{nombre: DataFrame} mapeados en memoria (solo lectura, sin copia al heap)"""
+    if nombres is None:
+        nombres = list(leer_manifiesto(generacion, raiz)["frames"])
+    carpeta = os.path.join(raiz, generacion)
+    return {nombre: pl.read_ipc(os.path.join(carpeta, f"{nombre}.arrow"), memory_map=True) for nombre in nombres}
+
+
+def construir_frames(db_path):
+    """Todos los DataFrames que publican el ETL y leen los consumidores"""
+    # Un único esquema compacto: los Enum de todos los frames del snapshot son los mismos
+    esquema = esquema_compacto(db_path)
+    df_precios, df_salarios, df_empleo = leer_hechos(db_path, esquema=esquema)
+    df_ipc_general, df_relacion = construir_capa_oro(df_precios, df_salarios, df_empleo)
+    return {
+        "precios": df_precios,
+        "salarios": df_salarios,
+        "empleo": df_empleo,
+        "ipc_general": df_ipc_general,
+        "relacion": df_relacion,
+        "simulador": leer_simulador(db_path, esquema=esquema),
+    }
+
+
+def _escribir_atomico(ruta, texto):
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        f.write(texto)
+    os.replace(temporal, ruta)
+
+
+def publicar(frames, huella, raiz=RUTA_ORO, conservar=GENERACIONES_ORO):
+    """Escribe una generación nueva, la activa y devuelve su nombre"""
+    os.makedirs(raiz, exist_ok=True)
+    base = datetime.now().strftime("%Y%m%dT%H%M%S")
+    generacion, n = base, 1
+    while os.path.exists(os.path.join(raiz, generacion)):
+        generacion, n = f"{base}-{n}", n + 1
+
+    temporal = os.path.join(raiz, f".{generacion}.tmp")
+    os.makedirs(temporal)
+    manifiesto = {
+        "generacion": generacion,
+        "creado": datetime.now().isoformat(timespec="seconds"),
+        "bd": huella,
+        "frames": {},
+    }
+    for nombre, df in frames.items():
+        ruta = os.path.join(temporal, f"{nombre}.arrow")
+        # Sin comprimir: los buffers del fichero se usan tal cual al mapearlo
+        df.write_ipc(ruta, compression="uncompressed")
+        manifiesto["frames"][nombre] = {"filas": df.height, "bytes": os.path.getsize(ruta)}
+    with open(os.path.join(temporal, MANIFIESTO), "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=1)
+
+    os.replace(temporal, os.path.join(raiz, generacion))
+    _escribir_atomico(os.path.join(raiz, PUNTERO), generacion)
+    limpiar(raiz, conservar)
+    return generacion
+
+
+def publicar_desde_bd(db_path, raiz=RUTA_ORO):
+    # La huella se toma antes de leer: si la BD cambia durante la lectura, el snapshot nace desfasado
+    huella = huella_bd(db_path)
+    return publicar(construir_frames(db_path), huella, raiz)
+
+
+def limpiar(raiz=RUTA_ORO, conservar=GENERACIONES_ORO):
+    """
+    Borra las generaciones más antiguas (nunca la vigente). En Linux/macOS los procesos que
+    aún las tengan mapeadas siguen leyendo sin problema; en Windows un fichero mapeado no se
+    puede borrar y se deja para la siguiente limpieza.
+    """
+    actual = generacion_actual(raiz)
+    generaciones = sorted(
+        nombre for nombre in os.listdir(raiz)
+        if not nombre.startswith(".") and os.path.isdir(os.path.join(raiz, nombre))
+    )
+    for generacion in generaciones[:-conservar] if conservar > 0 else generaciones:
+        if generacion != actual:
+            shutil.rmtree(os.path.join(raiz, generacion), ignore_errors=True)
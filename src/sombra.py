@@ -0,0 +1,153 @@
+"""
+Ingesta sin cortes: el ETL escribe en una copia de la BD (la sombra) y, si la carga se
+valida, la sombra sustituye al fichero en uso con un renombrado atómico.
+
+Los lectores (dashboard, app, scripts) nunca ven una carga a medias ni esperan a los
+commits del ETL: las conexiones ya abiertas siguen leyendo el fichero anterior y las
+nuevas abren el nuevo. Como nadie lee la sombra mientras se carga, se escribe con los
+ajustes rápidos de db.PRAGMAS_CARGA_RAPIDA.
+"""
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from src import db, procesar
+
+SUFIJO = ".sombra"
+TABLAS_VALIDADAS = ("T_precios", "T_salarios", "T_empleo")
+INTENTOS_SUSTITUCION = 25
+
+
+class SombraInvalida(Exception):
+    """La sombra no ha pasado la validación: la BD en uso se deja como estaba"""
+
+
+def ruta_sombra(ruta_viva):
+    # Mismo directorio que la BD en uso: el renombrado solo es atómico dentro del mismo sistema de ficheros
+    return f"{ruta_viva}{SUFIJO}"
+
+
+def copiar_bd(origen, destino):
+    """Copia con la API de backup de SQLite: consistente aunque otro proceso esté usando el origen"""
+    if os.path.exists(destino):
+        os.remove(destino)
+    fuente, copia = sqlite3.connect(origen), sqlite3.connect(destino)
+    try:
+        fuente.backup(copia)
+    finally:
+        copia.close()
+        fuente.close()
+
+
+def _conectar_lectura(ruta):
+    return sqlite3.connect(f"{Path(ruta).absolute().as_uri()}?mode=ro", uri=True)
+
+
+def contar_filas(ruta, tablas=TABLAS_VALIDADAS):
+    """{tabla: filas}; 0 si la BD o la tabla no existen todavía"""
+    if not os.path.exists(ruta):
+        return {tabla: 0 for tabla in tablas}
+    conn = _conectar_lectura(ruta)
+    try:
+        filas = {}
+        for tabla in tablas:
+            try:
+                filas[tabla] = conn.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0]
+            except sqlite3.OperationalError:
+                filas[tabla] = 0
+        return filas
+    finally:
+        conn.close()
+
+
+def validar(ruta, antes, reconstruida=False):
+    """
+    Comprueba la sombra antes de activarla: integridad del fichero, ninguna tabla de hechos
+    con menos filas que la BD en uso (la carga es un UPSERT, nunca borra) y algún dato cargado.
+    Una BD reconstruida desde cero puede tener menos filas (ya no arrastra las obsoletas).
+    Devuelve el recuento de filas o lanza SombraInvalida.
+    """
+    conn = _conectar_lectura(ruta)
+    try:
+        integridad = conn.execute("PRAGMA quick_check").fetchone()[0]
+    finally:
+        conn.close()
+    despues = contar_filas(ruta)
+
+    errores = []
+    if integridad != "ok":
+        errores.append(f"quick_check: {integridad}")
+    errores += [
+        f"{tabla} pasa de {antes[tabla]} a {despues[tabla]} filas"
+        for tabla in despues if despues[tabla] < antes.get(tabla, 0) and not reconstruida
+    ]
+    if not any(despues.values()):
+        errores.append("las tablas de hechos están vacías")
+    if errores:
+        raise SombraInvalida("; ".join(errores))
+    return despues
+
+
+def activar(ruta, ruta_viva):
+    """Sustituye la BD en uso por la sombra (os.replace es atómico)"""
+    # fsync antes del renombrado: tras un corte de luz no puede quedar publicado un fichero a medias
+    with open(ruta, "rb+") as f:
+        os.fsync(f.fileno())
+    for intento in range(INTENTOS_SUSTITUCION):
+        try:
+            os.replace(ruta, ruta_viva)
+            break
+        except PermissionError:
+            # Windows no deja sustituir un fichero que otro proceso tiene abierto en ese momento;
+            # los lectores abren la BD solo durante cada consulta, así que basta con esperar
+            if intento == INTENTOS_SUSTITUCION - 1:
+                raise
+            time.sleep(0.2)
+    try:
+        directorio = os.open(os.path.dirname(os.path.abspath(ruta_viva)), os.O_RDONLY)
+        try:
+            os.fsync(directorio)
+        finally:
+            os.close(directorio)
+    except OSError:
+        pass  # Windows no permite abrir directorios; allí el renombrado ya es duradero
+
+
+@contextmanager
+def base_sombra(ruta_viva=None, vacia=False):
+    """
+    Todo lo que se escriba con src.db dentro del bloque va a una copia de la BD (o, con
+    vacia=True, a una BD nueva sin datos, para reconstruirla entera).
+    Al salir sin errores la copia se valida y sustituye a la BD en uso; si algo falla,
+    se borra y la BD en uso no cambia. Devuelve un resumen con las filas de antes y después.
+    """
+    ruta_viva = ruta_viva or db.DB_NAME
+    ruta = ruta_sombra(ruta_viva)
+    resumen = {"ruta": ruta, "antes": contar_filas(ruta_viva)}
+
+    if os.path.exists(ruta_viva) and not vacia:
+        copiar_bd(ruta_viva, ruta)
+    elif os.path.exists(ruta):
+        os.remove(ruta)  # restos de una carga anterior interrumpida
+
+    ruta_original = db.DB_NAME
+    db.configurar_ruta(ruta)
+    # Los ids de dimensión en memoria tienen que salir de la sombra, no de la BD anterior
+    procesar.reiniciar_vocabulario()
+    try:
+        db.configurar_carga_rapida()
+        yield resumen
+        db.configurar_ruta(ruta_original)  # cierra la conexión de la sombra antes de validarla
+        resumen["despues"] = validar(ruta, resumen["antes"], reconstruida=vacia)
+        activar(ruta, ruta_viva)
+    except BaseException:
+        db.configurar_ruta(ruta_original)
+        if os.path.exists(ruta):
+            os.remove(ruta)
+        # Los ids de dimensión creados en la sombra ya no existen: no se pueden reutilizar
+        procesar.reiniciar_vocabulario()
+        raise
+    finally:
+        db.configurar_ruta(ruta_original)
@@ -0,0 +1,116 @@
+# colores
+magenta = '\033[95m'
+amarillo = '\033[93m'
+turquesa = '\033[38;5;44m'
+lima = '\33[38;5;46m'
+reset = '\033[0m'
+
+import argparse
+import hashlib
+import inspect
+import os
+import time
+
+import numpy as np
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401 (activa HalvingGridSearchCV)
+from sklearn.model_selection import HalvingGridSearchCV, KFold, PredefinedSplit
+from sklearn.ensemble import RandomForestRegressor
+
+from modelado import DB_PATH, cargar_datos, preparar_variables_ia
+from src.capa_oro import FILTRO_SALARIOS
+from src.hiperparametros import guardar_hiperparametros_rf
+
+CACHE_DIR = "cache_tuning"
+N_PLIEGUES = 5
+SEMILLA = 42
+
+# Espacio de búsqueda: número de árboles, profundidad y tamaño de las hojas
+ESPACIO_BUSQUEDA = {
+    "n_estimators": [50, 100, 200, 400],
+    "max_depth": [None, 5, 10, 20],
+    "min_samples_split": [2, 5, 10],
+    "min_samples_leaf": [1, 2, 5, 10],
+}
+
+
+# CACHÉ DE PLIEGUES CODIFICADOS
+def _version_codificacion():
+    """Huella del código que lee y codifica las variables: si cambia, los pliegues guardados no valen"""
+    codigo = inspect.getsource(cargar_datos) + inspect.getsource(preparar_variables_ia) + FILTRO_SALARIOS
+    return hashlib.sha1(codigo.encode("utf-8")).hexdigest()[:12]
+
+
+def _clave_cache():
+    # La clave depende del fichero de BD (tamaño + fecha de modificación), del esquema de pliegues
+    # y de la codificación de las variables (columnas one-hot, salarios que se leen...), así no
+    # hace falta leer ni codificar nada para saber si la caché sigue siendo válida
+    stat = os.stat(DB_PATH)
+    base = f"{stat.st_size}-{stat.st_mtime_ns}-{N_PLIEGUES}-{SEMILLA}-{_version_codificacion()}"
+    return hashlib.sha1(base.encode()).hexdigest()[:16]
+
+
+def cargar_pliegues(usar_cache=True):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    ruta = os.path.join(CACHE_DIR, f"pliegues_{_clave_cache()}.npz")
+
+    if usar_cache and os.path.exists(ruta):
+        print(f"{lima}Usando pliegues codificados en caché:{reset} {ruta}")
+        with np.load(ruta) as cache:
+            return cache["X"], cache["y"], cache["pliegue"]
+
+    X, y, _ = preparar_variables_ia(cargar_datos())
+
+    # Cada fila guarda el número de pliegue en el que hace de test (PredefinedSplit)
+    pliegue = np.empty(len(y), dtype=np.int8)
+    kfold = KFold(n_splits=N_PLIEGUES, shuffle=True, random_state=SEMILLA)
+    for i, (_, idx_test) in enumerate(kfold.split(X)):
+        pliegue[idx_test] = i
+
+    np.savez(ruta, X=X, y=y, pliegue=pliegue)
+    print(f"{lima}Pliegues codificados guardados en:{reset} {ruta}")
+    return X, y, pliegue
+
+
+# BÚSQUEDA POR SUCESIVAS MITADES (Successive Halving)
+def buscar_hiperparametros(X, y, pliegue, factor=3):
+    print(f"{turquesa}\nBúsqueda Successive Halving sobre {X.shape[0]} filas...{reset}")
+
+    busqueda = HalvingGridSearchCV(
+        RandomForestRegressor(random_state=SEMILLA, n_jobs=1),
+        ESPACIO_BUSQUEDA,
+        factor=factor,
+        resource="n_samples",
+        min_resources="exhaust",
+        cv=PredefinedSplit(pliegue),
+        scoring="r2",
+        n_jobs=-1,  # Los candidatos de cada ronda se evalúan en paralelo en todos los núcleos
+        random_state=SEMILLA,
+    )
+
+    t0 = time.time()
+    busqueda.fit(X, y)
+    duracion = time.time() - t0
+
+    for ronda, (n_cand, n_recursos) in enumerate(zip(busqueda.n_candidates_, busqueda.n_resources_)):
+        print(f"Ronda {ronda}: {n_cand} candidatos con {n_recursos} muestras")
+
+    print(f"{magenta}Mejor R2 (CV):{reset} {busqueda.best_score_:.4f}")
+    print(f"{magenta}Mejores parámetros:{reset} {busqueda.best_params_}")
+    print(f"{magenta}Tiempo de búsqueda:{reset} {duracion:.2f}s")
+    return busqueda
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tuning de hiperparámetros del RandomForest")
+    parser.add_argument("--sin-cache", action="store_true", help="Vuelve a leer y codificar los datos")
+    parser.add_argument("--factor", type=int, default=3, help="Factor de reducción de candidatos por ronda")
+    args = parser.parse_args()
+
+    X, y, pliegue = cargar_pliegues(usar_cache=not args.sin_cache)
+    busqueda = buscar_hiperparametros(X, y, pliegue, factor=args.factor)
+    guardar_hiperparametros_rf(busqueda.best_params_, r2_cv=float(busqueda.best_score_), n_muestras=int(len(y)))
+    print(f"{lima}\nConfiguración guardada. app.py y modelado.py la usarán a partir de ahora.{reset}")
+
+
+if __name__ == "__main__":
+    main()